@@ -27,6 +27,10 @@ transformers_dep = [
     "transformers>=3.0.0",
 ]
 
+onnx_dep = [
+    "onnxruntime>=1.4.0",
+]
+
 ivis_dep = [
     "ivis[cpu]>=1.8.0",
 ]
@@ -53,7 +57,7 @@ test_packages = [
     "pre-commit>=2.2.0",
 ]
 
-extra_deps = tf_packages + transformers_dep + ivis_dep + open_tsne_dep
+extra_deps = tf_packages + transformers_dep + onnx_dep + ivis_dep + open_tsne_dep
 dev_packages = docs_packages + test_packages + extra_deps
 
 
@@ -79,6 +83,7 @@ setup(
         "test": test_packages,
         "tfhub": tf_packages,
         "transformers": transformers_dep,
+        "onnx": onnx_dep,
         "ivis": ivis_dep,
         "opentsne": open_tsne_dep,
         "all": extra_deps,
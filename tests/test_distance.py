@@ -0,0 +1,96 @@
+import pytest
+import numpy as np
+from sklearn.metrics import pairwise_distances
+
+from whatlies.distance import (
+    calculate_distances,
+    top_n_nearest,
+    effective_n_jobs,
+    normalize_rows,
+    analogy_search,
+)
+
+
+@pytest.fixture
+def X():
+    return np.random.RandomState(42).normal(0, 1, (103, 5))
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean", "manhattan"])
+@pytest.mark.parametrize("n_jobs", [1, 2, -1])
+def test_blocked_distances_match_sklearn(X, metric, n_jobs):
+    result = calculate_distances(X, X[:7], metric=metric, n_jobs=n_jobs, block_size=10)
+    expected = pairwise_distances(X, X[:7], metric=metric)
+    assert result.shape == (103, 7)
+    assert np.allclose(result, expected)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean", "manhattan"])
+@pytest.mark.parametrize("n_jobs", [1, 3])
+def test_top_n_matches_full_sort(X, metric, n_jobs):
+    idx, dist = top_n_nearest(X, X[3], n=12, metric=metric, n_jobs=n_jobs, block_size=8)
+    expected = pairwise_distances(X, X[3:4], metric=metric)[:, 0]
+    assert list(idx) == list(np.argsort(expected, kind="stable")[:12])
+    assert np.allclose(dist, np.sort(expected)[:12])
+    assert idx[0] == 3
+
+
+def test_top_n_ties_keep_original_order():
+    X = np.array([[1.0, 0.0], [0.0, 1.0], [0.0, 1.0], [0.0, 1.0]])
+    idx, dist = top_n_nearest(X, np.array([0.0, 1.0]), n=2, block_size=1, n_jobs=2)
+    assert list(idx) == [1, 2]
+
+
+def test_top_n_larger_than_rows(X):
+    idx, dist = top_n_nearest(X, X[0], n=1000, block_size=16)
+    assert len(idx) == len(dist) == X.shape[0]
+
+
+def test_n_jobs_zero_raises():
+    with pytest.raises(ValueError):
+        effective_n_jobs(0)
+
+
+def test_dot_metric_is_negative_dot_product(X):
+    assert np.allclose(calculate_distances(X, X[:2], metric="dot"), -X @ X[:2].T)
+    assert np.allclose(calculate_distances(X, X[:1], metric="dot"), -X @ X[:1].T)
+    idx, dist = top_n_nearest(X, X[0], n=3, metric="dot")
+    assert list(idx) == list(np.argsort(-X @ X[0])[:3])
+
+
+@pytest.mark.parametrize("method", ["3cosadd", "3cosmul"])
+def test_analogy_search_matches_brute_force(X, method):
+    normed = normalize_rows(X)
+    A, B, C = X[:4], X[4:8], X[8:12]
+    exclude = np.arange(12).reshape(3, 4).T
+    idx, scores = analogy_search(
+        normed, A, B, C, n=5, method=method, exclude=exclude, block_size=10
+    )
+    for q in range(4):
+        a, b, c = [normed[i] for i in exclude[q]]
+        if method == "3cosadd":
+            expected = normed @ (b - a + c)
+        else:
+            cos = [(normed @ v + 1) / 2 for v in (a, b, c)]
+            expected = cos[1] * cos[2] / (cos[0] + 1e-3)
+        expected[exclude[q]] = -np.inf
+        assert list(idx[q]) == list(np.argsort(-expected)[:5])
+        assert np.allclose(scores[q], expected[idx[q]])
+
+
+def test_analogy_search_with_shared_rows(X):
+    normed = normalize_rows(X).astype(np.float32)
+    index = np.array([3, 0, 3, 7, 1, 7, 2])
+    idx, scores = analogy_search(
+        normed, X[:2], X[2:4], X[4:6], n=4, index=index, block_size=3
+    )
+    expected, expected_scores = analogy_search(
+        normed[index], X[:2], X[2:4], X[4:6], n=4
+    )
+    assert np.allclose(scores, expected_scores)
+    assert np.array_equal(index[idx], index[expected])
+
+
+def test_analogy_search_unknown_method(X):
+    with pytest.raises(ValueError):
+        analogy_search(normalize_rows(X), X[:1], X[1:2], X[2:3], method="3cosfoo")
@@ -1,5 +1,6 @@
 import pytest
 import numpy as np
+from sklearn.metrics import pairwise_distances
 
 from whatlies import Embedding, EmbeddingSet
 
@@ -76,3 +77,59 @@ def test_emb_plot_no_err_3d():
 def test_emb_str_method(emb):
     for char in "xyz":
         assert str(emb[char]) == char
+
+
+@pytest.mark.parametrize(
+    "metric",
+    [
+        "cosine",
+        "euclidean",
+        "manhattan",
+        "cityblock",
+        "l1",
+        "l2",
+        "chebyshev",
+        "braycurtis",
+    ],
+)
+def test_emb_dist_matches_sklearn(emb, metric):
+    for a, b in [("x", "y"), ("x", "z"), ("z", "z")]:
+        expected = pairwise_distances([emb[a].vector], [emb[b].vector], metric=metric)
+        assert np.isclose(emb[a].distance(emb[b], metric=metric), expected[0][0])
+
+
+def test_emb_dist_zero_vector():
+    zero = Embedding("zero", [0.0, 0.0])
+    assert np.isclose(zero.distance(Embedding("x", [1.0, 0.0])), 1.0)
+
+
+def test_emb_similarity(emb):
+    assert np.isclose(emb["x"].similarity(emb["x"]), 1.0)
+    assert np.isclose(emb["x"].similarity(emb["y"]), 0.0)
+    assert np.isclose(emb["x"].similarity(emb["z"], metric="dot"), 0.5)
+    assert np.isclose(emb["x"].similarity(emb["y"], metric="euclidean"), -np.sqrt(2))
+
+
+def test_emb_norm_is_updated(emb):
+    new_emb = Embedding("new", [3.0, 4.0])
+    assert np.isclose(new_emb.norm, 5.0)
+    new_emb.vector = np.array([0.0, 2.0])
+    assert np.isclose(new_emb.norm, 2.0)
+
+
+def test_emb_vector_is_read_only():
+    vector = np.array([3.0, 4.0])
+    new_emb = Embedding("new", vector)
+    assert np.isclose(new_emb.norm, 5.0)
+    with pytest.raises(ValueError):
+        new_emb.vector[0] = 0.0
+    vector[0] = 0.0
+    assert np.isclose(new_emb.norm, 5.0)
+    assert np.isclose((new_emb + new_emb).norm, 10.0)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean", "manhattan", "dot"])
+def test_emb_distances_to(emb, metric):
+    result = emb["z"].distances_to(emb, metric=metric)
+    expected = [emb["z"].distance(e, metric=metric) for e in emb]
+    assert np.allclose(result, expected)
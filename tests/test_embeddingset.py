@@ -104,3 +104,106 @@ def test_filter(lang):
     assert len(emb) == 6
     assert len(emb.filter(lambda e: "pink" not in e.name)) == 5
     assert len(emb.filter(lambda e: "pink" in e.name)) == 1
+
+
+def test_append_extend_keep_matrix_in_sync():
+    emb = EmbeddingSet(Embedding("a", [1.0, 0.0]))
+    assert emb.to_X().shape == (1, 2)
+    emb.append(Embedding("b", [0.0, 2.0]))
+    emb.extend([Embedding(f"x{i}", [float(i), 1.0]) for i in range(10)])
+    assert len(emb) == 12
+    expected = np.array([e.vector for e in emb.embeddings.values()])
+    assert np.array_equal(emb.to_X(), expected)
+    assert np.allclose(np.linalg.norm(emb._normalized_matrix(), axis=1), 1.0)
+    emb.extend(EmbeddingSet(Embedding("c", [3.0, 4.0])))
+    assert np.allclose(emb._normalized_matrix()[-1], [0.6, 0.8])
+
+
+def test_append_replaces_existing_name():
+    emb = EmbeddingSet(Embedding("a", [1.0, 0.0]), Embedding("b", [0.0, 1.0]))
+    emb.to_X()
+    emb.append(Embedding("a", [5.0, 5.0]))
+    assert len(emb) == 2
+    assert np.array_equal(emb.to_X(), np.array([[5.0, 5.0], [0.0, 1.0]]))
+    assert emb.score_similar("b", 1)[0][0].name == "b"
+
+
+def test_append_does_not_alter_other_sets():
+    emb1 = EmbeddingSet(Embedding("a", [1.0, 0.0]), Embedding("b", [0.0, 1.0]))
+    emb2 = EmbeddingSet(emb1.embeddings)
+    emb2.append(Embedding("c", [1.0, 1.0]))
+    assert len(emb1) == 2
+    assert len(emb2) == 3
+
+
+def test_append_raises_dimension_error():
+    emb = EmbeddingSet(Embedding("a", [1.0, 0.0]), Embedding("b", [0.0, 1.0]))
+    emb.to_X()
+    with pytest.raises(ValueError):
+        emb.append(Embedding("c", [1.0, 1.0, 1.0]))
+
+
+def test_extend_checks_dimension_without_cache():
+    emb = EmbeddingSet(Embedding("a", [1.0, 0.0]))
+    with pytest.raises(ValueError):
+        emb.extend([Embedding("b", [1.0, 1.0, 1.0])])
+    with pytest.raises(ValueError):
+        EmbeddingSet().extend([Embedding("b", [1.0, 1.0]), Embedding("c", [1.0])])
+    assert list(emb.embeddings) == ["a"]
+
+
+def test_matrix_follows_changes_to_embeddings():
+    emb = EmbeddingSet(
+        Embedding("a", [1.0, 0.0]),
+        Embedding("b", [0.0, 1.0]),
+        Embedding("c", [1.0, 1.0]),
+    )
+    emb.to_X()
+    emb.embeddings["b"] = Embedding("b", [5.0, 5.0])
+    assert np.array_equal(emb.to_X()[1], [5.0, 5.0])
+    emb._normalized_matrix()
+    del emb.embeddings["a"]
+    emb.embeddings["a"] = Embedding("a", [2.0, 0.0])
+    assert np.array_equal(emb.to_X(), [[5.0, 5.0], [1.0, 1.0], [2.0, 0.0]])
+    name, dist = emb.score_similar("c", 1)[0]
+    assert name.name in ["b", "c"] and np.isclose(dist, 0.0)
+    emb.embeddings.pop("b")
+    assert emb.to_X().shape == (2, 2)
+    emb["c"].vector = [0.0, 3.0]
+    assert np.array_equal(emb.to_X(), [[0.0, 3.0], [2.0, 0.0]])
+
+
+def test_append_float_to_int_set():
+    emb = EmbeddingSet(Embedding("a", [1, 0]), Embedding("b", [0, 1]))
+    emb.to_X()
+    emb.append(Embedding("c", [0.5, 0.7]))
+    assert np.allclose(emb.to_X()[2], [0.5, 0.7])
+    assert "c" in [e.name for e, _ in emb.score_similar("c", 3)]
+
+
+def test_normalized_matrix_empty_set():
+    assert EmbeddingSet()._normalized_matrix().size == 0
+
+
+@pytest.fixture
+def analogy_emb():
+    names = ["man", "woman", "king", "queen", "apple"]
+    vectors = [[1, 0, 0], [1, 1, 0], [1, 0, 1], [1, 1, 1], [0, 0, 1]]
+    return EmbeddingSet(*[Embedding(n, v) for n, v in zip(names, vectors)])
+
+
+@pytest.mark.parametrize("method", ["3cosadd", "3cosmul"])
+def test_analogy(analogy_emb, method):
+    result = analogy_emb.analogy("man", "king", "woman", n=2, method=method)
+    assert [e.name for e, s in result] == ["queen", "apple"]
+    assert result[0][1] > result[1][1]
+
+
+def test_analogy_batch(analogy_emb):
+    result = analogy_emb.analogy(["man", "king"], ["woman", "queen"], ["king", "man"])
+    assert [r[0][0].name for r in result] == ["queen", "woman"]
+
+
+def test_analogy_unknown_word(analogy_emb):
+    with pytest.raises(ValueError):
+        analogy_emb.analogy("man", "king", "prince")
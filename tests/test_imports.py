@@ -0,0 +1,52 @@
+import sys
+import subprocess
+
+import pytest
+
+BACKENDS = [
+    "spacy",
+    "sense2vec",
+    "fasttext",
+    "bpemb",
+    "gensim",
+    "tensorflow",
+    "tensorflow_hub",
+    "tensorflow_text",
+    "transformers",
+    "torch",
+]
+PLOTTING = ["matplotlib", "altair", "networkx"]
+
+
+def loaded_modules(statement):
+    code = f"import sys; {statement}; print(' '.join(sys.modules))"
+    output = subprocess.check_output([sys.executable, "-c", code])
+    return set(output.decode("utf-8").split())
+
+
+def imported_modules(statement):
+    return {name.split(".")[0] for name in loaded_modules(statement)}
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import whatlies",
+        "import whatlies.language",
+        "from whatlies import Embedding, EmbeddingSet",
+    ],
+)
+def test_imports_are_lazy(statement):
+    loaded = imported_modules(statement)
+    assert not loaded & set(BACKENDS + PLOTTING + ["sklearn", "pandas"])
+
+
+def test_backend_only_imports_itself():
+    loaded = imported_modules("from whatlies.language import CountVectorLanguage")
+    assert "sklearn" in loaded
+    assert not loaded & set(BACKENDS + PLOTTING)
+
+
+def test_language_modules_are_not_imported():
+    loaded = loaded_modules("import whatlies.language")
+    assert not {m for m in loaded if m.startswith("whatlies.language.")}
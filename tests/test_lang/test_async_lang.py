@@ -0,0 +1,132 @@
+import asyncio
+
+import numpy as np
+
+from whatlies.embedding import Embedding
+from whatlies.embeddingset import EmbeddingSet
+from whatlies.language import AsyncLanguage, CachedLanguage
+
+
+class BatchLanguage:
+    """A language that remembers the batches it was asked to embed."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __getitem__(self, query):
+        return Embedding(query, np.array([len(query), 1.0]))
+
+    def _get_embeddings(self, queries):
+        self.batches.append(list(queries))
+        if "boom" in queries:
+            raise ValueError("boom")
+        return [self[q] for q in queries]
+
+
+def test_aget_returns_embedding():
+    async def main():
+        async with AsyncLanguage(BatchLanguage()) as lang:
+            return await lang.aget("king")
+
+    emb = asyncio.run(main())
+    assert emb.name == "king"
+    assert np.array_equal(emb.vector, [4.0, 1.0])
+
+
+def test_concurrent_requests_are_batched_and_coalesced():
+    inner = BatchLanguage()
+
+    async def main():
+        async with AsyncLanguage(inner, batch_window=0.05) as lang:
+            return await asyncio.gather(
+                lang.aget("king"), lang.aget("queen"), lang.aget("king")
+            )
+
+    king, queen, king_again = asyncio.run(main())
+    assert inner.batches == [["king", "queen"]]
+    assert king is king_again
+    assert queen.name == "queen"
+
+
+def test_max_batch_size_splits_batches():
+    inner = BatchLanguage()
+
+    async def main():
+        async with AsyncLanguage(inner, batch_window=10, max_batch_size=2) as lang:
+            return await lang.aembed_many(["a", "bb", "ccc", "dddd"])
+
+    embset = asyncio.run(main())
+    assert isinstance(embset, EmbeddingSet)
+    assert len(embset) == 4
+    assert sorted(len(b) for b in inner.batches) == [2, 2]
+
+
+def test_errors_only_reach_the_failing_caller():
+    inner = BatchLanguage()
+
+    async def main():
+        async with AsyncLanguage(inner, batch_window=0.05) as lang:
+            return await asyncio.gather(
+                lang.aget("boom"), lang.aget("king"), return_exceptions=True
+            )
+
+    boom, king = asyncio.run(main())
+    assert isinstance(boom, ValueError)
+    assert king.name == "king"
+    assert inner.batches == [["boom", "king"], ["boom"], ["king"]]
+
+
+def test_cancelled_batch_releases_pending_queries():
+    async def main():
+        async with AsyncLanguage(BatchLanguage(), batch_window=0.01) as lang:
+            request = asyncio.ensure_future(lang.aget("king"))
+            await asyncio.sleep(0)
+            lang._flush(asyncio.get_running_loop())
+            for task in lang._tasks:
+                task.cancel()
+            try:
+                await request
+            except asyncio.CancelledError:
+                pass
+            pending = dict(lang._pending)
+            again = await lang.aget("king")
+        return pending, again
+
+    pending, again = asyncio.run(main())
+    assert pending == {}
+    assert again.name == "king"
+
+
+def test_exit_flushes_queued_queries():
+    inner = BatchLanguage()
+
+    async def main():
+        async with AsyncLanguage(inner, batch_window=10) as lang:
+            request = asyncio.ensure_future(lang.aget("king"))
+            await asyncio.sleep(0)
+        return await asyncio.wait_for(request, timeout=5)
+
+    assert asyncio.run(main()).name == "king"
+    assert inner.batches == [["king"]]
+
+
+def test_delegates_to_language():
+    lang = AsyncLanguage(BatchLanguage())
+    assert lang["king"].name == "king"
+    assert lang.batches == []
+    lang.close()
+
+
+def test_async_over_disk_cache(tmp_path):
+    inner = BatchLanguage()
+
+    async def main():
+        cached = CachedLanguage(inner, cache=tmp_path)
+        async with AsyncLanguage(cached, max_workers=2) as lang:
+            first = await lang.aembed_many(["king", "queen"])
+            second = await lang.aembed_many(["king", "queen"])
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert np.array_equal(first.to_X(), second.to_X())
+    assert inner.batches == [["king", "queen"]]
@@ -0,0 +1,172 @@
+import pytest
+import numpy as np
+
+from whatlies.embedding import Embedding
+from whatlies.embeddingset import EmbeddingSet
+from whatlies.language import CachedLanguage
+from whatlies.language.cache import DiskCache, MemoryCache, default_namespace
+
+
+class CountingLanguage:
+    """A language that gives every string a fixed vector and remembers what it embedded."""
+
+    def __init__(self, size=3):
+        self.size = size
+        self.seen = []
+
+    def __getitem__(self, query):
+        if isinstance(query, str):
+            self.seen.append(query)
+            vec = np.random.RandomState(len(query)).normal(size=self.size)
+            return Embedding(query, vec.astype(np.float32))
+        return EmbeddingSet(*[self[q] for q in query])
+
+    def score_similar(self, query, n=10):
+        return []
+
+
+def test_disk_cache_roundtrip(tmp_path):
+    cache = DiskCache(tmp_path)
+    vectors = {"a": np.arange(3, dtype=np.float32), "b": np.arange(5, dtype=float)}
+    cache.put_many("ns", vectors)
+    found = cache.get_many("ns", ["a", "b", "c"])
+    assert set(found) == {"a", "b"}
+    for key, vec in vectors.items():
+        assert found[key].dtype == vec.dtype
+        assert np.array_equal(found[key], vec)
+    assert cache.get_many("other", ["a"]) == {}
+    assert len(cache) == 2
+
+
+def test_disk_cache_clear(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.put_many("ns1", {"a": np.ones(2)})
+    cache.put_many("ns2", {"a": np.zeros(2)})
+    cache.clear("ns1")
+    assert cache.get_many("ns1", ["a"]) == {}
+    assert np.array_equal(cache.get_many("ns2", ["a"])["a"], np.zeros(2))
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_cached_language_only_embeds_misses(tmp_path):
+    inner = CountingLanguage()
+    lang = CachedLanguage(inner, cache=tmp_path)
+    first = lang[["king", "queen", "king"]]
+    assert inner.seen == ["king", "queen"]
+    assert np.allclose(lang["king"].vector, first["king"].vector)
+    assert isinstance(lang["man"], Embedding)
+    assert inner.seen == ["king", "queen", "man"]
+
+
+def test_cached_language_persists(tmp_path):
+    CachedLanguage(CountingLanguage(), cache=tmp_path)[["king", "queen"]]
+    inner = CountingLanguage()
+    lang = CachedLanguage(inner, cache=tmp_path)
+    assert lang[["queen", "king"]].to_X().shape == (2, 3)
+    assert inner.seen == []
+
+
+def test_cached_language_namespaces(tmp_path):
+    small, large = CountingLanguage(size=2), CountingLanguage(size=4)
+    assert default_namespace(small) != default_namespace(large)
+    assert CachedLanguage(small, cache=tmp_path)["king"].vector.shape == (2,)
+    assert CachedLanguage(large, cache=tmp_path)["king"].vector.shape == (4,)
+
+
+class PathLanguage:
+    """A language that loads a model from a path and only stores the path."""
+
+    def __init__(self, model, size=3):
+        self.model_path = model
+        self.model = object()
+        self.size = size
+
+
+def test_default_namespace_describes_arguments(tmp_path):
+    first, second = tmp_path / "first.bin", tmp_path / "second.bin"
+    first.write_bytes(b"first")
+    second.write_bytes(b"second")
+    namespace = default_namespace(PathLanguage(str(first)))
+    assert str(first) in namespace and "size=3" in namespace
+    assert namespace != default_namespace(PathLanguage(str(second)))
+
+
+class BatchedLanguage(PathLanguage):
+    """A language with an argument that does not change its vectors."""
+
+    _runtime_arguments = ("batch_size",)
+
+    def __init__(self, model, size=3, batch_size=16):
+        super().__init__(model, size)
+        self.batch_size = batch_size
+
+
+def test_default_namespace_skips_runtime_arguments(tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_bytes(b"model")
+    namespace = default_namespace(BatchedLanguage(str(path), batch_size=8))
+    assert "batch_size" not in namespace
+    assert namespace == default_namespace(BatchedLanguage(str(path), batch_size=64))
+    assert namespace != default_namespace(BatchedLanguage(str(path), size=4))
+
+
+def test_default_namespace_raises_without_identity(tmp_path):
+    lang = PathLanguage(None)
+    with pytest.raises(ValueError):
+        default_namespace(lang)
+    with pytest.raises(ValueError):
+        CachedLanguage(lang, cache=tmp_path)
+    unstored = CountingLanguage()
+    del unstored.size
+    with pytest.raises(ValueError):
+        default_namespace(unstored)
+    assert CachedLanguage(lang, cache=tmp_path, namespace="mine")._namespace == "mine"
+
+
+def test_cached_language_delegates(tmp_path):
+    lang = CachedLanguage(CountingLanguage(), cache=tmp_path)
+    assert lang.score_similar("king") == []
+    assert lang.size == 3
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_items=2)
+    cache.put_many("ns", {"a": np.ones(2), "b": np.ones(2)})
+    cache.get_many("ns", ["a"])
+    cache.put_many("ns", {"c": np.ones(2)})
+    assert set(cache.get_many("ns", ["a", "b", "c"])) == {"a", "c"}
+    assert cache.evictions == 1
+
+
+def test_memory_cache_returns_read_only_vectors():
+    cache = MemoryCache()
+    cache.put_many("ns", {"a": np.ones(2)})
+    with pytest.raises(ValueError):
+        cache.get_many("ns", ["a"])["a"][0] = 5.0
+    assert np.array_equal(cache.get_many("ns", ["a"])["a"], np.ones(2))
+
+
+def test_memory_cache_max_bytes():
+    cache = MemoryCache(max_items=None, max_bytes=100)
+    cache.put_many("ns", {str(i): np.zeros(4) for i in range(5)})
+    assert len(cache) == 3
+    assert cache.nbytes == 96
+    cache.remove_many("ns", ["4"])
+    assert cache.nbytes == 64
+    cache.clear("ns")
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_cached_language_stats_and_invalidate():
+    inner = CountingLanguage()
+    lang = CachedLanguage(inner, cache=MemoryCache(max_items=10))
+    lang[["king", "queen"]]
+    lang["king"]
+    assert lang.cache_info() == (1, 2, 2)
+    lang.invalidate("king")
+    lang[["king", "queen"]]
+    assert inner.seen == ["king", "queen", "king"]
+    assert lang.cache_info() == (2, 3, 2)
+    lang.invalidate()
+    assert lang.cache_info().size == 0
@@ -0,0 +1,119 @@
+import sys
+import types
+import multiprocessing
+
+import pytest
+import numpy as np
+
+from whatlies.embedding import Embedding
+from whatlies.language.common import (
+    pool_token_vectors,
+    parse_bracket_query,
+    batched,
+    embed_parallel,
+    _start_method,
+)
+
+
+@pytest.fixture
+def matrix():
+    return np.arange(12, dtype=np.float32).reshape(4, 3)
+
+
+@pytest.mark.parametrize(
+    "pooling, func", [("sum", np.sum), ("mean", np.mean), ("max", np.max)]
+)
+def test_pooling_matches_loop(matrix, pooling, func):
+    phrases = [[0, 1, 2], [3], [2, 2], [1, 3, 0, 2]]
+    token_ids = [i for p in phrases for i in p]
+    result = pool_token_vectors(matrix, token_ids, [len(p) for p in phrases], pooling)
+    expected = np.array([func(matrix[p], axis=0) for p in phrases])
+    assert np.allclose(result, expected)
+
+
+def test_empty_phrases_are_zero(matrix):
+    result = pool_token_vectors(matrix, [1, 2], [0, 2, 0], pooling="mean")
+    assert np.allclose(result, [np.zeros(3), matrix[1:3].mean(axis=0), np.zeros(3)])
+
+
+def test_oov_tokens(matrix):
+    zero = pool_token_vectors(matrix, [0, -1], [2], pooling="mean", oov="zero")
+    skip = pool_token_vectors(matrix, [0, -1], [2], pooling="mean", oov="skip")
+    assert np.allclose(zero[0], matrix[0] / 2)
+    assert np.allclose(skip[0], matrix[0])
+
+
+def test_unknown_pooling_raises(matrix):
+    with pytest.raises(ValueError):
+        pool_token_vectors(matrix, [0], [1], pooling="median")
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("programming in python", ("programming in python", None)),
+        ("programming in [python]", ("programming in python", (15, 21))),
+        ("[programming] in python", ("programming in python", (0, 11))),
+    ],
+)
+def test_parse_bracket_query(query, expected):
+    assert parse_bracket_query(query) == expected
+
+
+@pytest.mark.parametrize("query", ["[[python]", "[python]]", "[python", "python]"])
+def test_parse_bracket_query_raises(query):
+    with pytest.raises(ValueError):
+        parse_bracket_query(query)
+
+
+def test_batched():
+    assert list(batched("abcde", 2)) == [["a", "b"], ["c", "d"], ["e"]]
+    assert list(batched([], 2)) == []
+    with pytest.raises(ValueError):
+        list(batched("abc", 0))
+
+
+class LengthLanguage:
+    def __getitem__(self, query):
+        return Embedding(query, np.array([len(query), query.count("a")], dtype=float))
+
+
+@pytest.mark.parametrize("n_workers, chunk_size", [(1, 10), (2, 3), (3, 1)])
+def test_embed_parallel(n_workers, chunk_size):
+    queries = ["a", "banana", "apple", "kiwi", "pear", "aa", "mango"]
+    embset = embed_parallel(LengthLanguage(), queries, n_workers, chunk_size)
+    assert embset.to_X().tolist() == [[len(q), q.count("a")] for q in queries]
+
+
+class CountingLanguage(LengthLanguage):
+    def __init__(self):
+        self.calls = multiprocessing.Value("i", 0)
+
+    def __getitem__(self, query):
+        with self.calls.get_lock():
+            self.calls.value += 1
+        return super().__getitem__(query)
+
+
+def test_embed_parallel_embeds_every_query_once():
+    queries = ["a", "banana", "apple", "kiwi", "pear", "aa", "mango"]
+    lang = CountingLanguage()
+    embset = embed_parallel(lang, queries, n_workers=2, chunk_size=2)
+    assert embset.to_X().tolist() == [[len(q), q.count("a")] for q in queries]
+    assert lang.calls.value == len(queries)
+
+
+def test_embed_parallel_start_method():
+    with pytest.raises(ValueError):
+        embed_parallel(LengthLanguage(), ["a", "b"], n_workers=2, start_method="nope")
+
+
+def test_embed_parallel_does_not_fork_threaded_backends(monkeypatch):
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("the platform cannot fork")
+    monkeypatch.delitem(sys.modules, "torch", raising=False)
+    monkeypatch.delitem(sys.modules, "tensorflow", raising=False)
+    assert _start_method() == "fork"
+    monkeypatch.setitem(sys.modules, "torch", types.ModuleType("torch"))
+    assert _start_method() == "spawn"
+    assert _start_method("fork") == "fork"
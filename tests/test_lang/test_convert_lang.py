@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 
 from whatlies.language import ConveRTLanguage
 
@@ -61,3 +62,11 @@ def test_basic_usage(lang, expected_shape):
 )
 def test_invalid_argument_values_raise_error(lang):
     pass
+
+
+@pytest.mark.parametrize("signature", ["default", "encode_sequence"])
+def test_batch_size_does_not_change_embeddings(signature):
+    sentences = ["bank", "money on the bank", "bank of the river"]
+    single = ConveRTLanguage(signature=signature, batch_size=1)[sentences]
+    batched = ConveRTLanguage(signature=signature, batch_size=3)[sentences]
+    assert np.allclose(single.to_X(), batched.to_X(), atol=1e-4)
@@ -1,4 +1,6 @@
 import pytest
+import numpy as np
+from sklearn.decomposition import IncrementalPCA
 
 from whatlies.language import CountVectorLanguage
 
@@ -52,3 +54,85 @@ def test_retreival2(lang):
 def test_retreival_error(lang):
     with pytest.raises(ValueError):
         lang.score_similar("doggg", n=50)
+
+
+def test_similar_uses_corpus_matrix(lang):
+    expected = lang[lang.corpus].to_X()
+    assert np.allclose(lang._corpus_matrix, expected)
+    results = lang.score_similar("pizza", n=6)
+    assert [s for e, s in results] == sorted(s for e, s in results)
+    assert results[0][0].name == "pizza"
+
+
+def test_similar_is_deterministic(lang):
+    first = lang.score_similar("doggg", n=6)
+    second = lang.score_similar("doggg", n=6)
+    assert [(e.name, s) for e, s in first] == [(e.name, s) for e, s in second]
+
+
+def test_similar_lower():
+    lang = CountVectorLanguage(n_components=2, ngram_range=(1, 2), analyzer="char")
+    lang.fit_manual(["Pizza", "pizza", "Dog", "dog"])
+    with pytest.warns(UserWarning):
+        results = lang.score_similar("pizza", n=4, lower=True)
+    assert [e.name for e, s in results] == ["pizza", "dog"]
+
+
+def test_fit_stream():
+    words = ["pizza", "pizzas", "firehouse", "firehydrant", "cat", "dog", "doggo"]
+    lang = CountVectorLanguage(n_components=3, analyzer="char", n_features=1024)
+    lang.fit_stream((w for w in words * 10), chunk_size=4)
+    embset = lang[["piza", "pizza", "fyrehouse"]]
+    assert embset.to_X().shape == (3, 3)
+    assert lang["pizza"].vector.shape == (3,)
+    assert np.allclose(embset["pizza"].vector, lang["pizza"].vector)
+
+
+def test_fit_stream_merges_small_chunks():
+    lang = CountVectorLanguage(n_components=3, analyzer="char", n_features=1024)
+    lang.fit_stream(["pizza", "pizzas", "firehouse", "cat", "dog"], chunk_size=4)
+    assert lang["pizza"].vector.shape == (3,)
+
+
+def test_fit_stream_keeps_memory_bounded(monkeypatch):
+    batch_sizes = []
+    partial_fit = IncrementalPCA.partial_fit
+
+    def counted(self, X, *args, **kwargs):
+        batch_sizes.append(X.shape[0])
+        return partial_fit(self, X, *args, **kwargs)
+
+    monkeypatch.setattr(IncrementalPCA, "partial_fit", counted)
+    lang = CountVectorLanguage(n_components=5, analyzer="char", n_features=1024)
+    lang.fit_stream((f"word{i}" for i in range(203)), chunk_size=10)
+    assert batch_sizes == [10] * 19 + [13]
+
+
+def test_fit_stream_rejects_small_chunks():
+    lang = CountVectorLanguage(n_components=5, analyzer="char", n_features=1024)
+    with pytest.raises(ValueError):
+        lang.fit_stream((f"word{i}" for i in range(200)), chunk_size=2)
+
+
+def test_fit_stream_requires_hashing():
+    lang = CountVectorLanguage(n_components=3, analyzer="char")
+    with pytest.raises(ValueError):
+        lang.fit_stream(["pizza", "pizzas", "firehouse"])
+
+
+def test_hashing_fit_manual():
+    lang = CountVectorLanguage(n_components=3, analyzer="char", n_features=1024)
+    lang.fit_manual(["pizza", "pizzas", "firehouse", "firehydrant", "cat", "dog"])
+    assert lang.score_similar("doggg", n=1)[0][0].name == "dog"
+
+
+def test_embed_parallel(lang):
+    queries = ["pizza", "firehouse", "cats", "dogs", "pizzas"] * 5
+    embset = lang.embed_parallel(queries, n_workers=2, chunk_size=4)
+    assert np.allclose(embset.to_X(), lang[queries].to_X())
+
+
+def test_embed_parallel_needs_fit_manual():
+    lang = CountVectorLanguage(n_components=2, ngram_range=(1, 2), analyzer="char")
+    with pytest.raises(ValueError):
+        lang.embed_parallel(["pizza", "firehouse"], n_workers=2, chunk_size=1)
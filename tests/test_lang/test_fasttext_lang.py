@@ -1,7 +1,9 @@
+import os
 import pathlib
 
 import pytest
 import fasttext
+import numpy as np
 
 from whatlies.language import FasttextLanguage
 
@@ -32,3 +34,78 @@ def test_retreive_similar_len():
 def test_raise_warning():
     with pytest.warns(UserWarning):
         FasttextLanguage(model1).score_similar("cat", 1000)
+
+
+def test_vocab_matrix_matches_word_vectors():
+    lang = FasttextLanguage(model1)
+    words, matrix = lang._get_vocab_matrix()
+    assert matrix.shape == (91, 20)
+    assert np.allclose(matrix[5], model1.get_word_vector(words[5]))
+
+
+def test_top_n_limits_search():
+    lang = FasttextLanguage(model1)
+    words = model1.get_words()[:10]
+    results = lang.score_similar("cat", 5, top_n=10)
+    assert len(results) == 5
+    assert all(e.name in words for e, s in results)
+
+
+def test_top_n_counts_lowercase_words():
+    lang = FasttextLanguage(model1)
+    lower = [w for w in model1.get_words() if w.islower()][:10]
+    words, matrix, norms, mask = lang._search_space(10, lower=True)
+    assert [w for w, keep in zip(words, mask) if keep] == lower
+
+
+def test_vectors_cache(tmpdir):
+    path = str(tmpdir / "vectors.npy")
+    scores = FasttextLanguage(model1, vectors_cache=path).score_similar("cat", 10)
+    assert os.path.exists(path)
+    lang = FasttextLanguage(model1, vectors_cache=path)
+    assert isinstance(lang._get_vocab_matrix()[1], np.memmap)
+    cached_scores = lang.score_similar("cat", 10)
+    assert [e.name for e, s in scores] == [e.name for e, s in cached_scores]
+    assert np.allclose([s for e, s in scores], [s for e, s in cached_scores])
+
+
+def test_vectors_cache_of_other_model_is_not_used(tmpdir):
+    path = str(tmpdir / "vectors.npy")
+    FasttextLanguage(model2, vectors_cache=path)._get_vocab_matrix()
+    other = fasttext.train_unsupervised(text_path, model="cbow", dim=10, min_count=1)
+    words, matrix = FasttextLanguage(other, vectors_cache=path)._get_vocab_matrix()
+    assert np.allclose(matrix[5], other.get_word_vector(words[5]))
+    assert not any(f.endswith(".tmp") for f in os.listdir(tmpdir))
+
+
+def test_analogy_excludes_query_words():
+    results = FasttextLanguage(model1).analogy("simple", "complex", "flat", n=3)
+    assert len(results) == 3
+    assert not {"simple", "complex", "flat"} & {e.name for e, s in results}
+
+
+def test_reduced_model_is_cached(tmpdir, monkeypatch):
+    model_path = str(tmpdir / "model.bin")
+    model1.save_model(model_path)
+    cache_dir = tmpdir / "cache"
+    lang = FasttextLanguage(model_path, size=5, cache_dir=cache_dir)
+    assert lang["dog"].vector.shape[0] == 5
+    assert len(os.listdir(cache_dir)) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the reduced model should be loaded from the cache")
+
+    monkeypatch.setattr(fasttext.util, "reduce_model", fail)
+    cached = FasttextLanguage(model_path, size=5, cache_dir=cache_dir)
+    assert np.allclose(cached["dog"].vector, lang["dog"].vector)
+
+
+def test_reduced_model_key_covers_entire_file(tmpdir):
+    lang = FasttextLanguage(model1, cache_dir=tmpdir)
+    path = tmpdir / "model.bin"
+    content = bytearray(3 << 20)
+    path.write_binary(bytes(content))
+    before = lang._reduced_model_path(str(path))
+    content[len(content) // 2] = 1
+    path.write_binary(bytes(content))
+    assert lang._reduced_model_path(str(path)) != before
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 
 from whatlies.language import GensimLanguage
 
@@ -25,3 +26,46 @@ def test_single_token_words(lang):
 def test_similar_retreival(lang):
     assert len(lang.score_similar("hi", 10)) == 10
     assert len(lang.embset_similar("hi", 10)) == 10
+
+
+def test_mmap_retreival(lang):
+    mmap_lang = GensimLanguage("tests/cache/custom_gensim_vectors.kv", mmap="r")
+    assert np.allclose(mmap_lang["computer"].vector, lang["computer"].vector)
+    assert [e.name for e, s in mmap_lang.score_similar("computer", 5)] == [
+        e.name for e, s in lang.score_similar("computer", 5)
+    ]
+
+
+def test_similar_matches_brute_force(lang):
+    vectors = lang.kv.vectors
+    query = lang["computer"].vector
+    sims = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    expected = [lang.kv.index2word[i] for i in np.argsort(-sims)[:5]]
+    assert [e.name for e, s in lang.score_similar("computer", 5)] == expected
+
+
+def test_similar_lower(lang):
+    results = lang.score_similar("computer", 10, lower=True)
+    assert all(e.name.lower() == e.name for e, s in results)
+
+
+@pytest.mark.parametrize(
+    "pooling, func", [("sum", np.sum), ("mean", np.mean), ("max", np.max)]
+)
+def test_sentence_pooling(pooling, func):
+    lang = GensimLanguage("tests/cache/custom_gensim_vectors.kv", pooling=pooling)
+    words = ["graph", "trees", "computer"]
+    expected = func([lang[w].vector for w in words], axis=0)
+    assert np.allclose(lang[" ".join(words)].vector, expected)
+
+
+def test_sentence_batch_matches_single(lang):
+    queries = [
+        "graph trees",
+        "computer",
+        "doesnotexist graph",
+        "human interface computer",
+    ]
+    emb = lang[queries]
+    for q in queries:
+        assert np.allclose(emb[q].vector, lang[q].vector)
@@ -3,6 +3,7 @@ import numpy as np
 from transformers import AutoTokenizer, is_tf_available, is_torch_available
 
 from whatlies.language import HFTransformersLanguage
+from whatlies.language.hftransformers_lang import length_buckets, masked_sum
 
 
 def load_model_and_tokenizer(model_name, tensor_type):
@@ -60,3 +61,95 @@ def test_basic_usage_and_generated_embeddings(model_name, expected_shape, tensor
             feats = output[0][i][np.logical_not(mask[i])].detach().numpy()
         assert emb[s].vector.shape == expected_shape
         assert np.allclose(emb[s].vector, feats.sum(axis=0))
+
+
+@pytest.mark.parametrize("tensor_type", ["tf", "pt"])
+def test_batch_size_does_not_change_embeddings(tensor_type):
+    sentences = ["hello", "how are you doing today?", "fine", "and you, my friend?"]
+    single = HFTransformersLanguage(
+        "sshleifer/tiny-gpt2", batch_size=1, framework=tensor_type
+    )
+    batched = HFTransformersLanguage(
+        "sshleifer/tiny-gpt2", batch_size=3, framework=tensor_type
+    )
+    emb_single, emb_batched = single[sentences], batched[sentences]
+    for s in sentences:
+        assert np.allclose(emb_single[s].vector, emb_batched[s].vector, atol=1e-5)
+
+
+def test_length_buckets():
+    batches = length_buckets([3, 5, 1, 5, 2], batch_size=2)
+    assert [list(b) for b in batches] == [[1, 3], [0, 4], [2]]
+
+
+def test_masked_sum():
+    hidden_states = np.random.normal(size=(2, 3, 4))
+    mask = np.array([[1, 0, 1], [0, 1, 1]])
+    result = masked_sum(hidden_states, mask)
+    assert np.allclose(result[0], hidden_states[0, [0, 2]].sum(axis=0))
+    assert np.allclose(result[1], hidden_states[1, [1, 2]].sum(axis=0))
+
+
+@pytest.mark.parametrize("engine", ["quantized", "onnx"])
+def test_engines_match_default(engine):
+    if engine == "onnx":
+        pytest.importorskip("onnxruntime")
+    sentences = ["hello how are you?", "I'm fine, thanks!", "how about you?"]
+    lang = HFTransformersLanguage(
+        "sshleifer/tiny-distilroberta-base", engine=engine, n_threads=1, framework="pt"
+    )
+    assert lang[sentences].to_X().shape == (3, 2)
+    similarity = lang.check_engine(sentences, min_similarity=0.9)
+    assert similarity.shape == (3,)
+
+
+def test_n_threads_is_not_set_globally():
+    torch = pytest.importorskip("torch")
+    before = torch.get_num_threads()
+    lang = HFTransformersLanguage(
+        "sshleifer/tiny-distilroberta-base",
+        n_threads=before + 1,
+        framework="pt",
+    )
+    assert torch.get_num_threads() == before
+    lang[["hello how are you?", "I'm fine, thanks!"]]
+    assert torch.get_num_threads() == before
+
+
+def test_engine_raises_for_tensorflow():
+    with pytest.raises(ValueError):
+        HFTransformersLanguage("sshleifer/tiny-gpt2", engine="onnx", framework="tf")
+
+
+def test_unknown_engine_raises():
+    with pytest.raises(ValueError):
+        HFTransformersLanguage("sshleifer/tiny-gpt2", engine="tensorrt")
+
+
+@pytest.mark.parametrize("tensor_type", ["tf", "pt"])
+def test_bracket_spans_sum_to_sentence(tensor_type):
+    lang = HFTransformersLanguage(
+        "sshleifer/tiny-distilroberta-base", framework=tensor_type, use_fast=True
+    )
+    full = lang["bank of the river"].vector
+    spans = lang[["[bank] of the river", "bank [of the] river", "bank of the [river]"]]
+    assert np.allclose(spans.to_X().sum(axis=0), full, atol=1e-5)
+
+
+def test_bracket_spans_share_forward_pass():
+    lang = HFTransformersLanguage(
+        "sshleifer/tiny-distilroberta-base", framework="pt", use_fast=True
+    )
+    queries = ["[bank] of the river", "money at the [bank]", "bank of the [river]"]
+    batched = lang[queries]
+    for q in queries:
+        assert np.allclose(batched[q].vector, lang[q].vector, atol=1e-5)
+    assert not np.allclose(
+        batched["[bank] of the river"].vector, batched["money at the [bank]"].vector
+    )
+
+
+def test_bracket_spans_need_fast_tokenizer():
+    lang = HFTransformersLanguage("sshleifer/tiny-gpt2", use_fast=False)
+    with pytest.raises(ValueError):
+        lang["[bank] of the river"]
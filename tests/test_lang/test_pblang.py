@@ -1,5 +1,7 @@
 import pytest
+import numpy as np
 
+from whatlies import Embedding
 from whatlies.language import BytePairLanguage
 
 
@@ -22,3 +24,24 @@ def test_similar_retreival(lang):
 def test_raise_error(lang, item):
     with pytest.raises(ValueError):
         _ = lang[item]
+
+
+def test_batch_matches_single(lang):
+    queries = ["red", "blue dog", "the spanish inquisition"]
+    emb = lang[queries]
+    for q in queries:
+        assert np.allclose(emb[q].vector, lang.module.embed(q).mean(axis=0), atol=1e-6)
+
+
+def test_similar_searches_vocabulary(lang):
+    vector = lang.module.vectors[lang.module.words.index("▁the")]
+    results = lang.score_similar(Embedding("the", vector), 5)
+    assert results[0][0].name == "▁the"
+    assert np.allclose(results[0][0].vector, vector)
+    assert [s for e, s in results] == sorted(s for e, s in results)
+
+
+def test_analogy_excludes_query(lang):
+    results = lang.analogy("the", "of", "and", n=5)
+    assert len(results) == 5
+    assert not {"▁the", "▁of", "▁and"} & {e.name for e, s in results}
@@ -0,0 +1,87 @@
+import pytest
+import numpy as np
+from sense2vec import Sense2Vec
+
+from whatlies.embeddingset import EmbeddingSet
+from whatlies.language import Sense2VecLanguage
+from whatlies.language.sense2vec_lang import Sense2VecSpacyLanguage
+
+
+@pytest.fixture(scope="module")
+def s2v_path(tmp_path_factory):
+    words = [f"word{i}|{'NOUN' if i % 3 else 'VERB'}" for i in range(30)]
+    vectors = np.random.RandomState(42).normal(size=(30, 5)).astype(np.float32)
+    s2v = Sense2Vec(shape=vectors.shape)
+    for word, vec in zip(words, vectors):
+        s2v.add(word, vec)
+    path = tmp_path_factory.mktemp("s2v")
+    s2v.to_disk(path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def lang(s2v_path):
+    return Sense2VecLanguage(sense2vec_path=s2v_path)
+
+
+def test_batch_lookup(lang):
+    queries = ["word1|NOUN", "word3|VERB", "word2|NOUN"]
+    embset = lang[queries]
+    for q in queries:
+        assert np.allclose(embset[q].vector, lang.s2v[q])
+    with pytest.raises(ValueError):
+        lang[["word1|NOUN", "word1|VERB"]]
+
+
+def test_score_similar_matches_most_similar(lang):
+    result = lang.score_similar("word1|NOUN", n=5)
+    expected = lang.s2v.most_similar("word1|NOUN", n=5)
+    assert [e.name for e, _ in result] == [w for w, _ in expected]
+    assert np.allclose([s for _, s in result], [s for _, s in expected], atol=1e-5)
+
+
+def test_score_similar_senses(lang):
+    result = lang.score_similar("word1|NOUN", n=4, senses="VERB")
+    assert len(result) == 4
+    assert all(e.name.endswith("|VERB") for e, _ in result)
+    assert len(lang.embset_similar("word3|VERB", n=3, senses=["VERB"])) == 3
+    with pytest.raises(ValueError):
+        lang.score_similar("word1|NOUN", senses="ADJ")
+
+
+def test_score_similar_many(lang):
+    queries = ["word1|NOUN", "word3|VERB", "word2|NOUN"]
+    many = lang.score_similar_many(queries, n=3, senses="NOUN", batch_size=2)
+    for q, result in zip(queries, many):
+        single = lang.score_similar(q, n=3, senses="NOUN")
+        assert [e.name for e, _ in result] == [e.name for e, _ in single]
+        assert q not in [e.name for e, _ in result]
+
+
+def test_score_similar_many_default_batch_size(lang):
+    queries = [f"word{i}|{'NOUN' if i % 3 else 'VERB'}" for i in range(30)]
+    many = lang.score_similar_many(queries, n=3)
+    single = [lang.score_similar(q, n=3) for q in queries]
+    for a, b in zip(many, single):
+        assert [e.name for e, _ in a] == [e.name for e, _ in b]
+        assert np.allclose([s for _, s in a], [s for _, s in b])
+
+
+def test_unknown_key_raises(lang):
+    with pytest.raises(ValueError):
+        lang["word1|VERB"]
+    with pytest.raises(ValueError):
+        lang.score_similar("word1|VERB")
+
+
+def test_spacy_lang_batches_queries(s2v_path):
+    lang = Sense2VecSpacyLanguage("tests/custom_test_lang/", s2v_path, batch_size=2)
+    queries = ["red green", "[red] green", "red [green]"]
+    embset = lang[queries]
+    assert isinstance(embset, EmbeddingSet)
+    for q in queries:
+        assert np.allclose(embset[q].vector, lang[q].vector)
+    doc = lang.nlp("red green")
+    assert np.allclose(embset["red green"].vector, doc.vector)
+    assert np.allclose(embset["[red] green"].vector, doc[0:1].vector)
+    assert np.allclose(embset["red [green]"].vector, doc[1:2].vector)
@@ -102,3 +102,42 @@ def test_raise_warning(color_lang):
     print([w for w in color_lang.nlp.vocab])
     with pytest.warns(UserWarning):
         color_lang.score_similar("red", 100, prob_limit=None, lower=False)
+
+
+def test_batched_retreival_matches_single(color_lang):
+    queries = ["red green", "[blue] purple", "green [red blue] pink", "red"]
+    color_lang.batch_size = 2
+    emb = color_lang[queries]
+    for q in queries:
+        assert np.allclose(emb[q].vector, color_lang[q].vector)
+
+
+def test_disabled_components_are_skipped(color_lang):
+    def breaks_vectors(doc):
+        raise RuntimeError("this component should not run")
+
+    color_lang.model.add_pipe(breaks_vectors, name="parser")
+    assert color_lang["red"].vector.shape == (2,)
+    color_lang.disable = None
+    with pytest.raises(RuntimeError):
+        color_lang["red"]
+
+
+def test_embset_proximity(color_lang):
+    emb = color_lang.embset_proximity("blue", max_proximity=0.1, prob_limit=None)
+    assert set(emb.embeddings.keys()) == {"blue", "purple"}
+
+
+def test_similarity_masks_are_cached(color_lang):
+    color_lang.score_similar("red", n=2, prob_limit=None, lower=True)
+    table = color_lang._get_vectors_table()
+    mask = table.mask(None, True)
+    color_lang.score_similar("blue", n=2, prob_limit=None, lower=True)
+    assert table.mask(None, True) is mask
+    assert [table.words[i] for i in mask.nonzero()[0]] == table.words
+
+
+def test_embed_parallel(color_lang):
+    queries = ["red", "green", "red green", "[red] green", "blue"] * 3
+    embset = color_lang.embed_parallel(queries, n_workers=2, chunk_size=2)
+    assert np.allclose(embset.to_X(), color_lang[queries].to_X())
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 
 from whatlies.language import TFHubLanguage
 
@@ -27,3 +28,11 @@ def test_basic_usage(lang, expected_shape):
     emb = lang[["test", "a simple test sentence", "and another nice sentence"]]
     assert len(emb) == 3
     assert emb["test"].vector.shape == expected_shape
+
+
+def test_batch_size_does_not_change_embeddings():
+    url = "https://tfhub.dev/google/tf2-preview/gnews-swivel-20dim/1"
+    sentences = ["test", "a simple test sentence", "and another nice sentence"]
+    single = TFHubLanguage(url, batch_size=1)[sentences]
+    batched = TFHubLanguage(url, batch_size=2)[sentences]
+    assert np.allclose(single.to_X(), batched.to_X(), atol=1e-5)
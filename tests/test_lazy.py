@@ -0,0 +1,91 @@
+import pytest
+import numpy as np
+
+from whatlies import Embedding, EmbeddingSet, lazy
+
+
+@pytest.fixture
+def embset():
+    names = ["king", "man", "woman", "royal", "queen"]
+    vectors = np.random.RandomState(42).normal(0, 1, (len(names), 4))
+    return EmbeddingSet(*[Embedding(n, v) for n, v in zip(names, vectors)])
+
+
+def test_lazy_embedding_matches_eager(embset):
+    king, man, woman, royal = [embset[w] for w in ["king", "man", "woman", "royal"]]
+    eager = (king - man + woman) | royal
+    lazy = (king.lazy() - man + woman.lazy()) | royal.lazy()
+    assert lazy.name == eager.name
+    assert np.allclose(lazy.vector, eager.vector)
+    result = lazy.evaluate()
+    assert isinstance(result, Embedding)
+    assert result.name == eager.name
+    assert result.orig == "king"
+
+
+@pytest.mark.parametrize("op", ["+", "-", ">>", "|"])
+def test_lazy_embeddingset_matches_eager(embset, op):
+    ops = {
+        "+": lambda a, b: a + b,
+        "-": lambda a, b: a - b,
+        ">>": lambda a, b: a >> b,
+        "|": lambda a, b: a | b,
+    }
+    other = embset["man"] - embset["woman"]
+    eager = ops[op](ops[op](embset, other), embset["royal"])
+    lazy = ops[op](ops[op](embset.lazy(), other), embset["royal"].lazy())
+    assert lazy.name == eager.name
+    assert np.allclose(lazy.to_X(), eager.to_X())
+    result = lazy.evaluate()
+    assert isinstance(result, EmbeddingSet)
+    assert result.name == eager.name
+    for k in embset.embeddings.keys():
+        assert result[k].name == eager[k].name
+        assert result[k].orig == eager[k].orig
+
+
+@pytest.fixture
+def kernel_calls(monkeypatch):
+    calls = []
+    for symbol, func in list(lazy.OPERATIONS.items()):
+
+        def counted(a, b, symbol=symbol, func=func):
+            calls.append(symbol)
+            return func(a, b)
+
+        monkeypatch.setitem(lazy.OPERATIONS, symbol, counted)
+    return calls
+
+
+def test_lazy_shared_subexpression_evaluated_once(embset, kernel_calls):
+    diff = embset["man"].lazy() - embset["woman"]
+    expr = (embset.lazy() - diff) | diff
+    result = expr.to_X()
+    assert kernel_calls == ["-", "-", "|"]
+    assert np.allclose(result, ((embset - diff.evaluate()) | diff.evaluate()).to_X())
+    expr.to_X()
+    assert kernel_calls == ["-", "-", "|"]
+
+
+def test_lazy_follows_changes_to_the_leaves(embset, kernel_calls):
+    expr = embset.lazy() - embset["man"]
+    expr.to_X()
+    embset.append(Embedding("new", [1.0, 2.0, 3.0, 4.0]))
+    assert np.allclose(expr.to_X(), (embset - embset["man"]).to_X())
+    embset.embeddings["king"] = Embedding("king", [0.0, 0.0, 0.0, 0.0])
+    assert np.allclose(expr.to_X(), (embset - embset["man"]).to_X())
+    embset["man"].vector = [1.0, 1.0, 1.0, 1.0]
+    assert np.allclose(expr.to_X(), (embset - embset["man"]).to_X())
+    assert len(kernel_calls) == 4
+
+
+def test_lazy_keeps_properties(embset):
+    result = (
+        embset.add_property("group", lambda d: "one").lazy() + embset["man"]
+    ).evaluate()
+    assert all(e.group == "one" for e in result)
+
+
+def test_lazy_set_on_right_raises(embset):
+    with pytest.raises(ValueError):
+        embset["man"].lazy() - embset
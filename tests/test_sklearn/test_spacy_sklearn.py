@@ -32,7 +32,8 @@ def test_check_sizes(color_lang, text):
 
 
 def test_get_params():
-    assert "nlp" in SpacyLanguage("tests/custom_test_lang/").get_params().keys()
+    params = SpacyLanguage("tests/custom_test_lang/").get_params().keys()
+    assert {"nlp", "batch_size", "n_process", "disable"} <= set(params)
 
 
 checks = (
@@ -1,9 +1,6 @@
-import matplotlib.pylab as plt
-import networkx as nx
-
 import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import distance_metrics
+
+from whatlies.distance import calculate_distances
 
 
 def handle_2d_plot(
@@ -27,6 +24,8 @@ def handle_2d_plot(
     - ylabel: manually override the ylabel
     - show_operations: setting to also show the applied operations, only works for `text`
     """
+    import matplotlib.pylab as plt
+
     name = embedding.name if show_operations else embedding.orig
     if kind == "scatter":
         if color is None:
@@ -52,7 +51,7 @@ def handle_2d_plot(
     plt.ylabel("y" if not ylabel else ylabel)
 
 
-def plot_graph_layout(embedding_set, kind="cosine", **kwargs):
+def plot_graph_layout(embedding_set, kind="cosine", n_jobs=1, **kwargs):
     """
     Handles the plotting of a layout graph using the embeddings in an embeddingset as input.
 
@@ -60,12 +59,19 @@ def plot_graph_layout(embedding_set, kind="cosine", **kwargs):
 
     - embeddings: a set of `whatlies.Embedding` objects to plot
     - kind: distance metric options: 'cityblock', 'cosine', 'euclidean', 'l2', 'l1', 'manhattan',
+    - n_jobs: number of threads used to calculate the distances, -1 means all cores
     """
+    import networkx as nx
+    import pandas as pd
+    from sklearn.metrics.pairwise import distance_metrics
 
     vectors = [token.vector for k, token in embedding_set.items()]
     label_dict = {i: w for i, (w, _) in enumerate(embedding_set.items())}
-    dist_fnc = distance_metrics()[kind]
-    dist = dist_fnc(np.array(vectors), np.array(vectors))
+    if kind not in distance_metrics():
+        raise ValueError(f"The `kind` should be one of {list(distance_metrics())}")
+    dist = calculate_distances(
+        np.array(vectors), np.array(vectors), metric=kind, n_jobs=n_jobs
+    )
     # Greate graph
     graph = nx.from_numpy_matrix(dist)
     distance = pd.DataFrame(dist).to_dict()
@@ -0,0 +1,366 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BLOCK_SIZE = 4096
+
+# metrics that have a specialised numpy kernel, the rest is handled by scikit-learn
+KERNEL_METRICS = {
+    "cosine": "cosine",
+    "euclidean": "euclidean",
+    "l2": "euclidean",
+    "manhattan": "manhattan",
+    "cityblock": "manhattan",
+    "l1": "manhattan",
+    "dot": "dot",
+}
+
+
+def vector_distances(X, vec, metric="cosine", norms=None, vec_norm=None):
+    """
+    Calculates the distance between every row of `X` and a single vector. Common metrics
+    are handled by numpy kernels that skip the validation overhead of scikit-learn, other
+    metrics fall back to `sklearn.metrics.pairwise_distances`.
+
+    The `"dot"` metric is the negative dot product such that smaller still means closer.
+
+    Arguments:
+        X: matrix of shape `(n_rows, dim)` or a single vector of shape `(dim,)`
+        vec: vector of shape `(dim,)`
+        metric: metric to use to calculate distance, must be scipy or sklearn compatible or `"dot"`
+        norms: precomputed norms of the rows of `X`, only used for cosine distances
+        vec_norm: precomputed norm of `vec`, only used for cosine distances
+
+    Returns:
+        An array of shape `(n_rows,)` or a float when `X` is a single vector.
+    """
+    X, vec = np.asarray(X), np.asarray(vec)
+    kernel = KERNEL_METRICS.get(metric)
+    if kernel == "cosine":
+        norms = np.linalg.norm(X, axis=-1) if norms is None else norms
+        vec_norm = np.linalg.norm(vec) if vec_norm is None else vec_norm
+        dots = X @ vec
+        if X.ndim == 1:
+            denom = float(norms * vec_norm)
+            sim = float(dots) / denom if denom > 0 else 0.0
+            return min(max(1.0 - sim, 0.0), 2.0)
+        denom = np.broadcast_to(np.asarray(norms * vec_norm, dtype=float), dots.shape)
+        sim = np.divide(dots, denom, out=np.zeros(dots.shape), where=denom > 0)
+        return np.clip(1.0 - sim, 0.0, 2.0)
+    if kernel == "euclidean":
+        diff = X - vec
+        return np.sqrt(np.einsum("...i,...i->...", diff, diff))
+    if kernel == "manhattan":
+        return np.abs(X - vec).sum(axis=-1)
+    if kernel == "dot":
+        return -(X @ vec)
+    # scikit-learn is only needed for the other metrics, importing it is slow
+    from sklearn.metrics import pairwise_distances
+
+    dist = pairwise_distances(np.atleast_2d(X), vec.reshape(1, -1), metric=metric)
+    return dist[:, 0] if X.ndim == 2 else dist[0, 0]
+
+
+def _block_distances(X, Y, metric):
+    if Y.shape[0] == 1:
+        return vector_distances(X, Y[0], metric=metric)[:, None]
+    if metric == "dot":
+        return -(X @ Y.T)
+    from sklearn.metrics import pairwise_distances
+
+    return pairwise_distances(X, Y, metric=metric)
+
+
+def effective_n_jobs(n_jobs=1):
+    """
+    Translates a scikit-learn style `n_jobs` setting into a number of threads.
+
+    Arguments:
+        n_jobs: number of threads, `None` means 1 and negative numbers count back from the number of cores (-1 is all)
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs == 0:
+        raise ValueError("The `n_jobs` setting cannot be 0.")
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+
+def _row_blocks(n_rows, block_size):
+    return [slice(i, min(i + block_size, n_rows)) for i in range(0, n_rows, block_size)]
+
+
+def _map_blocks(func, n_rows, n_jobs=1, block_size=BLOCK_SIZE):
+    """
+    Applies `func` to every row block, in a thread pool when there's more than one block
+    to handle. NumPy releases the GIL for the heavy lifting so threads are sufficient.
+    """
+    blocks = _row_blocks(n_rows, block_size)
+    n_threads = min(effective_n_jobs(n_jobs), len(blocks))
+    if n_threads <= 1:
+        return [func(b) for b in blocks]
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        return list(pool.map(func, blocks))
+
+
+def calculate_distances(X, Y, metric="cosine", n_jobs=1, block_size=BLOCK_SIZE):
+    """
+    Calculates the distances between all the rows of `X` and all the rows of `Y`. The rows
+    of `X` are split into blocks that are handled in parallel.
+
+    Arguments:
+        X: matrix of shape `(n_x, dim)`
+        Y: matrix of shape `(n_y, dim)`
+        metric: metric to use to calculate distance, must be scipy or sklearn compatible or `"dot"`
+        n_jobs: number of threads to use, -1 means all cores
+        block_size: number of rows of `X` handled per block
+
+    Returns:
+        A distance matrix of shape `(n_x, n_y)`.
+    """
+    X, Y = np.asarray(X), np.asarray(Y)
+    if X.shape[0] == 0:
+        return np.zeros((0, Y.shape[0]))
+    blocks = _map_blocks(
+        lambda b: _block_distances(X[b], Y, metric),
+        n_rows=X.shape[0],
+        n_jobs=n_jobs,
+        block_size=block_size,
+    )
+    return np.concatenate(blocks, axis=0)
+
+
+def distances_to_vector(
+    X, vec, metric="cosine", norms=None, n_jobs=1, block_size=BLOCK_SIZE
+):
+    """
+    Calculates the distance between every row of `X` and a single vector. The rows are
+    split into blocks that are handled in parallel.
+
+    Arguments:
+        X: matrix of shape `(n_rows, dim)`
+        vec: vector of shape `(dim,)`
+        metric: metric to use to calculate distance, must be scipy or sklearn compatible or `"dot"`
+        norms: precomputed norms of the rows of `X`, only used for cosine distances
+        n_jobs: number of threads to use, -1 means all cores
+        block_size: number of rows of `X` handled per block
+
+    Returns:
+        An array of shape `(n_rows,)`.
+    """
+    vec = np.asarray(vec).reshape(-1)
+    vec_norm = np.linalg.norm(vec)
+    if X.shape[0] == 0:
+        return np.zeros(0)
+
+    def block_distances(b):
+        block_norms = None if norms is None else norms[b]
+        return vector_distances(X[b], vec, metric, norms=block_norms, vec_norm=vec_norm)
+
+    blocks = _map_blocks(
+        block_distances, n_rows=X.shape[0], n_jobs=n_jobs, block_size=block_size
+    )
+    return np.concatenate(blocks)
+
+
+def _smallest(distances, n):
+    """Returns the indices of the `n` smallest distances, sorted by distance then index."""
+    if n < distances.shape[0]:
+        idx = np.argpartition(distances, n - 1)[:n]
+    else:
+        idx = np.arange(distances.shape[0])
+    return idx[np.lexsort((idx, distances[idx]))]
+
+
+def top_n_nearest(
+    X,
+    vec,
+    n=10,
+    metric="cosine",
+    n_jobs=1,
+    block_size=BLOCK_SIZE,
+    norms=None,
+    mask=None,
+):
+    """
+    Finds the rows of `X` that are closest to `vec`. Every block of rows keeps only its
+    own `n` best candidates so the final merge never has to sort the full vocabulary.
+
+    Arguments:
+        X: matrix of shape `(n_rows, dim)`
+        vec: vector of shape `(dim,)`
+        n: the number of rows you'd like to see returned
+        metric: metric to use to calculate distance, must be scipy or sklearn compatible or `"dot"`
+        n_jobs: number of threads to use, -1 means all cores
+        block_size: number of rows of `X` handled per block
+        norms: precomputed norms of the rows of `X`, only used for cosine distances
+        mask: boolean array that marks the rows of `X` that may be returned, all rows when `None`
+
+    Returns:
+        A tuple `(indices, distances)` of at most `n` rows, sorted from close to far.
+    """
+    X = np.asarray(X)
+    vec = np.asarray(vec).reshape(-1)
+    vec_norm = np.linalg.norm(vec)
+    n = min(n, X.shape[0] if mask is None else int(np.count_nonzero(mask)))
+    if n <= 0:
+        return np.zeros(0, dtype=int), np.zeros(0)
+
+    def block_candidates(b):
+        block_norms = None if norms is None else norms[b]
+        dist = vector_distances(X[b], vec, metric, norms=block_norms, vec_norm=vec_norm)
+        if mask is not None:
+            dist = np.where(mask[b], dist, np.inf)
+        idx = _smallest(dist, n)
+        return idx + b.start, dist[idx]
+
+    candidates = _map_blocks(
+        block_candidates, n_rows=X.shape[0], n_jobs=n_jobs, block_size=block_size
+    )
+    idx = np.concatenate([c[0] for c in candidates])
+    dist = np.concatenate([c[1] for c in candidates])
+    best = _smallest(dist, n)
+    return idx[best], dist[best]
+
+
+def normalize_rows(X):
+    """Scales every row of `X` to unit length, zero rows are kept as zero rows."""
+    X = np.asarray(X, dtype=float)
+    norms = np.linalg.norm(X, axis=-1, keepdims=True)
+    return np.divide(X, norms, out=np.zeros(X.shape), where=norms > 0)
+
+
+def analogy_search(
+    normed,
+    A,
+    B,
+    C,
+    n=1,
+    method="3cosadd",
+    exclude=None,
+    n_jobs=1,
+    block_size=BLOCK_SIZE,
+    index=None,
+):
+    """
+    Solves a batch of analogies "`A` is to `B` as `C` is to ?" against a matrix of
+    normalised vectors. The vocabulary is scored in blocks, as a matrix product per block,
+    and only the best `n` candidates of every block are kept.
+
+    Arguments:
+        normed: matrix of shape `(n_rows, dim)` with unit length rows
+        A: matrix of shape `(n_queries, dim)`
+        B: matrix of shape `(n_queries, dim)`
+        C: matrix of shape `(n_queries, dim)`
+        n: the number of answers you'd like to see returned per analogy
+        method: either `"3cosadd"` or `"3cosmul"`
+        exclude: integer matrix of shape `(n_queries, k)` with rows that cannot be an answer, -1 is ignored
+        n_jobs: number of threads to use, -1 means all cores
+        block_size: number of rows of `normed` handled per block
+        index: integer array that maps every candidate answer to its row in `normed`, when
+            many candidates share a row, by default every row is a candidate
+
+    Returns:
+        A tuple `(indices, scores)`, both of shape `(n_queries, n)`, sorted from best to worst.
+        The indices refer to the candidates and excluded candidates have a score of `-inf`.
+    """
+    if method not in ["3cosadd", "3cosmul"]:
+        raise ValueError(
+            f"The `method` should be '3cosadd' or '3cosmul', got {method}."
+        )
+    A, B, C = [normalize_rows(np.atleast_2d(M)) for M in (A, B, C)]
+    target = B - A + C
+    n_candidates = normed.shape[0] if index is None else len(index)
+    n = min(n, n_candidates)
+
+    def block_candidates(b):
+        rows = normed[b] if index is None else normed[index[b]]
+        if method == "3cosadd":
+            scores = target @ rows.T
+        else:
+            # cosines are shifted to [0, 1] as proposed by Levy and Goldberg
+            cos_a, cos_b, cos_c = [(M @ rows.T + 1) / 2 for M in (A, B, C)]
+            scores = cos_b * cos_c / (cos_a + 1e-3)
+        if exclude is not None:
+            local = exclude - b.start
+            valid = (exclude >= 0) & (local >= 0) & (local < rows.shape[0])
+            query_idx, k_idx = np.nonzero(valid)
+            scores[query_idx, local[query_idx, k_idx]] = -np.inf
+        k = min(n, rows.shape[0])
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        return idx + b.start, np.take_along_axis(scores, idx, axis=1)
+
+    candidates = _map_blocks(
+        block_candidates, n_rows=n_candidates, n_jobs=n_jobs, block_size=block_size
+    )
+    idx = np.concatenate([c[0] for c in candidates], axis=1)
+    scores = np.concatenate([c[1] for c in candidates], axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :n]
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(
+        scores, order, axis=1
+    )
+
+
+def solve_analogies(
+    lookup,
+    words,
+    word_index,
+    normed,
+    a,
+    b,
+    c,
+    n=1,
+    method="3cosadd",
+    n_jobs=1,
+    index=None,
+):
+    """
+    Shared implementation of `.analogy()` for an `EmbeddingSet` or a language backend.
+
+    Arguments:
+        lookup: object that turns a string into an `Embedding` via `lookup[string]`
+        words: the word that belongs to every row of `normed`, or to every entry of `index`
+        word_index: dictionary that maps a word to its position in `words`
+        normed: matrix with unit length rows to search
+        a: a word or a list of words
+        b: a word or a list of words
+        c: a word or a list of words
+        n: the number of answers you'd like to see returned per analogy
+        method: either `"3cosadd"` or `"3cosmul"`
+        n_jobs: number of threads to use, -1 means all cores
+        index: integer array that maps every word to its row in `normed`, for tables where words share rows
+
+    Returns:
+        A list of (Embedding, score) tuples, or a list of these lists when a batch is passed.
+    """
+    batch = not isinstance(a, str)
+    a, b, c = [list(q) if batch else [q] for q in (a, b, c)]
+    if not len(a) == len(b) == len(c):
+        raise ValueError("You must pass the same number of `a`, `b` and `c` words.")
+    vectors = {q: lookup[q].vector for q in set(a + b + c)}
+    A, B, C = [np.array([vectors[q] for q in qs]) for qs in (a, b, c)]
+    exclude = np.array(
+        [[word_index.get(q, -1) for q in triple] for triple in zip(a, b, c)]
+    )
+    idx, scores = analogy_search(
+        normed,
+        A,
+        B,
+        C,
+        n=n,
+        method=method,
+        exclude=exclude,
+        n_jobs=n_jobs,
+        index=index,
+    )
+    results = [
+        [
+            (lookup[words[i]], float(s))
+            for i, s in zip(row_idx, row_scores)
+            if s > -np.inf
+        ]
+        for row_idx, row_scores in zip(idx, scores)
+    ]
+    return results if batch else results[0]
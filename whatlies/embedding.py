@@ -2,9 +2,10 @@ from typing import Union
 from copy import deepcopy
 
 import numpy as np
-from sklearn.metrics import pairwise_distances
 
 from whatlies.common import handle_2d_plot
+from whatlies.lazy import LazyEmbedding, _Leaf
+from whatlies.distance import vector_distances, calculate_distances, KERNEL_METRICS
 
 
 class Embedding:
@@ -29,16 +30,59 @@ class Embedding:
     ```
     """
 
+    # the number of new vectors that were assigned to embeddings in an `EmbeddingSet`
+    _reassigned = 0
+
     def __init__(self, name, vector, orig=None):
         self.orig = name if not orig else orig
         self.name = name
-        self.vector = np.array(vector)
+        self.vector = vector
+
+    @property
+    def vector(self):
+        return self._vector
+
+    @vector.setter
+    def vector(self, value):
+        # the vector is read-only such that the cached norm cannot go stale, a new
+        # vector has to be assigned instead which invalidates the cached norm
+        self._vector = np.array(value)
+        self._vector.setflags(write=False)
+        self._norm = None
+        if self.__dict__.get("_in_set"):
+            # the sets that cache the vectors compare this count, see `EmbeddingSet._in_sync`
+            Embedding._reassigned += 1
+
+    def __getstate__(self):
+        # copies and pickles are not part of the sets that the original is in
+        state = self.__dict__.copy()
+        state.pop("_in_set", None)
+        return state
 
     def add_property(self, name, func):
         result = Embedding(name=self.name, vector=self.vector, orig=self.orig,)
         setattr(result, name, func(result))
         return result
 
+    def lazy(self):
+        """
+        Returns a [LazyEmbedding][whatlies.lazy.LazyEmbedding] of this embedding. Arithmetic on
+        it builds an expression that is only calculated when the vector is requested.
+
+        Usage:
+
+        ```python
+        from whatlies.embedding import Embedding
+
+        foo = Embedding("foo", [0.1, 0.3])
+        bar = Embedding("bar", [0.7, 0.2])
+
+        expr = foo.lazy() - bar + bar
+        expr.evaluate()
+        ```
+        """
+        return LazyEmbedding(_Leaf(self))
+
     def __add__(self, other) -> "Embedding":
         """
         Add two embeddings together.
@@ -150,11 +194,15 @@ class Embedding:
     @property
     def norm(self):
         """Gives the norm of the vector of the embedding"""
-        return np.linalg.norm(self.vector)
+        if self._norm is None:
+            self._norm = np.linalg.norm(self.vector)
+        return self._norm
 
     def distance(self, other, metric: str = "cosine"):
         """
-        Calculates the vector distance between two embeddings.
+        Calculates the vector distance between two embeddings. The metrics `cosine`, `euclidean`,
+        `manhattan` and `dot` (the negative dot product) have a fast path, other metrics
+        are calculated by scikit-learn.
 
         Arguments:
             other: the other embedding you're comparing against
@@ -173,7 +221,72 @@ class Embedding:
         foo.distance(bar, metric="cosine")
         ```
         """
-        return pairwise_distances([self.vector], [other.vector], metric=metric)[0][0]
+        return float(
+            vector_distances(
+                self.vector, other.vector, metric, norms=self.norm, vec_norm=other.norm
+            )
+        )
+
+    def similarity(self, other, metric: str = "cosine"):
+        """
+        Calculates the vector similarity between two embeddings. For `cosine` this is the
+        cosine similarity and for `dot` it is the dot product. For all other metrics the
+        similarity is the negative distance.
+
+        Arguments:
+            other: the other embedding you're comparing against
+            metric: the metric to use, can be `cosine`, `dot` or any metric that `distance` supports
+
+        **Usage**
+
+        ```python
+        from whatlies.embedding import Embedding
+
+        foo = Embedding("foo", [1.0, 0.0])
+        bar = Embedding("bar", [0.5, 0.5])
+
+        foo.similarity(bar)
+        foo.similarity(bar, metric="dot")
+        ```
+        """
+        distance = self.distance(other, metric=metric)
+        return 1.0 - distance if metric == "cosine" else -distance
+
+    def distances_to(self, embset, metric: str = "cosine", n_jobs=1):
+        """
+        Calculates the distance between this embedding and every embedding in an
+        [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] in one go.
+
+        Arguments:
+            embset: the [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] to compare against
+            metric: the distance metric to use, see `distance` for the options
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
+
+        Returns:
+            A numpy array with a distance for every embedding in the set, in the same order as the set.
+
+        **Usage**
+
+        ```python
+        from whatlies.embedding import Embedding
+        from whatlies.embeddingset import EmbeddingSet
+
+        foo = Embedding("foo", [1.0, 0.0])
+        bar = Embedding("bar", [0.0, 0.5])
+        buz = Embedding("buz", [0.5, 0.5])
+
+        foo.distances_to(EmbeddingSet(foo, bar, buz))
+        ```
+        """
+        if KERNEL_METRICS.get(metric) == "cosine":
+            # the normalised matrix is cached by the set so this is a single product
+            X = embset._normalized_matrix()
+            return vector_distances(
+                X, self.vector, metric, norms=1.0, vec_norm=self.norm
+            )
+        return calculate_distances(
+            embset._matrix(), self.vector.reshape(1, -1), metric, n_jobs=n_jobs
+        )[:, 0]
 
     def plot(
         self,
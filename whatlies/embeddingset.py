@@ -1,16 +1,69 @@
 from typing import Union
 from copy import deepcopy
 from functools import reduce
+from itertools import count
 
 import numpy as np
-import pandas as pd
-import matplotlib.pylab as plt
-import altair as alt
-from sklearn.metrics import pairwise_distances
-from sklearn.metrics.pairwise import paired_distances
 
 from whatlies.embedding import Embedding
+from whatlies.lazy import LazyEmbeddingSet, _Leaf
 from whatlies.common import plot_graph_layout
+from whatlies.distance import (
+    calculate_distances,
+    top_n_nearest,
+    normalize_rows,
+    solve_analogies,
+)
+
+# versions are unique over all sets, such that a replaced dictionary never looks unchanged
+_versions = count()
+
+
+class _EmbeddingDict(dict):
+    """
+    The dictionary with the embeddings of an `EmbeddingSet`. Every change gives it a new
+    `version`, such that the set can tell when its cached matrices are out of date.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._changed()
+
+    def _changed(self):
+        self.version = next(_versions)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._changed()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self._changed()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._changed()
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self._changed()
 
 
 class EmbeddingSet:
@@ -41,12 +94,35 @@ class EmbeddingSet:
         if not name:
             name = "Emb"
         self.name = name
-        if len(embeddings) == 1:
-            # we assume it is a dictionary here
+        if len(embeddings) == 1 and isinstance(embeddings[0], dict):
+            # we copy the dictionary such that `append` cannot alter the input
             self.embeddings = embeddings[0]
         else:
             # we assume it is a tuple of tokens
             self.embeddings = {t.name: t for t in embeddings}
+        # the stacked vectors are cached lazily, see `_matrix`
+        self._buffer = None
+        self._normed = None
+        self._index = {}
+        self._size = 0
+        # the version of `embeddings` that the cached matrices belong to
+        self._version = None
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    @embeddings.setter
+    def embeddings(self, value):
+        self._embeddings = _EmbeddingDict(value)
+        self._buffer, self._normed = None, None
+
+    def _current_version(self):
+        # vectors are read-only, but a new one can be assigned to an embedding in the set
+        return self.embeddings.version, Embedding._reassigned
+
+    def _in_sync(self):
+        return self._buffer is not None and self._version == self._current_version()
 
     def __contains__(self, item):
         """
@@ -177,6 +253,28 @@ class EmbeddingSet:
         new_embeddings = {k: emb >> other for k, emb in self.embeddings.items()}
         return EmbeddingSet(new_embeddings, name=f"({self.name} >> {other.name})")
 
+    def lazy(self):
+        """
+        Returns a [LazyEmbeddingSet][whatlies.lazy.LazyEmbeddingSet] of this set. Arithmetic on
+        it builds an expression that is calculated for the entire matrix at once when it
+        is evaluated, instead of embedding by embedding.
+
+        Usage:
+
+        ```python
+        from whatlies.embedding import Embedding
+        from whatlies.embeddingset import EmbeddingSet
+
+        foo = Embedding("foo", [0.1, 0.3])
+        bar = Embedding("bar", [0.7, 0.2])
+        buz = Embedding("buz", [0.1, 0.9])
+        emb = EmbeddingSet(foo, bar)
+
+        (emb.lazy() | (buz - foo)).evaluate()
+        ```
+        """
+        return LazyEmbeddingSet(_Leaf(self))
+
     def compare_against(self, other, mapping="direct"):
         if mapping == "direct":
             return [v > other for k, v in self.embeddings.items()]
@@ -199,8 +297,134 @@ class EmbeddingSet:
         X = emb.to_X()
         ```
         """
-        X = np.array([i.vector for i in self.embeddings.values()])
-        return X
+        return self._matrix().copy()
+
+    def _matrix(self):
+        """
+        Returns a view on the cached matrix with all the vectors in the set. The cache is
+        (re)built whenever `embeddings` changed since it was made, `append` and `extend`
+        keep it up to date.
+        """
+        if not self._in_sync():
+            X = np.array([i.vector for i in self.embeddings.values()])
+            if X.ndim != 2:
+                return X
+            self._buffer, self._normed, self._size = X, None, X.shape[0]
+            self._index = {k: i for i, k in enumerate(self.embeddings.keys())}
+            for e in self.embeddings.values():
+                e._in_set = True
+            self._version = self._current_version()
+        return self._buffer[: self._size]
+
+    def _normalized_matrix(self):
+        """
+        Returns a view on the cached matrix with all the vectors scaled to unit length,
+        zero vectors are kept as zero vectors.
+        """
+        X = self._matrix()
+        if X.ndim != 2:
+            # an empty set has nothing to normalize and no cached buffer
+            return X
+        if self._normed is None:
+            self._normed = np.zeros(self._buffer.shape)
+            self._normed[: self._size] = normalize_rows(X)
+        return self._normed[: self._size]
+
+    def _reserve(self, n_rows):
+        """Doubles the capacity of the cached buffers until `n_rows` fit."""
+        capacity = self._buffer.shape[0]
+        if n_rows <= capacity:
+            return
+        new_capacity = max(n_rows, 2 * capacity)
+        for attr in ["_buffer", "_normed"]:
+            old = getattr(self, attr)
+            if old is not None:
+                new = np.zeros((new_capacity, old.shape[1]), dtype=old.dtype)
+                new[: self._size] = old[: self._size]
+                setattr(self, attr, new)
+
+    def append(self, embedding: Embedding):
+        """
+        Adds a single embedding to the set, in-place. If an embedding with the same name
+        already exists it is replaced.
+
+        Arguments:
+            embedding: the [Embedding][whatlies.embedding.Embedding] to add
+
+        Usage:
+
+        ```python
+        from whatlies.embedding import Embedding
+        from whatlies.embeddingset import EmbeddingSet
+
+        foo = Embedding("foo", [0.1, 0.3])
+        bar = Embedding("bar", [0.7, 0.2])
+        emb = EmbeddingSet(foo)
+        emb.append(bar)
+        ```
+        """
+        return self.extend([embedding])
+
+    def extend(self, embeddings):
+        """
+        Adds many embeddings to the set, in-place. Embeddings with a name that already
+        exists in the set replace the old ones. Unlike `merge` this does not rebuild
+        the set, only the new vectors are written to the cached matrices.
+
+        Arguments:
+            embeddings: an iterable of [Embedding][whatlies.embedding.Embedding]s or another `EmbeddingSet`
+
+        Usage:
+
+        ```python
+        from whatlies.embedding import Embedding
+        from whatlies.embeddingset import EmbeddingSet
+
+        foo = Embedding("foo", [0.1, 0.3])
+        bar = Embedding("bar", [0.7, 0.2])
+        buz = Embedding("buz", [0.1, 0.9])
+        emb = EmbeddingSet(foo)
+        emb.extend([bar, buz])
+        ```
+        """
+        incoming = {e.name: e for e in embeddings}
+        if not incoming:
+            return self
+        in_sync = self._in_sync()
+        if in_sync:
+            dim = self._buffer.shape[1]
+        else:
+            existing = self.embeddings if len(self.embeddings) > 0 else incoming
+            dim = len(next(iter(existing.values())).vector)
+        if any(np.shape(e.vector) != (dim,) for e in incoming.values()):
+            raise ValueError(
+                f"All embeddings need to have dimension {dim} to be added to this EmbeddingSet."
+            )
+        if not in_sync:
+            # there is no cache to keep in sync, it will be built when needed
+            self.embeddings.update(incoming)
+            return self
+
+        vectors = np.array([e.vector for e in incoming.values()])
+        dtype = np.result_type(self._buffer, vectors)
+        if dtype != self._buffer.dtype:
+            # float vectors added to a set of int vectors should not be truncated
+            self._buffer = self._buffer.astype(dtype)
+        rows, n_new = [], 0
+        for name, emb in incoming.items():
+            if name not in self._index:
+                self._index[name] = self._size + n_new
+                n_new += 1
+            rows.append(self._index[name])
+            emb._in_set = True
+        self._reserve(self._size + n_new)
+        self._buffer[rows] = vectors
+        if self._normed is not None:
+            self._normed[rows] = normalize_rows(vectors)
+        self.embeddings.update(incoming)
+        self._size = len(self.embeddings)
+        self._version = self._current_version()
+        return self
 
     def to_X_y(self, y_label):
         """
@@ -371,7 +595,9 @@ class EmbeddingSet:
         x = self.to_X()
         return Embedding(name, np.mean(x, axis=0))
 
-    def embset_similar(self, emb: Union[str, Embedding], n: int = 10, metric="cosine"):
+    def embset_similar(
+        self, emb: Union[str, Embedding], n: int = 10, metric="cosine", n_jobs=1
+    ):
         """
         Retreive an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] that are the most simmilar to the passed query.
 
@@ -379,14 +605,17 @@ class EmbeddingSet:
             emb: query to use
             n: the number of items you'd like to see returned
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] containing the similar embeddings.
         """
-        embs = [w[0] for w in self.score_similar(emb, n, metric)]
+        embs = [w[0] for w in self.score_similar(emb, n, metric, n_jobs)]
         return EmbeddingSet({w.name: w for w in embs})
 
-    def score_similar(self, emb: Union[str, Embedding], n: int = 10, metric="cosine"):
+    def score_similar(
+        self, emb: Union[str, Embedding], n: int = 10, metric="cosine", n_jobs=1
+    ):
         """
         Retreive a list of (Embedding, score) tuples that are the most similar to the passed query.
 
@@ -394,6 +623,7 @@ class EmbeddingSet:
             emb: query to use
             n: the number of items you'd like to see returned
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An list of ([Embedding][whatlies.embedding.Embedding], score) tuples.
@@ -410,12 +640,62 @@ class EmbeddingSet:
                 )
             emb = self[emb]
 
-        vec = emb.vector
         queries = [w for w in self.embeddings.keys()]
-        vector_matrix = self.to_X()
-        distances = pairwise_distances(vector_matrix, vec.reshape(1, -1), metric=metric)
-        by_similarity = sorted(zip(queries, distances), key=lambda z: z[1])
-        return [(self[q], float(d)) for q, d in by_similarity[:n]]
+        idx, distances = top_n_nearest(
+            self._matrix(), emb.vector, n=n, metric=metric, n_jobs=n_jobs
+        )
+        return [(self[queries[i]], float(d)) for i, d in zip(idx, distances)]
+
+    def analogy(self, a, b, c, n: int = 1, method="3cosadd", n_jobs=1):
+        """
+        Solves the analogy "`a` is to `b` as `c` is to ?" using the embeddings in the set.
+        The words that are part of the analogy are never returned as an answer. You can
+        also pass lists of words to solve many analogies in one go, these are calculated
+        as matrix products against the cached normalised matrix of the set.
+
+        Arguments:
+            a: name of an embedding in the set, or a list of names
+            b: name of an embedding in the set, or a list of names
+            c: name of an embedding in the set, or a list of names
+            n: the number of answers you'd like to see returned per analogy
+            method: either `"3cosadd"` or `"3cosmul"`, see [Levy and Goldberg](https://www.aclweb.org/anthology/W14-1618/)
+            n_jobs: number of threads used to calculate the scores, -1 means all cores
+
+        Returns:
+            A list of ([Embedding][whatlies.embedding.Embedding], score) tuples or, when lists are passed,
+            a list of these lists. A higher score means a better answer.
+
+        Usage:
+
+        ```python
+        from whatlies.language import SpacyLanguage
+
+        lang = SpacyLanguage("en_core_web_md")
+        emb = lang[["man", "woman", "king", "queen", "prince", "princess"]]
+
+        emb.analogy("man", "king", "woman")
+        emb.analogy(["man", "man"], ["king", "prince"], ["woman", "woman"], n=2)
+        ```
+        """
+        queries = [a, b, c] if isinstance(a, str) else [*a, *b, *c]
+        for q in queries:
+            if q not in self.embeddings.keys():
+                raise ValueError(
+                    f"Embedding for `{q}` does not exist in this EmbeddingSet"
+                )
+        normed = self._normalized_matrix()
+        return solve_analogies(
+            self,
+            words=list(self.embeddings.keys()),
+            word_index=self._index,
+            normed=normed,
+            a=a,
+            b=b,
+            c=c,
+            n=n,
+            method=method,
+            n_jobs=n_jobs,
+        )
 
     def to_matrix(self):
         """
@@ -427,6 +707,8 @@ class EmbeddingSet:
         """
         Turns the embeddingset into a pandas dataframe.
         """
+        import pandas as pd
+
         mat = self.to_matrix()
         return pd.DataFrame(mat, index=list(self.embeddings.keys()))
 
@@ -451,6 +733,9 @@ class EmbeddingSet:
         emb1.movement_df(emb2)
         ```
         """
+        import pandas as pd
+        from sklearn.metrics.pairwise import paired_distances
+
         overlap = list(
             set(self.embeddings.keys()).intersection(set(other.embeddings.keys()))
         )
@@ -465,6 +750,8 @@ class EmbeddingSet:
         )
 
     def to_axis_df(self, x_axis, y_axis):
+        import pandas as pd
+
         if isinstance(x_axis, str):
             x_axis = self[x_axis]
         if isinstance(y_axis, str):
@@ -508,17 +795,18 @@ class EmbeddingSet:
             )
         return self
 
-    def plot_graph_layout(self, kind="cosine", **kwargs):
-        plot_graph_layout(self.embeddings, kind, **kwargs)
+    def plot_graph_layout(self, kind="cosine", n_jobs=1, **kwargs):
+        plot_graph_layout(self.embeddings, kind, n_jobs=n_jobs, **kwargs)
         return self
 
-    def plot_correlation(self, metric=None):
+    def plot_correlation(self, metric=None, n_jobs=1):
         """
         Make a correlation plot. Shows you the correlation between all the word embeddings. Can
         also be configured to show distances instead.
 
         Arguments:
             metric: don't plot correlation but a distance measure, must be scipy compatible (cosine, euclidean, etc)
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Usage:
 
@@ -533,9 +821,15 @@ class EmbeddingSet:
 
         ![](https://rasahq.github.io/whatlies/images/corrplot.png)
         """
+        import matplotlib.pylab as plt
+
         df = self.to_dataframe().T
         corr_df = (
-            pairwise_distances(self.to_matrix(), metric=metric) if metric else df.corr()
+            calculate_distances(
+                self.to_matrix(), self.to_matrix(), metric=metric, n_jobs=n_jobs
+            )
+            if metric
+            else df.corr()
         )
 
         fig, ax = plt.subplots()
@@ -568,6 +862,8 @@ class EmbeddingSet:
 
         ![](https://rasahq.github.io/whatlies/images/pixels.png)
         """
+        import matplotlib.pylab as plt
+
         names = self.embeddings.keys()
         df = self.to_dataframe()
         plt.matshow(df)
@@ -611,6 +907,9 @@ class EmbeddingSet:
         emb.plot_difference(emb_new, 'man', 'woman')
         ```
         """
+        import pandas as pd
+        import altair as alt
+
         if isinstance(x_axis, str):
             x_axis = self[x_axis]
         if isinstance(y_axis, str):
@@ -692,6 +991,9 @@ class EmbeddingSet:
         emb.plot_interactive('man', 'woman')
         ```
         """
+        import pandas as pd
+        import altair as alt
+
         if isinstance(x_axis, str):
             x_axis = self[x_axis]
         if isinstance(y_axis, str):
@@ -776,6 +1078,9 @@ class EmbeddingSet:
         emb.transform(Pca(3)).plot_interactive_matrix('pca_0', 'pca_1', 'pca_2')
         ```
         """
+        import pandas as pd
+        import altair as alt
+
         plot_df = pd.DataFrame({ax: self.compare_against(self[ax]) for ax in axes})
         plot_df["name"] = [v.name for v in self.embeddings.values()]
         plot_df["original"] = [v.orig for v in self.embeddings.values()]
@@ -1,24 +1,52 @@
-from .spacy_lang import SpacyLanguage
-from .sense2vec_lang import Sense2VecLanguage
-from .fasttext_lang import FasttextLanguage
-from .countvector_lang import CountVectorLanguage
-from .bpemblang import BytePairLanguage
-from .bpemblang import BytePairLanguage as BytePairLang
-from .convert_lang import ConveRTLanguage
-from .gensim_lang import GensimLanguage
-from .tfhub_lang import TFHubLanguage
-from .hftransformers_lang import HFTransformersLanguage
+"""
+The language backends are only imported when they are first used, such that importing
+this package does not import spaCy, TensorFlow, transformers and friends at once.
+"""
+from importlib import import_module
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from .spacy_lang import SpacyLanguage
+    from .sense2vec_lang import Sense2VecLanguage
+    from .fasttext_lang import FasttextLanguage
+    from .countvector_lang import CountVectorLanguage
+    from .bpemblang import BytePairLanguage
+    from .bpemblang import BytePairLanguage as BytePairLang
+    from .convert_lang import ConveRTLanguage
+    from .gensim_lang import GensimLanguage
+    from .tfhub_lang import TFHubLanguage
+    from .hftransformers_lang import HFTransformersLanguage
+    from .cache import CachedLanguage
+    from .async_lang import AsyncLanguage
 
-__all__ = [
-    "SpacyLanguage",
-    "Sense2VecLanguage",
-    "FasttextLanguage",
-    "CountVectorLanguage",
-    "BytePairLang",
-    "BytePairLanguage",
-    "GensimLanguage",
-    "ConveRTLanguage",
-    "TFHubLanguage",
-    "HFTransformersLanguage",
-]
+# the module and the name in that module of every language
+_LANGUAGES = {
+    "SpacyLanguage": ("spacy_lang", "SpacyLanguage"),
+    "Sense2VecLanguage": ("sense2vec_lang", "Sense2VecLanguage"),
+    "FasttextLanguage": ("fasttext_lang", "FasttextLanguage"),
+    "CountVectorLanguage": ("countvector_lang", "CountVectorLanguage"),
+    "BytePairLang": ("bpemblang", "BytePairLanguage"),
+    "BytePairLanguage": ("bpemblang", "BytePairLanguage"),
+    "GensimLanguage": ("gensim_lang", "GensimLanguage"),
+    "ConveRTLanguage": ("convert_lang", "ConveRTLanguage"),
+    "TFHubLanguage": ("tfhub_lang", "TFHubLanguage"),
+    "HFTransformersLanguage": ("hftransformers_lang", "HFTransformersLanguage"),
+    "CachedLanguage": ("cache", "CachedLanguage"),
+    "AsyncLanguage": ("async_lang", "AsyncLanguage"),
+}
+
+__all__ = list(_LANGUAGES)
+
+
+def __getattr__(name):
+    if name not in _LANGUAGES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attr = _LANGUAGES[name]
+    value = getattr(import_module(f".{module}", __name__), attr)
+    # later lookups find the attribute directly and skip this function
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,164 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from whatlies.embedding import Embedding
+from whatlies.embeddingset import EmbeddingSet
+from whatlies.language.common import embed_queries
+
+
+class AsyncLanguage:
+    """
+    Wraps any whatlies language such that it can be used from `asyncio` code without blocking
+    the event loop. The language runs in a thread pool that is managed by this object.
+
+    Queries that arrive within `batch_window` seconds of each other are collected and passed
+    to the language in a single call, which is a lot faster for the backends that batch
+    their inputs. Concurrent requests for the same string share a single calculation.
+    All the other methods and attributes are taken from the wrapped language.
+
+    Important:
+        An `AsyncLanguage` should be used from a single event loop. Call `close` or use it
+        as an `async with` context manager to shut down the thread pool.
+
+    Arguments:
+        lang: the language to wrap
+        max_workers: the number of threads that run the language, most models are not
+            thread-safe so the default is a single thread
+        batch_window: the number of seconds to wait for more queries before a batch is passed to the language
+        max_batch_size: a batch is passed to the language as soon as it has this many queries
+
+    **Usage**
+
+    ```python
+    > from whatlies.language import HFTransformersLanguage, AsyncLanguage
+    > lang = AsyncLanguage(HFTransformersLanguage('bert-base-cased'))
+    > await lang.aget('today is a nice day')
+    > await lang.aembed_many(['today is a nice day', 'the sky is clear'])
+    ```
+    """
+
+    def __init__(
+        self,
+        lang,
+        max_workers: int = 1,
+        batch_window: float = 0.005,
+        max_batch_size: int = 64,
+    ):
+        self.lang = lang
+        self.max_workers = max_workers
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        # futures of the queries that are waiting or being calculated, by query
+        self._pending = {}
+        self._queue = []
+        self._timer = None
+        self._tasks = set()
+
+    def __getattr__(self, name):
+        # only called for attributes that this wrapper does not have itself
+        if name.startswith("__") or "lang" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.__dict__["lang"], name)
+
+    def __getitem__(self, query):
+        return self.lang[query]
+
+    async def aget(self, query: str) -> Embedding:
+        """
+        Retreive a single embedding without blocking the event loop.
+
+        Arguments:
+            query: single string
+        """
+        future = self._pending.get(query)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[query] = future
+            self._queue.append(query)
+            if len(self._queue) >= self.max_batch_size:
+                self._flush(loop)
+            elif self._timer is None:
+                self._timer = loop.call_later(self.batch_window, self._flush, loop)
+        # a caller that is cancelled should not cancel the calculation for the others
+        return await asyncio.shield(future)
+
+    async def aembed_many(self, queries: List[str]) -> EmbeddingSet:
+        """
+        Retreive a set of embeddings without blocking the event loop.
+
+        Arguments:
+            queries: list of strings
+        """
+        embeddings = await asyncio.gather(*[self.aget(q) for q in queries])
+        return EmbeddingSet(*embeddings)
+
+    def _flush(self, loop):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if batch:
+            futures = {query: self._pending[query] for query in batch}
+            task = loop.create_task(self._run(futures))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            # a cancelled batch should not leave futures behind that never resolve,
+            # this also covers a task that is cancelled before it gets to run
+            task.add_done_callback(lambda _: self._release(futures))
+
+    async def _run(self, futures: dict):
+        loop = asyncio.get_running_loop()
+        batch = list(futures)
+        try:
+            embeddings = await loop.run_in_executor(
+                self._executor, embed_queries, self.lang, batch
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                self._settle(batch[0], futures[batch[0]], exception=e)
+                return
+            # retry one query at a time such that only the caller of a bad query fails
+            for query in batch:
+                try:
+                    [embedding] = await loop.run_in_executor(
+                        self._executor, embed_queries, self.lang, [query]
+                    )
+                except Exception as e:
+                    self._settle(query, futures[query], exception=e)
+                else:
+                    self._settle(query, futures[query], embedding)
+        else:
+            for query, embedding in zip(batch, embeddings):
+                self._settle(query, futures[query], embedding)
+
+    def _release(self, futures: dict):
+        for query, future in futures.items():
+            self._settle(query, future)
+
+    def _settle(self, query, future, embedding=None, exception=None):
+        if self._pending.get(query) is future:
+            del self._pending[query]
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        elif embedding is not None:
+            future.set_result(embedding)
+        else:
+            future.cancel()
+
+    def close(self):
+        """Shuts down the thread pool once the running calculations are done."""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # the queries that are still waiting for the batch window are sent off right away
+        self._flush(asyncio.get_running_loop())
+        await asyncio.gather(*self._tasks)
+        self.close()
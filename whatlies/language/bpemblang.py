@@ -4,10 +4,10 @@ from typing import Union, List
 
 import numpy as np
 from bpemb import BPEmb
-from sklearn.metrics import pairwise_distances
 
 from whatlies import Embedding, EmbeddingSet
-from whatlies.language.common import SklearnTransformerMixin
+from whatlies.distance import top_n_nearest, normalize_rows, solve_analogies
+from whatlies.language.common import SklearnTransformerMixin, pool_token_vectors
 
 
 class BytePairLanguage(SklearnTransformerMixin):
@@ -56,12 +56,21 @@ class BytePairLanguage(SklearnTransformerMixin):
     def __init__(
         self, lang, vs=10000, dim=100, cache_dir=Path.home() / Path(".cache/bpemb")
     ):
+        self.lang = lang
+        self.vs = vs
+        self.dim = dim
+        self.cache_dir = cache_dir
         self.module = BPEmb(lang=lang, vs=vs, dim=dim, cache_dir=cache_dir)
+        self._norms = None
+        self._lower = None
+        self._word_index = None
+        self._normed = None
 
     def __getitem__(self, item):
         """
         Retreive a single embedding or a set of embeddings. If an embedding contains multiple
-        sub-tokens then we'll average them before retreival.
+        sub-tokens then we'll average them before retreival. A list of strings is encoded
+        in one go and all the sub-token vectors are averaged together.
 
         Arguments:
             item: single string or list of strings
@@ -75,30 +84,40 @@ class BytePairLanguage(SklearnTransformerMixin):
         ```
         """
         if isinstance(item, str):
-            with warnings.catch_warnings():
-                warnings.filterwarnings("ignore", category=RuntimeWarning)
-                return Embedding(item, self.module.embed(item).mean(axis=0))
+            return self._get_embeddings([item])[0]
         if isinstance(item, list):
-            return EmbeddingSet(*[self[i] for i in item])
+            return EmbeddingSet(*self._get_embeddings(item))
         raise ValueError(f"Item must be list of string got {item}.")
 
-    def _prepare_queries(self, lower):
-        queries = [w for w in self.module.emb.vocab.keys()]
-        if lower:
-            queries = [w for w in queries if w.lower() == w]
-        return queries
-
-    def _calculate_distances(self, emb, queries, metric):
-        vec = emb.vector
-        vector_matrix = np.array([self[w].vector for w in queries])
-        # there are NaNs returned, good to investigate later why that might be
-        vector_matrix = np.array(
-            [np.zeros(v.shape) if np.any(np.isnan(v)) else v for v in vector_matrix]
+    def _get_embeddings(self, queries: List[str]) -> List[Embedding]:
+        ids = self.module.encode_ids(list(queries))
+        vectors = pool_token_vectors(
+            self.module.vectors,
+            [i for seq in ids for i in seq],
+            lengths=[len(seq) for seq in ids],
+            pooling="mean",
         )
-        return pairwise_distances(vector_matrix, vec.reshape(1, -1), metric=metric)
+        return [Embedding(q, v) for q, v in zip(queries, vectors)]
+
+    def _search_space(self, lower):
+        """
+        Returns the vectors of the sub-token vocabulary together with their norms and
+        a mask for `lower`, these are calculated once.
+        """
+        vectors = self.module.vectors
+        if self._norms is None:
+            self._norms = np.linalg.norm(vectors, axis=1)
+        if lower and self._lower is None:
+            self._lower = np.array([w.lower() == w for w in self.module.words])
+        return vectors, self._norms, self._lower if lower else None
 
     def score_similar(
-        self, emb: Union[str, Embedding], n: int = 10, metric="cosine", lower=False,
+        self,
+        emb: Union[str, Embedding],
+        n: int = 10,
+        metric="cosine",
+        lower=False,
+        n_jobs=1,
     ) -> List:
         """
         Retreive a list of (Embedding, score) tuples that are the most similar to the passed query.
@@ -108,6 +127,7 @@ class BytePairLanguage(SklearnTransformerMixin):
             n: the number of items you'd like to see returned
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An list of ([Embedding][whatlies.embedding.Embedding], score) tuples.
@@ -115,20 +135,35 @@ class BytePairLanguage(SklearnTransformerMixin):
         if isinstance(emb, str):
             emb = self[emb]
 
-        queries = self._prepare_queries(lower=lower)
-        distances = self._calculate_distances(emb=emb, queries=queries, metric=metric)
-        by_similarity = sorted(zip(queries, distances), key=lambda z: z[1])
+        vectors, norms, mask = self._search_space(lower)
+        idx, distances = top_n_nearest(
+            vectors,
+            emb.vector,
+            n=n,
+            metric=metric,
+            n_jobs=n_jobs,
+            norms=norms,
+            mask=mask,
+        )
 
-        if len(queries) < n:
+        if len(idx) < n:
             warnings.warn(
-                f"We could only find {len(queries)} feasible words. Consider changing `top_n` or `lower`",
+                f"We could only find {len(idx)} feasible words. Consider changing `top_n` or `lower`",
                 UserWarning,
             )
 
-        return [(self[q], float(d)) for q, d in by_similarity[:n]]
+        words = self.module.words
+        return [
+            (Embedding(words[i], vectors[i]), float(d)) for i, d in zip(idx, distances)
+        ]
 
     def embset_similar(
-        self, emb: Union[str, Embedding], n: int = 10, lower=False, metric="cosine",
+        self,
+        emb: Union[str, Embedding],
+        n: int = 10,
+        lower=False,
+        metric="cosine",
+        n_jobs=1,
     ) -> EmbeddingSet:
         """
         Retreive an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] that are the most similar to the passed query.
@@ -138,15 +173,81 @@ class BytePairLanguage(SklearnTransformerMixin):
             n: the number of items you'd like to see returned
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
-
-        Important:
-            This method is incredibly slow at the moment without a good `top_n` setting due to
-            [this bug](https://github.com/facebookresearch/fastText/issues/1040).
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] containing the similar embeddings.
         """
         embs = [
-            w[0] for w in self.score_similar(emb=emb, n=n, lower=lower, metric=metric)
+            w[0]
+            for w in self.score_similar(
+                emb=emb, n=n, lower=lower, metric=metric, n_jobs=n_jobs
+            )
         ]
         return EmbeddingSet({w.name: w for w in embs})
+
+    def analogy(self, a, b, c, n: int = 1, method="3cosadd", n_jobs=1):
+        """
+        Solves the analogy "`a` is to `b` as `c` is to ?" by searching the sub-token vocabulary.
+        The sub-tokens that are part of the analogy are never returned as an answer. You can
+        also pass lists of strings to solve many analogies in one go, these are calculated
+        as matrix products against a cached normalised vocabulary matrix.
+
+        Arguments:
+            a: a string or a list of strings
+            b: a string or a list of strings
+            c: a string or a list of strings
+            n: the number of answers you'd like to see returned per analogy
+            method: either `"3cosadd"` or `"3cosmul"`
+            n_jobs: number of threads used to calculate the scores, -1 means all cores
+
+        Returns:
+            A list of ([Embedding][whatlies.embedding.Embedding], score) tuples or, when lists are passed,
+            a list of these lists. A higher score means a better answer.
+
+        **Usage**
+
+        ```python
+        > lang = BytePairLanguage(lang="en")
+        > lang.analogy("man", "king", "woman")
+        ```
+        """
+        words = self.module.words
+        if self._normed is None:
+            self._normed = normalize_rows(self.module.vectors)
+            self._word_index = {w: i for i, w in enumerate(words)}
+        # strings that are a single sub-token are looked up as that sub-token such
+        # that they are excluded from the answers
+        if isinstance(a, str):
+            a, b, c = [self._as_sub_token(q) for q in (a, b, c)]
+        else:
+            a, b, c = [[self._as_sub_token(q) for q in qs] for qs in (a, b, c)]
+        return solve_analogies(
+            _SubTokenLookup(self),
+            words=words,
+            word_index=self._word_index,
+            normed=self._normed,
+            a=a,
+            b=b,
+            c=c,
+            n=n,
+            method=method,
+            n_jobs=n_jobs,
+        )
+
+    def _as_sub_token(self, query):
+        pieces = self.module.encode(query)
+        return pieces[0] if len(pieces) == 1 else query
+
+
+class _SubTokenLookup:
+    """Fetches sub-tokens from the vocabulary of a `BytePairLanguage` as is, other strings are encoded."""
+
+    def __init__(self, lang):
+        self.lang = lang
+
+    def __getitem__(self, item):
+        idx = self.lang._word_index.get(item)
+        if idx is None:
+            return self.lang[item]
+        return Embedding(item, self.lang.module.vectors[idx])
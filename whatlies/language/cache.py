@@ -0,0 +1,405 @@
+import os
+import inspect
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict, namedtuple
+from typing import Dict, List, Union
+
+import numpy as np
+
+import whatlies
+from whatlies.embedding import Embedding
+from whatlies.embeddingset import EmbeddingSet
+from whatlies.language.common import SklearnTransformerMixin, batched, embed_queries
+
+# sqlite limits the number of variables in a single statement
+MAX_VARIABLES = 500
+DEFAULT_CACHE_DIR = Path.home() / Path(".cache/whatlies/embeddings")
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "size"])
+
+
+class DiskCache:
+    """
+    A persistent store of vectors on disk. The vectors are appended to a single binary file
+    that is read through a memory map, a SQLite database keeps track of where every vector
+    is stored. Vectors are stored per namespace, such that the vectors of many languages can
+    be kept in the same cache. The store can be shared by many processes at once.
+
+    Arguments:
+        path: directory to keep the cache in, it is created if it does not exist
+
+    **Usage**
+
+    ```python
+    > import numpy as np
+    > from whatlies.language.cache import DiskCache
+    > cache = DiskCache("/tmp/whatlies-cache")
+    > cache.put_many("my-model", {"king": np.array([1.0, 2.0])})
+    > cache.get_many("my-model", ["king", "queen"])
+    ```
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._data_path = self.path / "vectors.bin"
+        self._data_path.touch()
+        # the connection is shared by threads, the lock makes them take turns
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(
+            str(self.path / "index.sqlite"), timeout=60, check_same_thread=False
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "namespace TEXT, query TEXT, offset INTEGER, size INTEGER, dtype TEXT, "
+            "PRIMARY KEY (namespace, query))"
+        )
+        self._db.commit()
+        self._map = None
+
+    def _read(self, offset: int, size: int, dtype: str) -> np.ndarray:
+        nbytes = size * np.dtype(dtype).itemsize
+        if self._map is None or offset + nbytes > len(self._map):
+            # the file only grows, so the map is renewed when it no longer covers it
+            self._map = np.memmap(self._data_path, dtype=np.uint8, mode="r")
+        end = offset + nbytes
+        return np.frombuffer(self._map[offset:end], dtype=dtype).copy()
+
+    def get_many(self, namespace: str, queries: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Fetches the stored vectors of the queries, queries that are not stored are left out.
+        """
+        with self._lock:
+            found = {}
+            for batch in batched(dict.fromkeys(queries), MAX_VARIABLES):
+                rows = self._db.execute(
+                    "SELECT query, offset, size, dtype FROM vectors "
+                    f"WHERE namespace = ? AND query IN ({','.join('?' * len(batch))})",
+                    [namespace, *batch],
+                ).fetchall()
+                for query, offset, size, dtype in rows:
+                    found[query] = self._read(offset, size, dtype)
+            return found
+
+    def put_many(self, namespace: str, vectors: Dict[str, np.ndarray]) -> None:
+        """
+        Stores vectors under a namespace, vectors that are already stored are replaced.
+        """
+        if not vectors:
+            return
+        with self._lock:
+            # the write lock is taken first such that processes append one after the other
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = []
+                with open(self._data_path, "ab") as f:
+                    for query, vec in vectors.items():
+                        vec = np.ascontiguousarray(vec).ravel()
+                        rows.append(
+                            (namespace, query, f.tell(), vec.size, vec.dtype.str)
+                        )
+                        f.write(vec.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?, ?)", rows
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def remove_many(self, namespace: str, queries: List[str]) -> None:
+        """
+        Forgets the stored vectors of the queries.
+        """
+        with self._lock:
+            for batch in batched(dict.fromkeys(queries), MAX_VARIABLES):
+                self._db.execute(
+                    "DELETE FROM vectors "
+                    f"WHERE namespace = ? AND query IN ({','.join('?' * len(batch))})",
+                    [namespace, *batch],
+                )
+            self._db.commit()
+
+    def clear(self, namespace: str = None) -> None:
+        """
+        Forgets all the vectors of a namespace, or of every namespace when it is `None`.
+        The space in the data file is only freed when the whole cache is cleared.
+        """
+        with self._lock:
+            if namespace is None:
+                self._db.execute("DELETE FROM vectors")
+                self._db.commit()
+                self._map = None
+                open(self._data_path, "wb").close()
+            else:
+                self._db.execute("DELETE FROM vectors WHERE namespace = ?", [namespace])
+                self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+
+class MemoryCache:
+    """
+    A bounded store of vectors in memory that forgets the least recently used vectors first.
+    It has the same methods as a [DiskCache][whatlies.language.cache.DiskCache] such that it
+    can be used by a [CachedLanguage][whatlies.language.CachedLanguage] instead.
+
+    Arguments:
+        max_items: the maximum number of vectors to keep, `None` means no limit
+        max_bytes: the maximum number of bytes the vectors may take up together, `None` means no limit
+
+    **Usage**
+
+    ```python
+    > from whatlies.language import SpacyLanguage, CachedLanguage
+    > from whatlies.language.cache import MemoryCache
+    > lang = CachedLanguage(SpacyLanguage("en_core_web_md"), cache=MemoryCache(max_items=10_000))
+    > lang['king'] - lang['man'] + lang['woman']
+    > lang.cache_info()
+    ```
+    """
+
+    def __init__(self, max_items: int = 10_000, max_bytes: int = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.evictions = 0
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, namespace: str, queries: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Fetches the stored vectors of the queries, queries that are not stored are left out.
+        """
+        found = {}
+        with self._lock:
+            for query in dict.fromkeys(queries):
+                key = (namespace, query)
+                if key in self._vectors:
+                    self._vectors.move_to_end(key)
+                    found[query] = self._vectors[key]
+        return found
+
+    def put_many(self, namespace: str, vectors: Dict[str, np.ndarray]) -> None:
+        """
+        Stores vectors under a namespace and forgets the least recently used vectors
+        when the limits are exceeded.
+        """
+        with self._lock:
+            for query, vec in vectors.items():
+                self._pop((namespace, query))
+                # callers get the stored array, it is read-only such that they cannot change it
+                vec = np.array(vec)
+                vec.setflags(write=False)
+                self._vectors[(namespace, query)] = vec
+                self.nbytes += vec.nbytes
+            while self._vectors and self._too_large():
+                self._pop(next(iter(self._vectors)))
+                self.evictions += 1
+
+    def _too_large(self) -> bool:
+        if self.max_items is not None and len(self._vectors) > self.max_items:
+            return True
+        return self.max_bytes is not None and self.nbytes > self.max_bytes
+
+    def _pop(self, key):
+        vec = self._vectors.pop(key, None)
+        if vec is not None:
+            self.nbytes -= vec.nbytes
+
+    def remove_many(self, namespace: str, queries: List[str]) -> None:
+        """
+        Forgets the stored vectors of the queries.
+        """
+        with self._lock:
+            for query in queries:
+                self._pop((namespace, query))
+
+    def clear(self, namespace: str = None) -> None:
+        """
+        Forgets all the vectors of a namespace, or of every namespace when it is `None`.
+        """
+        with self._lock:
+            for key in list(self._vectors):
+                if namespace is None or key[0] == namespace:
+                    self._pop(key)
+
+    def __len__(self):
+        return len(self._vectors)
+
+
+# arguments of languages that only tell where files are cached, they do not change the vectors
+CACHE_ARGUMENTS = {"cache_dir", "vectors_cache"}
+# marks an argument that a language does not store
+_MISSING = object()
+
+
+def _describe(value):
+    """
+    Describes a simple value, a file by its path, size and modification time, or a model by
+    its `meta`. Returns `None` for values that cannot be described.
+    """
+    if isinstance(value, (str, Path)) and os.path.isfile(value):
+        stat = os.stat(value)
+        return f"{value}@{stat.st_size}-{stat.st_mtime_ns}"
+    if value is None or isinstance(value, (str, Path, int, float, bool)):
+        return str(value)
+    if isinstance(value, dict):
+        value = sorted(value.items())
+    if isinstance(value, (list, tuple)):
+        parts = [_describe(v) for v in value]
+        return None if None in parts else f"({','.join(parts)})"
+    meta = getattr(value, "meta", None)
+    if isinstance(meta, dict):
+        return f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+    return None
+
+
+def default_namespace(lang) -> str:
+    """
+    Describes a language such that two languages with the same description give the same
+    vectors. It consists of the version of whatlies, the class of the language and the
+    arguments it was made with, which every language stores as attributes of the same name.
+    Files are described by their size and modification time, spaCy models by their name and
+    version. An argument that is loaded from a path can instead be stored as `<name>_path`.
+    Arguments that only affect the speed, like `batch_size` or `n_threads`, are left out when
+    the language lists them in a `_runtime_arguments` class attribute.
+
+    Raises a `ValueError` when an argument is not stored or cannot be described, like a
+    model that is passed as an object. Pass an explicit namespace for those languages, the
+    same goes for languages that are fitted on data, like
+    [CountVectorLanguage][whatlies.language.CountVectorLanguage].
+    """
+    name = type(lang).__qualname__
+    parts = [f"whatlies-{whatlies.__version__}", name]
+    params = []
+    if type(lang).__init__ is not object.__init__:
+        params = list(inspect.signature(type(lang).__init__).parameters.values())[1:]
+    skipped = CACHE_ARGUMENTS | set(getattr(type(lang), "_runtime_arguments", ()))
+    for param in params:
+        if param.kind == param.VAR_POSITIONAL or param.name in skipped:
+            continue
+        description = _describe(getattr(lang, param.name, _MISSING))
+        path = getattr(lang, f"{param.name}_path", None)
+        if description is None and path is not None:
+            description = _describe(path)
+        if description is None:
+            raise ValueError(
+                f"Cannot derive a namespace for {name} from its argument `{param.name}`, "
+                "pass a `namespace` to CachedLanguage."
+            )
+        parts.append(f"{param.name}={description}")
+    for attr in ["model", "nlp"]:
+        # a spaCy model that is loaded by name is identified by its version
+        meta = getattr(getattr(lang, attr, None), "meta", None)
+        if isinstance(meta, dict):
+            parts.append(f"{attr}={_describe(getattr(lang, attr))}")
+    return "|".join(parts)
+
+
+class CachedLanguage(SklearnTransformerMixin):
+    """
+    Wraps any whatlies language such that every vector it calculates is stored in a
+    persistent [DiskCache][whatlies.language.cache.DiskCache]. A query is only passed to the
+    language when it is not in the cache, so expensive embeddings are calculated once per
+    unique string, also across sessions and processes. All the other methods and attributes
+    are taken from the wrapped language.
+
+    To keep the vectors in memory instead, for example while you're exploring in a notebook,
+    pass a [MemoryCache][whatlies.language.cache.MemoryCache], which keeps a bounded number
+    of recently used vectors. The hits and misses are counted by `cache_info()` and vectors
+    can be forgotten with `invalidate()`.
+
+    The vectors are stored under a namespace that describes the language, see `default_namespace`.
+    When the language is made from an object, like a fasttext model, or fitted on data the
+    namespace cannot be derived and you have to pass one yourself, for example the name and
+    version of the model.
+
+    Arguments:
+        lang: the language to wrap
+        cache: a [DiskCache][whatlies.language.cache.DiskCache], a [MemoryCache][whatlies.language.cache.MemoryCache] or the path of the directory to keep a `DiskCache` in
+        namespace: the namespace to store the vectors under, by default it is derived from the language
+
+    **Usage**
+
+    ```python
+    > from whatlies.language import HFTransformersLanguage, CachedLanguage
+    > lang = CachedLanguage(HFTransformersLanguage('bert-base-cased'))
+    > lang['today is a nice day']
+    > lang[['today is a nice day', 'the sky is clear']]
+    > lang = CachedLanguage(HFTransformersLanguage('bert-base-cased'), cache="/tmp/cache", namespace="bert")
+    > lang = CachedLanguage(HFTransformersLanguage('bert-base-cased'), cache=MemoryCache(max_bytes=2**30))
+    > lang.cache_info()
+    ```
+    """
+
+    def __init__(
+        self,
+        lang,
+        cache: Union[DiskCache, MemoryCache, str, Path] = DEFAULT_CACHE_DIR,
+        namespace: str = None,
+    ):
+        self.lang = lang
+        self.cache = cache
+        self.namespace = namespace
+        self._store = DiskCache(cache) if isinstance(cache, (str, Path)) else cache
+        self._namespace = default_namespace(lang) if namespace is None else namespace
+        self._hits = 0
+        self._misses = 0
+
+    def __getattr__(self, name):
+        # only called for attributes that this wrapper does not have itself
+        if name.startswith("__") or "lang" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.__dict__["lang"], name)
+
+    def __getitem__(self, query: Union[str, List[str]]):
+        """
+        Retreive a single embedding or a set of embeddings, from the cache when possible.
+
+        Arguments:
+            query: single string or list of strings
+        """
+        if isinstance(query, str):
+            return self._get_embeddings([query])[0]
+        return EmbeddingSet(*self._get_embeddings(query))
+
+    def cache_info(self) -> CacheInfo:
+        """
+        Returns the number of queries that were found in the cache, the number that were not
+        and the number of vectors in the cache.
+        """
+        return CacheInfo(self._hits, self._misses, len(self._store))
+
+    def invalidate(self, queries: Union[str, List[str]] = None) -> None:
+        """
+        Forgets the cached vectors of the queries, or all the vectors of this language when
+        no queries are given, such that they are calculated again on the next lookup.
+
+        Arguments:
+            queries: single string or list of strings to forget
+        """
+        if queries is None:
+            self._store.clear(self._namespace)
+        else:
+            queries = [queries] if isinstance(queries, str) else queries
+            self._store.remove_many(self._namespace, queries)
+
+    def _get_embeddings(self, queries: List[str]) -> List[Embedding]:
+        vectors = self._store.get_many(self._namespace, queries)
+        hits = sum(1 for q in queries if q in vectors)
+        self._hits += hits
+        self._misses += len(queries) - hits
+        missing = [q for q in dict.fromkeys(queries) if q not in vectors]
+        if missing:
+            embeddings = embed_queries(self.lang, missing)
+            new = {q: np.asarray(e.vector) for q, e in zip(missing, embeddings)}
+            self._store.put_many(self._namespace, new)
+            vectors.update(new)
+        return [Embedding(q, vectors[q]) for q in queries]
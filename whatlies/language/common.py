@@ -1,10 +1,15 @@
 import os
 import sys
+import multiprocessing
 
 import numpy as np
 from sklearn.utils.validation import check_is_fitted
 from sklearn.base import BaseEstimator, TransformerMixin
 
+from whatlies.embedding import Embedding
+from whatlies.embeddingset import EmbeddingSet
+from whatlies.distance import effective_n_jobs
+
 
 class SklearnTransformerMixin(BaseEstimator, TransformerMixin):
     def fit(self, X, y=None):
@@ -25,7 +30,220 @@ class SklearnTransformerMixin(BaseEstimator, TransformerMixin):
         check_is_fitted(self, "fitted_")
         if not np.array(X).dtype.type is np.str_:
             raise ValueError("You must give this preprocessor text as input.")
-        return np.array([self[x].vector for x in X])
+        return np.array([e.vector for e in self._get_embeddings(list(X))])
+
+    def _get_embeddings(self, queries):
+        """
+        Returns a list with an embedding for every query. Languages that can embed
+        many queries at once more efficiently override this method.
+        """
+        return [self[q] for q in queries]
+
+    def embed_parallel(self, queries, n_workers=-1, chunk_size=1000, start_method=None):
+        """
+        Retreive the embeddings of many queries with a pool of worker processes, which helps
+        for languages that spend their time in Python code, like spaCy. See
+        [embed_parallel][whatlies.language.common.embed_parallel] for the details.
+
+        Arguments:
+            queries: list of strings
+            n_workers: the number of processes, negative numbers count back from the number of cores (-1 is all)
+            chunk_size: the number of queries that a worker embeds at once
+            start_method: how to start the workers, `None` forks them where the platform supports it
+                and no PyTorch or TensorFlow is imported
+
+        Returns:
+            An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] with an embedding for every query.
+
+        **Usage**
+
+        ```python
+        > from whatlies.language import SpacyLanguage
+        > lang = SpacyLanguage("en_core_web_md")
+        > lang.embed_parallel(["dog", "cat", "a red bird"] * 10_000, n_workers=4)
+        ```
+        """
+        return embed_parallel(
+            self,
+            queries,
+            n_workers=n_workers,
+            chunk_size=chunk_size,
+            start_method=start_method,
+        )
+
+
+def embed_queries(lang, queries):
+    """
+    Returns a list with an embedding for every query of any language, in a single
+    call when the language can embed many queries at once.
+    """
+    if hasattr(lang, "_get_embeddings"):
+        return lang._get_embeddings(list(queries))
+    return [lang[q] for q in queries]
+
+
+# the state of a worker process of `embed_parallel`
+_worker = {}
+
+
+def _init_worker(lang, buffer, shape, dtype):
+    _worker["lang"] = lang
+    _worker["out"] = np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+
+def _embed_chunk(task):
+    start, queries = task
+    stop = start + len(queries)
+    embeddings = embed_queries(_worker["lang"], queries)
+    _worker["out"][start:stop] = [e.vector for e in embeddings]
+    return start
+
+
+# backends that run thread pools once a model is used, a forked worker can hang on their locks
+THREADED_BACKENDS = ("torch", "tensorflow")
+
+
+def _start_method(start_method=None):
+    """Checks the `start_method` of `embed_parallel` and picks one when it is `None`."""
+    methods = multiprocessing.get_all_start_methods()
+    if start_method is not None and start_method not in methods:
+        raise ValueError(
+            f"The `start_method` should be one of {methods}, got {start_method}."
+        )
+    if start_method is None and "fork" in methods:
+        threaded = any(name in sys.modules for name in THREADED_BACKENDS)
+        start_method = "spawn" if threaded else "fork"
+    return start_method
+
+
+def embed_parallel(lang, queries, n_workers=-1, chunk_size=1000, start_method=None):
+    """
+    Embeds many queries with a pool of worker processes. The queries are sent to the workers
+    in chunks and the workers write the vectors into a buffer in shared memory, such that no
+    embeddings have to be pickled on the way back. Where the platform supports it the workers
+    are forked by default, so every worker shares the model that is already loaded instead of
+    loading its own copy, otherwise the language is pickled and sent to every worker once.
+
+    Warning:
+        Forking a process that already runs threads, like the thread pools of PyTorch or
+        TensorFlow once a model was used, can make the workers hang. When either of them is
+        imported the workers are spawned by default instead, every worker then gets a pickled
+        copy of the language. Only pass `start_method="fork"` when you know it is safe.
+
+    Arguments:
+        lang: the language to use
+        queries: list of strings
+        n_workers: the number of processes, negative numbers count back from the number of cores (-1 is all)
+        chunk_size: the number of queries that a worker embeds at once
+        start_method: how to start the workers, one of `multiprocessing.get_all_start_methods()`,
+            `None` uses `"fork"` where the platform supports it, `"spawn"` once PyTorch or
+            TensorFlow is imported and the platform default otherwise
+
+    Returns:
+        An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] with an embedding for every query.
+    """
+    start_method = _start_method(start_method)
+    queries = list(queries)
+    n_workers = min(effective_n_jobs(n_workers), -(-len(queries) // chunk_size))
+    if n_workers <= 1:
+        return EmbeddingSet(*embed_queries(lang, queries))
+    # the first vector tells how large the shared buffer has to be, it is the first row
+    probe = np.asarray(embed_queries(lang, queries[:1])[0].vector)
+    typecode, dtype = ("f", np.float32) if probe.dtype == np.float32 else ("d", float)
+    shape = (len(queries), probe.shape[0])
+    context = multiprocessing.get_context(start_method)
+    buffer = context.RawArray(typecode, shape[0] * shape[1])
+    vectors = np.frombuffer(buffer, dtype=dtype).reshape(shape)
+    vectors[0] = probe
+    starts = range(1, len(queries), chunk_size)
+    tasks = list(zip(starts, batched(queries[1:], chunk_size)))
+    with context.Pool(
+        n_workers, initializer=_init_worker, initargs=(lang, buffer, shape, dtype)
+    ) as pool:
+        for _ in pool.imap_unordered(_embed_chunk, tasks):
+            pass
+    return EmbeddingSet(*[Embedding(q, v) for q, v in zip(queries, vectors)])
+
+
+def batched(items, batch_size: int):
+    """Yields consecutive lists of at most `batch_size` items."""
+    if batch_size < 1:
+        raise ValueError(f"The `batch_size` should be at least 1, got {batch_size}.")
+    items = list(items)
+    for start in range(0, len(items), batch_size):
+        stop = start + batch_size
+        yield items[start:stop]
+
+
+def parse_bracket_query(query: str):
+    """
+    Removes the brackets of the Bert-style DSL, like `"programming in [python]"`, from a query.
+
+    Arguments:
+        query: the query, at most one part of it can be surrounded by brackets
+
+    Returns:
+        The cleaned query together with the character offsets `(start, end)` of the part
+        between the brackets in the cleaned query, or `None` when there are no brackets.
+    """
+    opening = sum(1 for c in query if c == "[")
+    closing = sum(1 for c in query if c == "]")
+    if opening > 1:
+        raise ValueError("Only one opening bracket (`[`) is allowed")
+    if closing > 1:
+        raise ValueError("Only one closing bracket (`]`) is allowed")
+    if opening != closing:
+        raise ValueError("The brackets should be paired")
+    if opening == 0:
+        return query, None
+    start, end = query.index("["), query.index("]") - 1
+    return query.replace("[", "").replace("]", ""), (start, end)
+
+
+POOLING = {"sum": np.add, "mean": np.add, "max": np.maximum}
+
+
+def pool_token_vectors(matrix, token_ids, lengths, pooling="sum", oov="zero"):
+    """
+    Combines the token vectors of many phrases at once. The vectors of all the tokens are
+    gathered from `matrix` with a single index operation and every phrase is reduced as a
+    segment with `reduceat`.
+
+    Arguments:
+        matrix: matrix with a vector for every token in the vocabulary
+        token_ids: flat list with the row of every token of every phrase, -1 marks a token that is not in the vocabulary
+        lengths: the number of tokens of every phrase
+        pooling: how to combine the vectors of a phrase, either `"sum"`, `"mean"` or `"max"`
+        oov: `"zero"` uses a zero vector for tokens that are not in the vocabulary, `"skip"` leaves them out
+
+    Returns:
+        A matrix with a vector for every phrase. Phrases without any tokens get a zero vector.
+    """
+    if pooling not in POOLING:
+        raise ValueError(
+            f"The `pooling` should be one of {list(POOLING)}, got {pooling}."
+        )
+    if oov not in ["zero", "skip"]:
+        raise ValueError(f"The `oov` setting should be 'zero' or 'skip', got {oov}.")
+    token_ids = np.asarray(token_ids, dtype=int)
+    lengths = np.asarray(lengths, dtype=int)
+    if oov == "skip":
+        phrase_of_token = np.repeat(np.arange(len(lengths)), lengths)
+        known = token_ids >= 0
+        lengths = np.bincount(phrase_of_token[known], minlength=len(lengths))
+        token_ids = token_ids[known]
+    dtype = np.result_type(matrix.dtype, np.float32)
+    vectors = np.asarray(matrix[np.maximum(token_ids, 0)], dtype=dtype)
+    vectors[token_ids < 0] = 0.0
+    result = np.zeros((len(lengths), matrix.shape[1]), dtype=dtype)
+    filled = lengths > 0
+    if filled.any():
+        # empty phrases have no tokens, leaving them out keeps the segments contiguous
+        starts = (np.cumsum(lengths) - lengths)[filled]
+        result[filled] = POOLING[pooling].reduceat(vectors, starts, axis=0)
+    if pooling == "mean":
+        result[filled] /= lengths[filled, None]
+    return result
 
 
 class HiddenPrints:
@@ -1,12 +1,13 @@
 from typing import Union, List
 
+import numpy as np
 import tensorflow_text
 import tensorflow as tf
 import tensorflow_hub as tfhub
 
 from whatlies.embedding import Embedding
 from whatlies.embeddingset import EmbeddingSet
-from whatlies.language.common import SklearnTransformerMixin, HiddenPrints
+from whatlies.language.common import SklearnTransformerMixin, HiddenPrints, batched
 
 
 class ConveRTLanguage(SklearnTransformerMixin):
@@ -35,6 +36,13 @@ class ConveRTLanguage(SklearnTransformerMixin):
             Each one of these correspond to a different model as described in [ConveRT manual](https://github.com/PolyAI-LDN/polyai-models#models).
         signature: the TFHub signature of the model, which could be one of `'default'`, `'encode_context'`, `'encode_response'` or `'encode_sequence'`.
             Note that `'encode_context'` is not currently supported with `'convert-multi-context'` or `'convert-ubuntu'` models.
+        batch_size: the number of strings that are passed through the model at once.
+
+    Lists of strings are passed to the model as batches of `batch_size` strings. The call
+    is wrapped in a `tf.function` with a fixed input signature, so it is only traced once. For
+    `'encode_sequence'` the token encodings of the whole batch are summed inside of that function,
+    leaving out the padding. A model that does not return its tokens raises a `ValueError`
+    unless `batch_size=1`, such that a text gets the same vector in every batch.
 
     **Usage**:
 
@@ -44,6 +52,7 @@ class ConveRTLanguage(SklearnTransformerMixin):
     > lang['bank']
     > lang = ConveRTLanguage(model_id='convert-multi-context', signature='encode_sequence')
     > lang[['bank of the river', 'money on the bank', 'bank']]
+    > lang = ConveRTLanguage(batch_size=128)
     ```
     """
 
@@ -60,7 +69,15 @@ class ConveRTLanguage(SklearnTransformerMixin):
         "encode_sequence",
     ]
 
-    def __init__(self, model_id: str = "convert", signature: str = "default") -> None:
+    # arguments that only change how the vectors are calculated, not the vectors themselves
+    _runtime_arguments = ("batch_size",)
+
+    def __init__(
+        self,
+        model_id: str = "convert",
+        signature: str = "default",
+        batch_size: int = 32,
+    ) -> None:
         if model_id not in self.MODEL_URL:
             raise ValueError(
                 f"The `model_id` value should be one of {list(self.MODEL_URL.keys())}"
@@ -78,10 +95,15 @@ class ConveRTLanguage(SklearnTransformerMixin):
             )
         self.model_id = model_id
         self.signature = signature
+        self.batch_size = batch_size
 
         with HiddenPrints():
             self.module = tfhub.load(self.MODEL_URL[self.model_id])
             self.model = self.module.signatures[self.signature]
+        self._encode = tf.function(
+            self._pooled_encoding,
+            input_signature=[tf.TensorSpec(shape=[None], dtype=tf.string)],
+        )
 
     def __getitem__(
         self, query: Union[str, List[str]]
@@ -103,11 +125,33 @@ class ConveRTLanguage(SklearnTransformerMixin):
         ```
         """
         if isinstance(query, str):
-            query_tensor = tf.convert_to_tensor([query])
-            encoding = self.model(query_tensor)
-            if self.signature == "encode_sequence":
-                vec = encoding["sequence_encoding"].numpy().sum(axis=1)[0]
-            else:
-                vec = encoding["default"].numpy()[0]
-            return Embedding(query, vec)
-        return EmbeddingSet(*[self[tok] for tok in query])
+            return self._get_embeddings([query])[0]
+        return EmbeddingSet(*self._get_embeddings(query))
+
+    def _pooled_encoding(self, texts):
+        encoding = self.model(texts)
+        if self.signature != "encode_sequence":
+            return encoding["default"]
+        sequence = encoding["sequence_encoding"]
+        if "tokens" not in encoding:
+            # without tokens the padding cannot be told apart, only a batch of one has none
+            if self.batch_size != 1:
+                raise ValueError(
+                    f"The `{self.signature}` signature of {self.model_id} does not return "
+                    "the tokens that are needed to mask the padding, pass `batch_size=1`."
+                )
+            return tf.reduce_sum(sequence, axis=1)
+        # shorter texts in a batch are padded with empty tokens
+        mask = tf.cast(tf.not_equal(encoding["tokens"], ""), sequence.dtype)
+        return tf.reduce_sum(sequence * mask[:, :, None], axis=1)
+
+    def _get_embeddings(self, queries: List[str]) -> List[Embedding]:
+        if len(queries) == 0:
+            return []
+        vectors = np.concatenate(
+            [
+                self._encode(tf.constant(batch)).numpy()
+                for batch in batched(queries, self.batch_size)
+            ]
+        )
+        return [Embedding(q, v) for q, v in zip(queries, vectors)]
@@ -1,13 +1,15 @@
 import warnings
-from typing import Union, List, Tuple
+from itertools import islice
+from typing import Union, List, Tuple, Iterable
 
 import numpy as np
-from sklearn.metrics import pairwise_distances
-from sklearn.decomposition import TruncatedSVD
-from sklearn.feature_extraction.text import CountVectorizer
+import scipy.sparse as sp
+from sklearn.decomposition import TruncatedSVD, IncrementalPCA
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
 
 from whatlies.embedding import Embedding
 from whatlies.embeddingset import EmbeddingSet
+from whatlies.distance import top_n_nearest
 from whatlies.language.common import SklearnTransformerMixin
 
 
@@ -32,6 +34,11 @@ class CountVectorLanguage(SklearnTransformerMixin):
         vectors if you just use `__getitem__`. If you want to seperate train/test you need to call `fit_manual`
         yourself or use it in a scikit-learn pipeline.
 
+    If you set `n_features` the tokens are hashed into a fixed number of features by a
+    [HashingVectorizer](https://scikit-learn.org/stable/modules/generated/sklearn.feature_extraction.text.HashingVectorizer.html)
+    instead of being counted via a vocabulary. This allows you to train on a corpus that
+    does not fit in memory via `fit_stream`. Note that `min_df` and `max_df` are ignored in this mode.
+
     Arguments:
         n_components: Number of components that TruncatedSVD will reduce to.
         lowercase: If the tokens need to be lowercased beforehand.
@@ -42,6 +49,7 @@ class CountVectorLanguage(SklearnTransformerMixin):
         binary: Determines if the counts are binary or if they can accumulate.
         strip_accents: Remove accents and perform normalisation. Can be set to "ascii" or "unicode".
         random_state: Random state for SVD algorithm.
+        n_features: Number of features of the hashing vectorizer, `None` uses a CountVectorizer.
 
     For more elaborate explainers on these arguments, check out the scikit-learn
     [documentation](https://scikit-learn.org/stable/modules/generated/sklearn.feature_extraction.text.CountVectorizer.html#sklearn.feature_extraction.text.CountVectorizer).
@@ -66,23 +74,42 @@ class CountVectorLanguage(SklearnTransformerMixin):
         binary: bool = False,
         strip_accents: str = None,
         random_state: int = 42,
+        n_features: int = None,
     ):
+        self.n_features = n_features
         self.svd = TruncatedSVD(n_components=n_components, random_state=random_state)
-        self.cv = CountVectorizer(
-            lowercase=lowercase,
-            analyzer=analyzer,
-            ngram_range=ngram_range,
-            min_df=min_df,
-            max_df=max_df,
-            binary=binary,
-            strip_accents=strip_accents,
-        )
+        if n_features is None:
+            self.cv = CountVectorizer(
+                lowercase=lowercase,
+                analyzer=analyzer,
+                ngram_range=ngram_range,
+                min_df=min_df,
+                max_df=max_df,
+                binary=binary,
+                strip_accents=strip_accents,
+            )
+        else:
+            self.cv = HashingVectorizer(
+                n_features=n_features,
+                lowercase=lowercase,
+                analyzer=analyzer,
+                ngram_range=ngram_range,
+                binary=binary,
+                strip_accents=strip_accents,
+                alternate_sign=False,
+                norm=None,
+            )
         self.fitted_manual = False
-        self.corpus = {}
+        self.corpus = []
+        self._corpus_matrix = None
+        self._norms = None
+        self._lower = None
 
     def fit_manual(self, query):
         """
         Fit the model manually. This way you can call `__getitem__` independantly of training.
+        The embeddings of the strings that are passed here are calculated in the same batch and
+        kept around, these are the strings that the similarity methods search through.
 
         Arguments:
             query: list of strings
@@ -101,9 +128,77 @@ class CountVectorLanguage(SklearnTransformerMixin):
                 "You've passed an empty string to the language model which is not allowed."
             )
         X = self.cv.fit_transform(query)
-        self.svd.fit(X)
+        corpus_matrix = self.svd.fit_transform(X)
+        # there can be NaNs in the reduced vectors, these rows are set to zero
+        corpus_matrix[np.isnan(corpus_matrix).any(axis=1)] = 0.0
+        self.fitted_manual = True
+        self.corpus = list(query)
+        self._corpus_matrix = corpus_matrix
+        self._norms = np.linalg.norm(corpus_matrix, axis=1)
+        self._lower = None
+        return self
+
+    def fit_stream(self, queries: Iterable[str], chunk_size: int = 1000):
+        """
+        Fit the model on an iterable of strings that does not have to fit in memory, like a
+        generator that reads lines from a file. The strings are hashed in chunks and the
+        dimensionality reduction is fitted incrementally via
+        [IncrementalPCA](https://scikit-learn.org/stable/modules/generated/sklearn.decomposition.IncrementalPCA.html),
+        one chunk at a time, such that memory usage depends on `chunk_size` and `n_features`
+        but not on the size of the corpus. This requires `n_features` to be set.
+
+        IncrementalPCA does not accept sparse input, so every chunk is turned into a dense
+        matrix of `chunk_size` by `n_features` floats first. With the defaults and
+        `n_features=2**12` that is 1000 * 4096 * 8 bytes, about 33MB per chunk.
+
+        Note that the strings are not kept around so the similarity methods can't search through them.
+
+        Arguments:
+            queries: iterable of strings
+            chunk_size: number of strings that are processed at once, at least `n_components`
+
+        **Usage**
+
+        ```python
+        > from whatlies.language import CountVectorLanguage
+        > lang = CountVectorLanguage(n_components=20, analyzer="char", n_features=2**12)
+        > lang.fit_stream(line.strip() for line in open("utterances.txt"))
+        > lang[['pizza', 'pizzas', 'firehouse', 'firehydrant']]
+        ```
+        """
+        if self.n_features is None:
+            raise ValueError(
+                "Fitting on a stream requires `n_features` to be set such that the tokens can be hashed."
+            )
+        n_components = self.svd.n_components
+        if chunk_size < n_components:
+            raise ValueError(
+                f"The `chunk_size` should be at least `n_components` ({n_components}), got {chunk_size}."
+            )
+        self.svd = IncrementalPCA(n_components=n_components)
+        queries = iter(queries)
+        pending = None
+        for chunk in iter(lambda: list(islice(queries, chunk_size)), []):
+            if any([len(q) == 0 for q in chunk]):
+                raise ValueError(
+                    "You've passed an empty string to the language model which is not allowed."
+                )
+            X = self.cv.transform(chunk)
+            # every partial fit needs at least `n_components` rows, only the last chunk
+            # can be smaller than that and it is therefore merged with the chunk before it
+            if pending is not None and X.shape[0] >= n_components:
+                self.svd.partial_fit(pending.toarray())
+                pending = X
+            else:
+                pending = X if pending is None else sp.vstack([pending, X])
+        if pending is None:
+            raise ValueError("You've passed no strings to the language model.")
+        self.svd.partial_fit(pending.toarray())
         self.fitted_manual = True
-        self.corpus = query
+        self.corpus = []
+        self._corpus_matrix = None
+        self._norms = None
+        self._lower = None
         return self
 
     def __getitem__(self, query: Union[str, List[str]]):
@@ -124,39 +219,84 @@ class CountVectorLanguage(SklearnTransformerMixin):
         orig_str = isinstance(query, str)
         if orig_str:
             query = [query]
+        X_vec = self._vectors(query)
+        if orig_str:
+            return Embedding(name=query[0], vector=X_vec[0])
+        return EmbeddingSet(
+            *[Embedding(name=n, vector=v) for n, v in zip(query, X_vec)]
+        )
+
+    def _vectors(self, query: List[str]) -> np.ndarray:
         if any([len(q) == 0 for q in query]):
             raise ValueError(
                 "You've passed an empty string to the language model which is not allowed."
             )
         if self.fitted_manual:
             X = self.cv.transform(query)
-            X_vec = self.svd.transform(X)
-        else:
-            X = self.cv.fit_transform(query)
-            X_vec = self.svd.fit_transform(X)
-        if orig_str:
-            return Embedding(name=query[0], vector=X_vec[0])
-        return EmbeddingSet(
-            *[Embedding(name=n, vector=v) for n, v in zip(query, X_vec)]
-        )
+            if isinstance(self.svd, IncrementalPCA):
+                # a model that was fitted on a stream only transforms dense input
+                X = X.toarray()
+            return self.svd.transform(X)
+        X = self.cv.fit_transform(query)
+        return self.svd.fit_transform(X)
+
+    def _get_embeddings(self, queries: List[str]) -> List[Embedding]:
+        if not self.fitted_manual:
+            # without a manual fit every query is fitted on its own
+            return [self[q] for q in queries]
+        return [Embedding(q, v) for q, v in zip(queries, self._vectors(queries))]
+
+    def embed_parallel(
+        self, queries: List[str], n_workers=-1, chunk_size=1000, start_method=None
+    ):
+        """
+        Retreive the embeddings of many queries with a pool of worker processes. See
+        [embed_parallel][whatlies.language.common.embed_parallel] for the details.
+
+        This needs a language that is fitted with `fit_manual`, otherwise the vectors
+        depend on the chunks that the queries are split into.
+
+        Arguments:
+            queries: list of strings
+            n_workers: the number of processes, negative numbers count back from the number of cores (-1 is all)
+            chunk_size: the number of queries that a worker embeds at once
+            start_method: how to start the workers, `None` forks them where the platform supports it
+                and no PyTorch or TensorFlow is imported
+
+        **Usage**
 
-    def _prepare_queries(self, lower):
-        queries = [w for w in self.corpus]
-        if lower:
-            queries = [w for w in queries if w.lower() == w]
-        return queries
-
-    def _calculate_distances(self, emb, queries, metric):
-        vec = emb.vector
-        vector_matrix = np.array([self[w].vector for w in queries])
-        # there are NaNs returned, good to investigate later why that might be
-        vector_matrix = np.array(
-            [np.zeros(v.shape) if np.any(np.isnan(v)) else v for v in vector_matrix]
+        ```python
+        > from whatlies.language import CountVectorLanguage
+        > lang = CountVectorLanguage(n_components=2, ngram_range=(1, 2), analyzer="char")
+        > lang.fit_manual(['pizza', 'pizzas', 'firehouse', 'firehydrant'])
+        > lang.embed_parallel(['pizza', 'firehouse'] * 10_000, n_workers=4)
+        ```
+        """
+        if not self.fitted_manual:
+            raise ValueError(
+                "You need to call `fit_manual` before you can use `embed_parallel`."
+            )
+        return super().embed_parallel(
+            queries,
+            n_workers=n_workers,
+            chunk_size=chunk_size,
+            start_method=start_method,
         )
-        return pairwise_distances(vector_matrix, vec.reshape(1, -1), metric=metric)
+
+    def _search_mask(self, lower):
+        if not lower:
+            return None
+        if self._lower is None:
+            self._lower = np.array([w.lower() == w for w in self.corpus], dtype=bool)
+        return self._lower
 
     def score_similar(
-        self, emb: Union[str, Embedding], n: int = 10, metric="cosine", lower=False,
+        self,
+        emb: Union[str, Embedding],
+        n: int = 10,
+        metric="cosine",
+        lower=False,
+        n_jobs=1,
     ) -> List:
         """
         Retreive a list of (Embedding, score) tuples that are the most similar to the passed query.
@@ -167,6 +307,7 @@ class CountVectorLanguage(SklearnTransformerMixin):
             n: the number of items you'd like to see returned
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An list of ([Embedding][whatlies.embedding.Embedding], score) tuples.
@@ -174,25 +315,39 @@ class CountVectorLanguage(SklearnTransformerMixin):
         if isinstance(emb, str):
             emb = self[emb]
 
-        queries = self._prepare_queries(lower=lower)
-        distances = self._calculate_distances(emb=emb, queries=queries, metric=metric)
-        by_similarity = sorted(zip(queries, distances), key=lambda z: z[1])
-
         if len(self.corpus) < n:
             raise ValueError(
                 f"You're trying to retreive {n} items while the corpus only trained on {len(self.corpus)}."
             )
 
-        if len(queries) < n:
+        idx, distances = top_n_nearest(
+            self._corpus_matrix,
+            emb.vector,
+            n=n,
+            metric=metric,
+            n_jobs=n_jobs,
+            norms=self._norms,
+            mask=self._search_mask(lower),
+        )
+
+        if len(idx) < n:
             warnings.warn(
-                f"We could only find {len(queries)} feasible words. Consider changing `top_n` or `lower`",
+                f"We could only find {len(idx)} feasible words. Consider changing `top_n` or `lower`",
                 UserWarning,
             )
 
-        return [(self[q], float(d)) for q, d in by_similarity[:n]]
+        return [
+            (Embedding(self.corpus[i], self._corpus_matrix[i]), float(d))
+            for i, d in zip(idx, distances)
+        ]
 
     def embset_similar(
-        self, emb: Union[str, Embedding], n: int = 10, lower=False, metric="cosine",
+        self,
+        emb: Union[str, Embedding],
+        n: int = 10,
+        lower=False,
+        metric="cosine",
+        n_jobs=1,
     ) -> EmbeddingSet:
         """
         Retreive an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] that are the most similar to the passed query.
@@ -203,11 +358,15 @@ class CountVectorLanguage(SklearnTransformerMixin):
             n: the number of items you'd like to see returned
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] containing the similar embeddings.
         """
         embs = [
-            w[0] for w in self.score_similar(emb=emb, n=n, lower=lower, metric=metric)
+            w[0]
+            for w in self.score_similar(
+                emb=emb, n=n, lower=lower, metric=metric, n_jobs=n_jobs
+            )
         ]
         return EmbeddingSet({w.name: w for w in embs})
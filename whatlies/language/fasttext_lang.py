@@ -1,18 +1,37 @@
+import os
+import hashlib
 import warnings
+from pathlib import Path
 
 import numpy as np
 from typing import Union, List
-from sklearn.metrics import pairwise_distances
 
 import fasttext
 import fasttext.util
 
 from whatlies.embedding import Embedding
 from whatlies.embeddingset import EmbeddingSet
+from whatlies.distance import (
+    distances_to_vector,
+    top_n_nearest,
+    normalize_rows,
+    solve_analogies,
+)
 
 from whatlies.language.common import SklearnTransformerMixin, HiddenPrints
 
 
+def _write_atomic(path, write):
+    """
+    Writes a file via a temporary file that replaces it once it is complete, such that
+    other processes never read a half written file.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
 class FasttextLanguage(SklearnTransformerMixin):
     """
     This object is used to lazily fetch [Embedding][whatlies.embedding.Embedding]s or
@@ -49,8 +68,22 @@ class FasttextLanguage(SklearnTransformerMixin):
         Last update on pypi was June 2019. Our preferred usecase for it is to use the pretrained vectors.
         Note that you can also import these via spaCy but this requires a packaging step.
 
+    The similarity methods search a matrix with the vectors of all the words in the vocabulary.
+    This matrix is calculated once, the first time it is needed. Because this can take a while
+    for large models you can store it in a `.npy` file via `vectors_cache`. The next time the
+    matrix is memory-mapped from this file instead of being calculated again. Next to it a
+    `.key` file identifies the model the matrix belongs to, such that the matrix of another
+    model is never loaded.
+
+    Reducing the dimensionality of a model with `size` can take minutes for the large pretrained
+    models. When the model is loaded from a file the reduced model is therefore saved in `cache_dir`,
+    keyed by a hash of the original file and the size, and loaded directly the next time.
+
     Arguments:
         model: name of the model to load, be sure that it's downloaded or trained beforehand
+        size: reduce the dimensionality of the vectors to this size
+        vectors_cache: path of a `.npy` file to store and memory-map the vocabulary matrix
+        cache_dir: the folder in which reduced models are cached, set to `None` to not cache them
 
     **Usage**:
 
@@ -60,14 +93,33 @@ class FasttextLanguage(SklearnTransformerMixin):
     > lang['python']
     > lang = FasttextLanguage("cc.en.300.bin", size=10)
     > lang[['python', 'snake', 'dog']]
+    > lang = FasttextLanguage("cc.en.300.bin", vectors_cache="cc.en.300.npy")
+    > lang.score_similar('python', n=10)
     ```
     """
 
-    def __init__(self, model, size=None):
+    def __init__(
+        self,
+        model,
+        size=None,
+        vectors_cache=None,
+        cache_dir=Path.home() / Path(".cache/whatlies/fasttext"),
+    ):
         self.size = size
+        self.model_path = str(model) if isinstance(model, str) else None
+        self.vectors_cache = vectors_cache
+        self.cache_dir = cache_dir
+        self._words = None
+        self._vocab_matrix = None
+        self._norms = None
+        self._lower = None
+        self._word_index = None
+        self._normed = None
         # we have to use this class to prevent the warning hidden as a print statement from the fasttext lib
         with HiddenPrints():
-            if isinstance(model, str):
+            if isinstance(model, str) and self.size and self.cache_dir:
+                self.model = self._load_reduced_model(model)
+            elif isinstance(model, str):
                 self.model = fasttext.load_model(model)
             elif isinstance(model, fasttext.FastText._FastText):
                 self.model = model
@@ -75,9 +127,34 @@ class FasttextLanguage(SklearnTransformerMixin):
                 raise ValueError(
                     "Language must be started with `str` or fasttext.FastText._FastText object."
                 )
-        if self.size:
+        if self.size and self.model.get_dimension() != self.size:
             fasttext.util.reduce_model(self.model, self.size)
 
+    def _reduced_model_path(self, path: str) -> Path:
+        """
+        Returns the path of the reduced model in the cache. The key is a hash of the entire
+        source file, which takes seconds for the large models but reducing them takes minutes.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        name = f"{Path(path).stem}-{digest.hexdigest()[:16]}-{self.size}.bin"
+        return Path(self.cache_dir) / name
+
+    def _load_reduced_model(self, path: str):
+        cached_path = self._reduced_model_path(path)
+        if cached_path.exists():
+            return fasttext.load_model(str(cached_path))
+        model = fasttext.load_model(path)
+        fasttext.util.reduce_model(model, self.size)
+        cached_path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first such that other processes never load half a model
+        tmp_path = cached_path.with_suffix(f".{os.getpid()}.tmp")
+        model.save_model(str(tmp_path))
+        os.replace(tmp_path, cached_path)
+        return model
+
     @staticmethod
     def _input_str_legal(string):
         if sum(1 for c in string if c == "[") > 1:
@@ -108,30 +185,91 @@ class FasttextLanguage(SklearnTransformerMixin):
             return Embedding(query, vec)
         return EmbeddingSet(*[self[tok] for tok in query])
 
-    def _prepare_queries(self, top_n, lower):
-        queries = [w for w in self.model.get_words()]
+    def _model_key(self) -> str:
+        """
+        Identifies the vectors of the model. When the model was loaded from a file this is
+        the path, size and modification time of that file, otherwise it is a hash of the
+        words and the input matrix of the model. The `size` is part of the key in both cases.
+        """
+        if self.model_path is not None:
+            path, stat = os.path.abspath(self.model_path), os.stat(self.model_path)
+            model = f"{path}@{stat.st_size}-{stat.st_mtime_ns}"
+        else:
+            digest = hashlib.sha256("\n".join(self.model.get_words()).encode())
+            digest.update(np.ascontiguousarray(self.model.get_input_matrix()).tobytes())
+            model = digest.hexdigest()
+        return f"{model}|dim={self.model.get_dimension()}|size={self.size}"
+
+    def _load_vocab_matrix(self):
+        words = self.model.get_words()
+        shape = (len(words), self.model.get_dimension())
+        key = self._model_key() if self.vectors_cache else None
+        key_path = f"{self.vectors_cache}.key"
+        if self.vectors_cache and os.path.exists(key_path):
+            with open(key_path) as f:
+                cached_key = f.read()
+            if cached_key == key and os.path.exists(self.vectors_cache):
+                matrix = np.load(self.vectors_cache, mmap_mode="r")
+                if matrix.shape == shape:
+                    return words, matrix
+        matrix = np.empty(shape, dtype=np.float32)
+        for i, word in enumerate(words):
+            matrix[i] = self.model.get_word_vector(word)
+        if self.vectors_cache:
+            # the key is removed first and written last, such that an interrupted run
+            # never leaves a key next to a matrix that it does not belong to
+            if os.path.exists(key_path):
+                os.remove(key_path)
+            _write_atomic(self.vectors_cache, lambda f: np.save(f, matrix))
+            _write_atomic(key_path, lambda f: f.write(key.encode()))
+            matrix = np.load(self.vectors_cache, mmap_mode="r")
+        return words, matrix
+
+    def _get_vocab_matrix(self):
+        """
+        Returns the words in the vocabulary and a matrix with their vectors. The matrix
+        is calculated once, or read from `vectors_cache` when that file exists.
+        """
+        if self._vocab_matrix is None:
+            self._words, self._vocab_matrix = self._load_vocab_matrix()
+            self._norms = np.linalg.norm(self._vocab_matrix, axis=1)
+        return self._words, self._vocab_matrix
+
+    def _search_space(self, top_n, lower):
+        """
+        Returns the words, vectors and norms to search together with a mask for `lower`. The
+        words in a fasttext model are sorted by frequency so the search space is a slice of
+        the matrix that holds the `top_n` most frequent words, or the `top_n` most frequent
+        lowercase words when `lower` is set.
+        """
+        words, matrix = self._get_vocab_matrix()
+        n_rows = len(words) if top_n is None else min(top_n, len(words))
+        mask = None
         if lower:
-            queries = [w for w in queries if w.is_lower]
-        if top_n is not None:
-            queries = queries[:top_n]
-        if len(queries) == 0:
+            if self._lower is None:
+                self._lower = np.array([w.islower() for w in words], dtype=bool)
+            # the slice ends right after the `top_n`-th lowercase word
+            rows = np.flatnonzero(self._lower)[:top_n]
+            n_rows = rows[-1] + 1 if len(rows) else 0
+            mask = self._lower[:n_rows]
+        if n_rows == 0:
             raise ValueError(
                 f"Language model has no tokens for this setting. Consider raising top_n={top_n}"
+                + (" or setting lower=False" if lower else "")
             )
-        return queries
+        return words[:n_rows], matrix[:n_rows], self._norms[:n_rows], mask
 
-    def _calculate_distances(self, emb, queries, metric):
-        vec = emb.vector
-        vector_matrix = np.array([self.model.get_word_vector(w) for w in queries])
-        return pairwise_distances(vector_matrix, vec.reshape(1, -1), metric=metric)
+    def _embedding(self, words, matrix, i):
+        return Embedding(words[i], np.array(matrix[i]))
 
     def embset_proximity(
         self,
         emb: Union[str, Embedding],
         max_proximity: float = 0.1,
-        top_n=20_000,
+        top_n=None,
         lower=True,
         metric="cosine",
+        n_jobs=1,
     ):
         """
         Retreive an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] or embeddings that are within a proximity.
@@ -139,9 +277,10 @@ class FasttextLanguage(SklearnTransformerMixin):
         Arguments:
             emb: query to use
             max_proximity: the number of items you'd like to see returned
-            top_n: likelihood limit that sets the subset of words to search
+            top_n: only search the `top_n` most frequent words, `None` searches the entire vocabulary
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] containing the similar embeddings.
@@ -149,19 +288,22 @@ class FasttextLanguage(SklearnTransformerMixin):
         if isinstance(emb, str):
             emb = self[emb]
 
-        queries = self._prepare_queries(top_n, lower)
-        distances = self._calculate_distances(emb, queries, metric)
-        return EmbeddingSet(
-            {w: self[w] for w, d in zip(queries, distances) if d <= max_proximity}
+        words, matrix, norms, mask = self._search_space(top_n, lower)
+        distances = distances_to_vector(
+            matrix, emb.vector, metric, norms=norms, n_jobs=n_jobs
         )
+        close = distances <= max_proximity
+        idx = np.flatnonzero(close if mask is None else close & mask)
+        return EmbeddingSet({words[i]: self._embedding(words, matrix, i) for i in idx})
 
     def embset_similar(
         self,
         emb: Union[str, Embedding],
         n: int = 10,
-        top_n=20_000,
+        top_n=None,
         lower=False,
         metric="cosine",
+        n_jobs=1,
     ):
         """
         Retreive an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] that are the most similar to the passed query.
@@ -169,27 +311,25 @@ class FasttextLanguage(SklearnTransformerMixin):
         Arguments:
             emb: query to use
             n: the number of items you'd like to see returned
-            top_n: likelihood limit that sets the subset of words to search
+            top_n: only search the `top_n` most frequent words, `None` searches the entire vocabulary
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens, note that the official english model only has lower case tokens
-
-        Important:
-            This method is incredibly slow at the moment without a good `top_n` setting due to
-            [this bug](https://github.com/facebookresearch/fastText/issues/1040).
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] containing the similar embeddings.
         """
-        embs = [w[0] for w in self.score_similar(emb, n, top_n, lower, metric)]
+        embs = [w[0] for w in self.score_similar(emb, n, top_n, lower, metric, n_jobs)]
         return EmbeddingSet({w.name: w for w in embs})
 
     def score_similar(
         self,
         emb: Union[str, Embedding],
         n: int = 10,
-        top_n=20_000,
+        top_n=None,
         lower=False,
         metric="cosine",
+        n_jobs=1,
     ):
         """
         Retreive a list of (Embedding, score) tuples that are the most similar to the passed query.
@@ -197,13 +337,10 @@ class FasttextLanguage(SklearnTransformerMixin):
         Arguments:
             emb: query to use
             n: the number of items you'd like to see returned
-            top_n: likelihood limit that sets the subset of words to search, to ignore set to `None`
+            top_n: only search the `top_n` most frequent words, `None` searches the entire vocabulary
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens, note that the official english model only has lower case tokens
-
-        Important:
-            This method is incredibly slow at the moment without a good `top_n` setting due
-            to [this bug](https://github.com/facebookresearch/fastText/issues/1040).
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An list of ([Embedding][whatlies.embedding.Embedding], score) tuples.
@@ -211,14 +348,68 @@ class FasttextLanguage(SklearnTransformerMixin):
         if isinstance(emb, str):
             emb = self[emb]
 
-        queries = self._prepare_queries(top_n, lower)
-        distances = self._calculate_distances(emb, queries, metric)
-        by_similarity = sorted(zip(queries, distances), key=lambda z: z[1])
+        words, matrix, norms, mask = self._search_space(top_n, lower)
+        idx, distances = top_n_nearest(
+            matrix,
+            emb.vector,
+            n=n,
+            metric=metric,
+            n_jobs=n_jobs,
+            norms=norms,
+            mask=mask,
+        )
 
-        if len(queries) < n:
+        if len(idx) < n:
             warnings.warn(
-                f"We could only find {len(queries)} feasible words. Consider changing `top_n` or `lower`",
+                f"We could only find {len(idx)} feasible words. Consider changing `top_n` or `lower`",
                 UserWarning,
             )
 
-        return [(self[q], float(d)) for q, d in by_similarity[:n]]
+        return [
+            (self._embedding(words, matrix, i), float(d))
+            for i, d in zip(idx, distances)
+        ]
+
+    def analogy(self, a, b, c, n: int = 1, method="3cosadd", n_jobs=1):
+        """
+        Solves the analogy "`a` is to `b` as `c` is to ?" by searching the entire vocabulary.
+        The words that are part of the analogy are never returned as an answer. You can
+        also pass lists of words to solve many analogies in one go, these are calculated
+        as matrix products against a cached normalised vocabulary matrix.
+
+        Arguments:
+            a: a word or a list of words
+            b: a word or a list of words
+            c: a word or a list of words
+            n: the number of answers you'd like to see returned per analogy
+            method: either `"3cosadd"` or `"3cosmul"`
+            n_jobs: number of threads used to calculate the scores, -1 means all cores
+
+        Returns:
+            A list of ([Embedding][whatlies.embedding.Embedding], score) tuples or, when lists are passed,
+            a list of these lists. A higher score means a better answer.
+
+        **Usage**
+
+        ```python
+        > lang = FasttextLanguage("cc.en.300.bin")
+        > lang.analogy("man", "king", "woman")
+        > lang.analogy(["man", "paris"], ["king", "france"], ["woman", "berlin"], n=3)
+        ```
+        """
+        words, matrix = self._get_vocab_matrix()
+        if self._normed is None:
+            self._normed = normalize_rows(matrix)
+            self._word_index = {w: i for i, w in enumerate(words)}
+        return solve_analogies(
+            self,
+            words=words,
+            word_index=self._word_index,
+            normed=self._normed,
+            a=a,
+            b=b,
+            c=c,
+            n=n,
+            method=method,
+            n_jobs=n_jobs,
+        )
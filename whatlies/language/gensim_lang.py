@@ -2,13 +2,17 @@ import warnings
 
 import numpy as np
 from typing import Union, List
-from sklearn.metrics import pairwise_distances
 from gensim.models import KeyedVectors
 
 
 from whatlies.embedding import Embedding
 from whatlies.embeddingset import EmbeddingSet
-from whatlies.language.common import SklearnTransformerMixin
+from whatlies.distance import (
+    top_n_nearest,
+    normalize_rows,
+    solve_analogies,
+)
+from whatlies.language.common import SklearnTransformerMixin, pool_token_vectors
 
 
 class GensimLanguage(SklearnTransformerMixin):
@@ -34,10 +38,17 @@ class GensimLanguage(SklearnTransformerMixin):
 
         Note that if a word is not available in the keyed vectors file then we'll assume
         a zero vector. If you pass a sentence then we'll add together the embeddings vectors
-        of the seperate words.
+        of the seperate words, you can change this with the `pooling` setting.
+
+    The similarity methods work directly on the vectors of the keyed vectors file. If you
+    load the file with `mmap="r"` the vectors are memory-mapped instead of read into memory,
+    which allows processes that load the same file to share that memory. This only works for
+    files where gensim stored the vectors separately, which it does for large arrays.
 
     Arguments:
         keyedfile: name of the model to load, be sure that it's downloaded or trained beforehand
+        mmap: passed to `KeyedVectors.load`, use `"r"` to memory-map the vectors read-only
+        pooling: how the vectors of the words in a sentence are combined, either `"sum"`, `"mean"` or `"max"`
 
     **Usage**:
 
@@ -47,11 +58,22 @@ class GensimLanguage(SklearnTransformerMixin):
     > lang['computer']
     > lang = GensimLanguage("wordvectors.kv")
     > lang[['computer', 'human', 'dog']]
+    > lang = GensimLanguage("wordvectors.kv", mmap="r")
+    > lang.score_similar('computer')
     ```
     """
 
-    def __init__(self, keyedfile):
-        self.kv = KeyedVectors.load(keyedfile)
+    def __init__(self, keyedfile, mmap=None, pooling="sum"):
+        self.keyedfile = keyedfile
+        self.mmap = mmap
+        self.pooling = pooling
+        self.kv = KeyedVectors.load(keyedfile, mmap=mmap)
+        self._norms = None
+        self._valid = None
+        self._lower = None
+        self._analogy_words = None
+        self._word_index = None
+        self._normed = None
 
     def __getitem__(self, query: Union[str, List[str]]):
         """
@@ -70,34 +92,50 @@ class GensimLanguage(SklearnTransformerMixin):
         ```
         """
         if isinstance(query, str):
-            if " " in query:
-                return Embedding(
-                    query, np.sum([self[q].vector for q in query.split(" ")], axis=0)
-                )
-            try:
-                vec = np.sum([self.kv[q] for q in query.split(" ")], axis=0)
-            except KeyError:
-                vec = np.zeros(self.kv.vector_size)
-            return Embedding(query, vec)
-        return EmbeddingSet(*[self[tok] for tok in query])
-
-    def _prepare_queries(self, lower):
-        queries = [w for w in self.kv.vocab.keys()]
-        if lower:
-            queries = [w for w in queries if w.lower() == w]
-        return queries
-
-    def _calculate_distances(self, emb, queries, metric):
-        vec = emb.vector
-        vector_matrix = np.array([self[w].vector for w in queries])
-        # there are NaNs returned, good to investigate later why that might be
-        vector_matrix = np.array(
-            [np.zeros(v.shape) if np.any(np.isnan(v)) else v for v in vector_matrix]
+            return self._get_embeddings([query])[0]
+        return EmbeddingSet(*self._get_embeddings(query))
+
+    def _get_embeddings(self, queries: List[str]) -> List[Embedding]:
+        vocab = self.kv.vocab
+        tokens = [q.split(" ") for q in queries]
+        token_ids = [vocab[t].index if t in vocab else -1 for ts in tokens for t in ts]
+        vectors = pool_token_vectors(
+            self.kv.vectors,
+            token_ids,
+            lengths=[len(ts) for ts in tokens],
+            pooling=self.pooling,
         )
-        return pairwise_distances(vector_matrix, vec.reshape(1, -1), metric=metric)
+        return [Embedding(q, v) for q, v in zip(queries, vectors)]
+
+    def _get_norms(self):
+        """
+        Returns the norms of all the vectors. These are calculated once, together with
+        a mask of the rows that can be searched. Some files contain vectors with NaNs,
+        these rows are never returned.
+        """
+        if self._norms is None:
+            vectors = self.kv.vectors
+            self._valid = ~np.isnan(vectors).any(axis=1)
+            norms = np.linalg.norm(vectors, axis=1)
+            self._norms = np.where(self._valid, norms, 0.0)
+        return self._norms
+
+    def _search_mask(self, lower):
+        self._get_norms()
+        if not lower:
+            return self._valid
+        if self._lower is None:
+            words = self.kv.index2word
+            self._lower = np.array([w.lower() == w for w in words], dtype=bool)
+        return self._valid & self._lower
 
     def score_similar(
-        self, emb: Union[str, Embedding], n: int = 10, metric="cosine", lower=False,
+        self,
+        emb: Union[str, Embedding],
+        n: int = 10,
+        metric="cosine",
+        lower=False,
+        n_jobs=1,
     ) -> List:
         """
         Retreive a list of (Embedding, score) tuples that are the most similar to the passed query.
@@ -107,6 +145,7 @@ class GensimLanguage(SklearnTransformerMixin):
             n: the number of items you'd like to see returned
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An list of ([Embedding][whatlies.embedding.Embedding], score) tuples.
@@ -114,20 +153,36 @@ class GensimLanguage(SklearnTransformerMixin):
         if isinstance(emb, str):
             emb = self[emb]
 
-        queries = self._prepare_queries(lower=lower)
-        distances = self._calculate_distances(emb=emb, queries=queries, metric=metric)
-        by_similarity = sorted(zip(queries, distances), key=lambda z: z[1])
+        mask = self._search_mask(lower)
+        idx, distances = top_n_nearest(
+            self.kv.vectors,
+            emb.vector,
+            n=n,
+            metric=metric,
+            n_jobs=n_jobs,
+            norms=self._get_norms(),
+            mask=mask,
+        )
 
-        if len(queries) < n:
+        if len(idx) < n:
             warnings.warn(
-                f"We could only find {len(queries)} feasible words. Consider changing `top_n` or `lower`",
+                f"We could only find {len(idx)} feasible words. Consider changing `top_n` or `lower`",
                 UserWarning,
             )
 
-        return [(self[q], float(d)) for q, d in by_similarity[:n]]
+        words = self.kv.index2word
+        return [
+            (Embedding(words[i], self.kv.vectors[i]), float(d))
+            for i, d in zip(idx, distances)
+        ]
 
     def embset_similar(
-        self, emb: Union[str, Embedding], n: int = 10, lower=False, metric="cosine",
+        self,
+        emb: Union[str, Embedding],
+        n: int = 10,
+        lower=False,
+        metric="cosine",
+        n_jobs=1,
     ) -> EmbeddingSet:
         """
         Retreive an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] that are the most similar to the passed query.
@@ -137,11 +192,67 @@ class GensimLanguage(SklearnTransformerMixin):
             n: the number of items you'd like to see returned
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] containing the similar embeddings.
         """
         embs = [
-            w[0] for w in self.score_similar(emb=emb, n=n, lower=lower, metric=metric)
+            w[0]
+            for w in self.score_similar(
+                emb=emb, n=n, lower=lower, metric=metric, n_jobs=n_jobs
+            )
         ]
         return EmbeddingSet({w.name: w for w in embs})
+
+    def _normalized_vocab(self):
+        """Returns the words without NaNs in their vector and a normalised matrix of their vectors."""
+        if self._normed is None:
+            rows = np.flatnonzero(self._search_mask(lower=False))
+            words = self.kv.index2word
+            self._analogy_words = [words[i] for i in rows]
+            self._word_index = {w: i for i, w in enumerate(self._analogy_words)}
+            self._normed = normalize_rows(self.kv.vectors[rows])
+        return self._analogy_words, self._normed
+
+    def analogy(self, a, b, c, n: int = 1, method="3cosadd", n_jobs=1):
+        """
+        Solves the analogy "`a` is to `b` as `c` is to ?" by searching the entire vocabulary.
+        The words that are part of the analogy are never returned as an answer. You can
+        also pass lists of words to solve many analogies in one go, these are calculated
+        as matrix products against a cached normalised vocabulary matrix.
+
+        Arguments:
+            a: a word or a list of words
+            b: a word or a list of words
+            c: a word or a list of words
+            n: the number of answers you'd like to see returned per analogy
+            method: either `"3cosadd"` or `"3cosmul"`
+            n_jobs: number of threads used to calculate the scores, -1 means all cores
+
+        Returns:
+            A list of ([Embedding][whatlies.embedding.Embedding], score) tuples or, when lists are passed,
+            a list of these lists. A higher score means a better answer.
+
+        **Usage**
+
+        ```python
+        > from whatlies.language import GensimLanguage
+        > lang = GensimLanguage("wordvectors.kv")
+        > lang.analogy("man", "king", "woman")
+        > lang.analogy(["man", "paris"], ["king", "france"], ["woman", "berlin"], n=3)
+        ```
+        """
+        words, normed = self._normalized_vocab()
+        return solve_analogies(
+            self,
+            words=words,
+            word_index=self._word_index,
+            normed=normed,
+            a=a,
+            b=b,
+            c=c,
+            n=n,
+            method=method,
+            n_jobs=n_jobs,
+        )
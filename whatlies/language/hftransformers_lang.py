@@ -1,3 +1,6 @@
+import os
+import tempfile
+from contextlib import contextmanager
 from typing import List, Union, Any
 
 import numpy as np
@@ -5,7 +8,8 @@ import transformers as trf
 
 from whatlies.embedding import Embedding
 from whatlies.embeddingset import EmbeddingSet
-from whatlies.language.common import SklearnTransformerMixin
+from whatlies.distance import normalize_rows
+from whatlies.language.common import SklearnTransformerMixin, parse_bracket_query
 
 
 class HFTransformersLanguage(SklearnTransformerMixin):
@@ -28,10 +32,29 @@ class HFTransformersLanguage(SklearnTransformerMixin):
         pip install whatlies[all]
         ```
 
+    Like the spaCy backend this language supports the Bert-style bracket syntax, `lang['programming in [python]']`
+    only sums the tokens of `python` while the whole sentence is used as context. The tokens are selected
+    with the character offsets of the tokenizer, so this needs a fast tokenizer. All the spans of the
+    same sentence share a single pass through the model.
+
+    Lists of strings are tokenised once and sorted by length such that every batch that is
+    passed through the model contains strings of a similar length, which keeps padding to a minimum.
+
+    On a CPU you can trade a little bit of accuracy for speed by changing the `engine` of a PyTorch
+    model. With `"quantized"` the linear layers of the model are quantised to int8 dynamically, with
+    `"onnx"` the model is exported to an ONNX graph that is run by
+    [onnxruntime](https://onnxruntime.ai/), which needs to be installed separately. Use `check_engine`
+    to verify how close the vectors of these engines are to the ones of the original model.
+
     Arguments:
         model_name_or_path: A string which is the name or identifier of a model from
             [Hugging Face model repository](https://huggingface.co/models), or is the path to a local directory
             which contains a pre-trained transformer model files.
+        batch_size: The number of strings that are passed through the model at once.
+        engine: How to run the model, either `"default"`, `"quantized"` or `"onnx"`.
+        n_threads: The number of threads used for inference, `None` leaves the setting of the framework alone.
+            PyTorch only uses this number while a batch is passed through the model, the global
+            setting is restored afterwards.
         kwargs: Additional key-value pair argument(s) which are passed to `transformers.pipeline` function.
 
     **Usage**:
@@ -42,13 +65,48 @@ class HFTransformersLanguage(SklearnTransformerMixin):
     > lang['today is a nice day']
     > lang = HFTransformersLanguage('gpt2')
     > lang[['day and night', 'it is as clear as day', 'today the sky is clear']]
+    > lang = HFTransformersLanguage('bert-base-cased', batch_size=64)
+    > lang = HFTransformersLanguage('bert-base-cased', engine="quantized", n_threads=4)
+    > lang.check_engine(['today is a nice day', 'the sky is clear'])
     ```
     """
 
-    def __init__(self, model_name_or_path: str, **kwargs: Any) -> None:
+    # arguments that only change how the vectors are calculated, not the vectors themselves
+    _runtime_arguments = ("batch_size", "n_threads")
+
+    def __init__(
+        self,
+        model_name_or_path: str,
+        batch_size: int = 32,
+        engine: str = "default",
+        n_threads: int = None,
+        **kwargs: Any,
+    ) -> None:
+        if engine not in ["default", "quantized", "onnx"]:
+            raise ValueError(
+                f"The `engine` should be 'default', 'quantized' or 'onnx', got {engine}."
+            )
+        self.model_name_or_path = model_name_or_path
+        self.batch_size = batch_size
+        self.engine = engine
+        self.n_threads = n_threads
+        self.kwargs = kwargs
         self.model = trf.pipeline(
             task="feature-extraction", model=model_name_or_path, **kwargs
         )
+        tokenizer = self.model.tokenizer
+        if tokenizer.pad_token is None:
+            # padded positions are masked out so any token will do, gpt2 has none
+            tokenizer.pad_token = tokenizer.eos_token
+        if engine != "default" and self.model.framework != "pt":
+            raise ValueError(
+                f"The {engine} engine is only available for PyTorch models."
+            )
+        self._engine_model = None
+        if engine == "quantized":
+            self._engine_model = _quantize(self.model.model)
+        if engine == "onnx":
+            self._engine_model = _export_onnx(self.model, n_threads)
 
     def __getitem__(self, query: Union[str, List[str]]):
         """
@@ -61,7 +119,8 @@ class HFTransformersLanguage(SklearnTransformerMixin):
             An instance of [Embedding][whatlies.embedding.Embedding] (when `query` is a string)
             or [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] (when `query` is a list of strings).
             The embedding vector is computed as the sum of hidden-state representaions of tokens
-            (excluding special tokens, e.g. [CLS]).
+            (excluding special tokens, e.g. [CLS]). When part of the query is surrounded by brackets
+            only the tokens of that part are summed.
 
         **Usage**
 
@@ -71,16 +130,210 @@ class HFTransformersLanguage(SklearnTransformerMixin):
         > lang['today is a nice day']
         > lang = HFTransformersLanguage('gpt2')
         > lang[['day and night', 'it is as clear as day', 'today the sky is clear']]
+        > lang[['[bank] of the river', 'bank of the [river]', 'money at the [bank]']]
         ```
         """
         if isinstance(query, str):
-            return self._get_embedding(query)
-        return EmbeddingSet(*[self._get_embedding(q) for q in query])
-
-    def _get_embedding(self, query: str):
-        features = np.array(self.model(query, padding=False)[0])
-        special_tokens_mask = self.model.tokenizer(
-            query, return_special_tokens_mask=True, return_tensors="np"
-        )["special_tokens_mask"][0]
-        vec = features[np.logical_not(special_tokens_mask)].sum(axis=0)
-        return Embedding(query, vec)
+            return self._get_embeddings([query])[0]
+        return EmbeddingSet(*self._get_embeddings(query))
+
+    def _forward(self, inputs, engine: str = None):
+        """Runs a padded batch through the model and returns the hidden states as numpy."""
+        engine = self.engine if engine is None else engine
+        if engine == "onnx":
+            session, names = self._engine_model
+            return session.run(None, {k: inputs[k].numpy() for k in names})[0]
+        if self.model.framework == "pt":
+            import torch
+
+            model = self._engine_model if engine == "quantized" else self.model.model
+            inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
+            with torch.no_grad(), _torch_threads(self.n_threads):
+                return model(**inputs)[0].cpu().numpy()
+        return self.model.model(dict(inputs), training=False)[0].numpy()
+
+    def check_engine(self, queries: List[str], min_similarity: float = 0.99):
+        """
+        Compares the vectors of the `engine` of this language with the vectors of the original
+        floating point model. An error is raised when the vectors are not similar enough.
+
+        Arguments:
+            queries: A list of strings to compare the vectors of
+            min_similarity: The lowest cosine similarity that is accepted
+
+        Returns:
+            A numpy array with the cosine similarity between both vectors of every string.
+
+        **Usage**
+
+        ```python
+        > from whatlies.language import HFTransformersLanguage
+        > lang = HFTransformersLanguage('bert-base-cased', engine="onnx")
+        > lang.check_engine(['today is a nice day', 'the sky is clear'])
+        ```
+        """
+        engine = np.array([e.vector for e in self._get_embeddings(queries)])
+        default = np.array(
+            [e.vector for e in self._get_embeddings(queries, engine="default")]
+        )
+        similarity = np.sum(normalize_rows(engine) * normalize_rows(default), axis=1)
+        if np.any(similarity < min_similarity):
+            worst = queries[int(np.argmin(similarity))]
+            raise ValueError(
+                f"The {self.engine} engine deviates from the original model, "
+                f"the cosine similarity for `{worst}` is {similarity.min():.4f}."
+            )
+        return similarity
+
+    def _get_embeddings(
+        self, queries: List[str], engine: str = None
+    ) -> List[Embedding]:
+        if len(queries) == 0:
+            return []
+        tokenizer = self.model.tokenizer
+        parsed = [parse_bracket_query(q) for q in queries]
+        # every sentence is passed through the model once, no matter how many spans it has
+        sentences = list(dict.fromkeys(clean for clean, _ in parsed))
+        sentence_index = {s: i for i, s in enumerate(sentences)}
+        queries_of_sentence = [[] for _ in sentences]
+        for i, (clean, _) in enumerate(parsed):
+            queries_of_sentence[sentence_index[clean]].append(i)
+        with_context = any(context is not None for _, context in parsed)
+        if with_context and not tokenizer.is_fast:
+            raise ValueError(
+                "The bracket syntax needs the character offsets of the tokens, which "
+                "only a fast tokenizer provides, pass `use_fast=True` to use one."
+            )
+        encoded = tokenizer(
+            sentences,
+            return_special_tokens_mask=True,
+            return_offsets_mapping=with_context,
+        )
+        features = [
+            {k: v[i] for k, v in encoded.items()} for i in range(len(sentences))
+        ]
+        offsets = [np.array(f.pop("offset_mapping", [])) for f in features]
+        lengths = [len(f["input_ids"]) for f in features]
+        vectors = [None] * len(queries)
+        for batch in length_buckets(lengths, self.batch_size):
+            inputs = tokenizer.pad(
+                [features[s] for s in batch], return_tensors=self.model.framework
+            )
+            special_tokens_mask = np.array(inputs.pop("special_tokens_mask"))
+            hidden_states = self._forward(inputs, engine=engine)
+            keep = np.array(inputs["attention_mask"]) * (1 - special_tokens_mask)
+            rows, masks, owners = [], [], []
+            for b, s in enumerate(batch):
+                for i in queries_of_sentence[s]:
+                    mask = keep[b]
+                    context = parsed[i][1]
+                    if context is not None:
+                        span = _span_mask(offsets[s], context)
+                        mask = mask * _align(span, keep.shape[1], tokenizer)
+                    rows.append(b)
+                    masks.append(mask)
+                    owners.append(i)
+            pooled = masked_sum(hidden_states[rows], np.array(masks))
+            for i, vec in zip(owners, pooled):
+                vectors[i] = vec
+        return [Embedding(q, v) for q, v in zip(queries, vectors)]
+
+
+def _span_mask(offsets: np.ndarray, context) -> np.ndarray:
+    """
+    Marks the tokens, given by their character `offsets`, that overlap with the character
+    offsets of the context. Special tokens have an empty `(0, 0)` offset and are never marked.
+    """
+    start, end = context
+    return (offsets[:, 0] < end) & (offsets[:, 1] > start)
+
+
+def _align(mask: np.ndarray, n_tokens: int, tokenizer) -> np.ndarray:
+    """Pads the mask of a single sequence in the same way as the tokenizer pads a batch."""
+    padding = (0, n_tokens - len(mask))
+    if tokenizer.padding_side == "left":
+        padding = padding[::-1]
+    return np.pad(mask, padding)
+
+
+@contextmanager
+def _torch_threads(n_threads: int = None):
+    """Sets the number of threads of PyTorch for the duration of the block."""
+    import torch
+
+    if n_threads is None:
+        yield
+        return
+    previous = torch.get_num_threads()
+    torch.set_num_threads(n_threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+def _quantize(model):
+    """Returns a copy of a PyTorch model with dynamically int8 quantised linear layers."""
+    import torch
+
+    return torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def _export_onnx(pipeline, n_threads: int = None):
+    """
+    Exports the model of a PyTorch pipeline to an ONNX graph and returns an onnxruntime
+    session for it, together with the names of the inputs that the session expects. The
+    graph is written to a temporary folder that is removed once the session has loaded it.
+    """
+    import torch
+    import onnxruntime
+
+    class HiddenStates(torch.nn.Module):
+        # the positional arguments of `forward` differ per model, this fixes the order
+        def __init__(self, model, names):
+            super().__init__()
+            self.model = model
+            self.names = names
+
+        def forward(self, *args):
+            return self.model(**dict(zip(self.names, args)))[0]
+
+    dummy = pipeline.tokenizer(["an example"], return_tensors="pt")
+    names = list(dummy.keys())
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in names}
+    dynamic_axes["hidden_states"] = {0: "batch", 1: "tokens"}
+    options = onnxruntime.SessionOptions()
+    if n_threads is not None:
+        options.intra_op_num_threads = n_threads
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "model.onnx")
+        torch.onnx.export(
+            HiddenStates(pipeline.model.eval(), names),
+            tuple(dummy[name] for name in names),
+            path,
+            input_names=names,
+            output_names=["hidden_states"],
+            dynamic_axes=dynamic_axes,
+            opset_version=12,
+        )
+        session = onnxruntime.InferenceSession(path, options)
+    return session, names
+
+
+def length_buckets(lengths: List[int], batch_size: int) -> List[np.ndarray]:
+    """
+    Splits the indices of sequences into batches of sequences with a similar length such
+    that little padding is needed. The longest sequences come first.
+    """
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    return np.array_split(order, range(batch_size, len(order), batch_size))
+
+
+def masked_sum(hidden_states: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Sums the hidden states of a padded batch of shape `(batch, tokens, dim)` over the
+    tokens for which `mask`, of shape `(batch, tokens)`, is one.
+    """
+    return np.einsum("btd,bt->bd", hidden_states, mask.astype(hidden_states.dtype))
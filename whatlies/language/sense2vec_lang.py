@@ -1,8 +1,14 @@
+from typing import List, Optional, Union
+
+import numpy as np
 import spacy
 from sense2vec import Sense2Vec, Sense2VecComponent
 
 from whatlies.embedding import Embedding
 from whatlies.embeddingset import EmbeddingSet
+from whatlies.distance import _smallest
+from whatlies.language.common import batched, parse_bracket_query, embed_parallel
+from whatlies.language.spacy_lang import context_span
 
 
 class Sense2VecLanguage:
@@ -11,6 +17,9 @@ class Sense2VecLanguage:
     [EmbeddingSet][whatlies.embeddingset.EmbeddingSet]s from a sense2vec language
     backend. This object is meant for retreival, not plotting.
 
+    Keys that are not in the model raise a `ValueError`, whatlies 0.4.6 and earlier returned an
+    [Embedding][whatlies.embedding.Embedding] without a vector for them instead.
+
     Arguments:
         sense2vec_path: path to downloaded vectors
 
@@ -29,7 +38,9 @@ class Sense2VecLanguage:
     """
 
     def __init__(self, sense2vec_path):
+        self.sense2vec_path = sense2vec_path
         self.s2v = Sense2Vec().from_disk(sense2vec_path)
+        self._table = None
 
     def __getitem__(self, query):
         """
@@ -46,38 +57,113 @@ class Sense2VecLanguage:
         ```
         """
         if isinstance(query, str):
-            vec = self.s2v[query]
-            return Embedding(query, vec)
-        return EmbeddingSet(*[self[tok] for tok in query])
+            return self._get_embeddings([query])[0]
+        return EmbeddingSet(*self._get_embeddings(query))
+
+    def _get_table(self):
+        if self._table is None:
+            self._table = _SenseTable(self.s2v)
+        return self._table
+
+    def _get_embeddings(self, queries: List[str]) -> List[Embedding]:
+        table = self._get_table()
+        vectors = table.data[table.rows[table.lookup(queries)]]
+        return [Embedding(q, v) for q, v in zip(queries, vectors)]
 
-    def embset_similar(self, query, n=10):
+    def embset_similar(
+        self, query, n=10, senses: Optional[Union[str, List[str]]] = None
+    ):
         """
         Retreive an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] that are the most simmilar to the passed query.
 
         Arguments:
             query: query to use
             n: the number of items you'd like to see returned
+            senses: only return keys with one of these senses, e.g. `"NOUN"` or `["NOUN", "PROPN"]`
 
         Returns:
             An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] containing the similar embeddings.
         """
         return EmbeddingSet(
-            *[self[tok] for tok, sim in self.s2v.most_similar(query, n=n)],
+            *[emb for emb, sim in self.score_similar(query, n=n, senses=senses)],
             name=f"Embset[s2v similar_{n}:{query}]",
         )
 
-    def score_similar(self, query, n=10):
+    def score_similar(
+        self, query, n=10, senses: Optional[Union[str, List[str]]] = None
+    ):
         """
         Retreive an EmbeddingSet that are the most simmilar to the passed query.
 
         Arguments:
             query: query to use
             n: the number of items you'd like to see returned
+            senses: only return keys with one of these senses, e.g. `"NOUN"` or `["NOUN", "PROPN"]`
 
         Returns:
             An list of ([Embedding][whatlies.embedding.Embedding], score) tuples.
+
+        **Usage**
+        ```python
+        > lang = Sense2VecLanguage(sense2vec_path="/path/to/reddit_vectors-1.1.0")
+        > lang.score_similar('duck|VERB')
+        > lang.score_similar('duck|VERB', senses='NOUN')
+        ```
         """
-        return [(self[tok], sim) for tok, sim in self.s2v.most_similar(query, n=n)]
+        return self.score_similar_many([query], n=n, senses=senses)[0]
+
+    def score_similar_many(
+        self,
+        queries: List[str],
+        n=10,
+        senses: Optional[Union[str, List[str]]] = None,
+        batch_size: Optional[int] = None,
+    ):
+        """
+        Retreive the most similar keys for many queries at once. The cosine similarities of a
+        batch of queries are calculated as a single matrix product against the vectors of the
+        model, which are divided by their norms afterwards such that no normalised copy of
+        the vectors is needed.
+
+        Arguments:
+            queries: list of keys to find the neighbours of
+            n: the number of items you'd like to see returned per query
+            senses: only return keys with one of these senses, e.g. `"NOUN"` or `["NOUN", "PROPN"]`
+            batch_size: the number of queries that are compared to all keys at once, memory grows
+                with it, `None` keeps the scores of a batch under 64MB
+
+        Returns:
+            A list with, for every query, a list of ([Embedding][whatlies.embedding.Embedding], score) tuples.
+
+        **Usage**
+        ```python
+        > lang = Sense2VecLanguage(sense2vec_path="/path/to/reddit_vectors-1.1.0")
+        > lang.score_similar_many(['duck|VERB', 'bank|NOUN'], n=5, senses=['NOUN', 'VERB'])
+        ```
+        """
+        table = self._get_table()
+        candidates, rows, inv_norms = table.candidates(senses)
+        query_idx = table.lookup(queries)
+        if batch_size is None:
+            row_bytes = (len(table.data) + len(candidates)) * table.data.itemsize
+            batch_size = max(1, MAX_SCORES_BYTES // row_bytes)
+        results = []
+        for batch in batched(query_idx, batch_size):
+            batch = np.asarray(batch)
+            query_rows = table.rows[batch]
+            queries_normed = table.data[query_rows] * table.inv_norms[query_rows, None]
+            scores = (queries_normed @ table.data.T)[:, rows] * inv_norms
+            # a query is never its own neighbour
+            pos = np.searchsorted(candidates, batch).clip(max=len(candidates) - 1)
+            own = candidates[pos] == batch
+            scores[np.flatnonzero(own), pos[own]] = -np.inf
+            for row in scores:
+                top = _smallest(-row, n)
+                top = top[np.isfinite(row[top])]
+                results.append(
+                    [(table.embedding(candidates[i]), float(row[i])) for i in top]
+                )
+        return results
 
 
 class Sense2VecSpacyLanguage:
@@ -85,30 +171,140 @@ class Sense2VecSpacyLanguage:
     This object is used to lazily fetch `Embedding`s from a sense2vec language
     backend. Note that it is different than an `EmbeddingSet` in the sense
     it does not have anything precomputed.
+
+    Queries can use the Bert-style bracket syntax, `lang['go to the [bank]']`, to only
+    fetch the vector of the tokens between the brackets. Lists of queries are
+    processed in batches with `nlp.pipe`.
+
+    Arguments:
+        model_name: name of the spaCy model to load
+        sense2vec_path: path to downloaded vectors
+        batch_size: the number of texts that spaCy processes at once
+
     **Usage**:
     ```
-    lang = Sense2VecLanguage(spacy_model="en_core_web_sm", sense2vec="/path/to/reddit_vectors-1.1.0")
-    lang['bank|NOUN']
-    lang['bank|VERB']
+    lang = Sense2VecSpacyLanguage(model_name="en_core_web_sm", sense2vec_path="/path/to/reddit_vectors-1.1.0")
+    lang['bank of the river']
+    lang[['go to the [bank]', 'the [bank] of the river']]
     ```
     """
 
-    def __init__(self, model_name, sense2vec_path):
+    def __init__(self, model_name, sense2vec_path, batch_size: int = 1000):
+        self.model_name = model_name
+        self.sense2vec_path = sense2vec_path
         self.nlp = spacy.load(model_name)
         s2v = Sense2VecComponent(self.nlp.vocab).from_disk(sense2vec_path)
-        self.nlp.add(s2v)
-
-    def __getitem__(self, string):
-        doc = self.nlp(string)
-        vec = doc.vector
-        start, end = 0, -1
-        split_string = string.split(" ")
-        for idx, word in enumerate(split_string):
-            if word[0] == "[":
-                start = idx
-            if word[-1] == "]":
-                end = idx + 1
-        if start != 0:
-            if end != -1:
-                vec = doc[start:end].vector
-        return Embedding(string, vec)
+        self.nlp.add_pipe(s2v)
+        self.batch_size = batch_size
+
+    def __getitem__(self, query: Union[str, List[str]]):
+        """
+        Retreive a single embedding or a set of embeddings.
+
+        Arguments:
+            query: single string or list of strings
+
+        **Usage**
+        ```python
+        > lang = Sense2VecSpacyLanguage("en_core_web_sm", "/path/to/reddit_vectors-1.1.0")
+        > lang['go to the [bank]']
+        > lang[['go to the [bank]', 'the [bank] of the river']]
+        ```
+        """
+        if isinstance(query, str):
+            return self._get_embeddings([query])[0]
+        return EmbeddingSet(*self._get_embeddings(query))
+
+    def _get_embeddings(self, queries: List[str]) -> List[Embedding]:
+        parsed = [parse_bracket_query(q) for q in queries]
+        docs = self.nlp.pipe(
+            [clean_query for clean_query, _ in parsed], batch_size=self.batch_size
+        )
+        return [
+            Embedding(query, context_span(doc, context).vector)
+            for query, (_, context), doc in zip(queries, parsed, docs)
+        ]
+
+    def embed_parallel(
+        self, queries: List[str], n_workers=-1, chunk_size=1000, start_method=None
+    ):
+        """
+        Retreive the embeddings of many queries with a pool of worker processes. See
+        [embed_parallel][whatlies.language.common.embed_parallel] for the details.
+
+        Arguments:
+            queries: list of strings
+            n_workers: the number of processes, negative numbers count back from the number of cores (-1 is all)
+            chunk_size: the number of queries that a worker embeds at once
+            start_method: how to start the workers, `None` forks them where the platform supports it
+                and no PyTorch or TensorFlow is imported
+        """
+        return embed_parallel(
+            self,
+            queries,
+            n_workers=n_workers,
+            chunk_size=chunk_size,
+            start_method=start_method,
+        )
+
+
+# the memory that the score matrices of a batch of `score_similar_many` may use by default
+MAX_SCORES_BYTES = 64 << 20
+
+
+class _SenseTable:
+    """
+    Holds the vectors of a sense2vec model as one matrix. Every key is mapped to its row such
+    that many keys are looked up with a single index operation. The inverse norms of the rows
+    and the keys that belong to a set of senses are calculated once and cached.
+    """
+
+    def __init__(self, s2v):
+        vectors = s2v.vectors
+        keys = list(vectors.key2row.keys())
+        self.data = vectors.data
+        self.rows = np.array([vectors.key2row[k] for k in keys], dtype=int)
+        self.words = [s2v.strings[k] for k in keys]
+        self.senses = np.array([s2v.split_key(w)[1] for w in self.words])
+        self.key_index = {w: i for i, w in enumerate(self.words)}
+        self._inv_norms = None
+        self._candidates = {}
+
+    @property
+    def inv_norms(self):
+        """The inverse norm of every row of the vectors, zero for zero vectors."""
+        if self._inv_norms is None:
+            norms = np.linalg.norm(self.data, axis=1)
+            self._inv_norms = np.divide(
+                1.0, norms, out=np.zeros_like(norms), where=norms > 0
+            )
+        return self._inv_norms
+
+    def lookup(self, queries: List[str]) -> np.ndarray:
+        missing = [q for q in queries if q not in self.key_index]
+        if missing:
+            raise ValueError(f"The keys {missing} are not in the sense2vec model.")
+        return np.array([self.key_index[q] for q in queries], dtype=int)
+
+    def embedding(self, i: int) -> Embedding:
+        return Embedding(self.words[i], self.data[self.rows[i]])
+
+    def candidates(self, senses):
+        """
+        Returns the sorted indices of the keys with one of the senses, together with their
+        rows in the vectors and the inverse norms of those rows.
+        """
+        if senses is None:
+            key = None
+        else:
+            key = tuple(sorted([senses] if isinstance(senses, str) else senses))
+        if key not in self._candidates:
+            if key is None:
+                idx = np.arange(len(self.words))
+            else:
+                idx = np.flatnonzero(np.isin(self.senses, key))
+            if len(idx) == 0:
+                raise ValueError(f"There are no keys with the senses {list(key)}.")
+            rows = self.rows[idx]
+            self._candidates[key] = (idx, rows, self.inv_norms[rows])
+        return self._candidates[key]
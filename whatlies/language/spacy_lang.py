@@ -1,15 +1,19 @@
 import os
 import warnings
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Optional
 
 import spacy
 from spacy.language import Language
 import numpy as np
-from sklearn.metrics import pairwise_distances
 
 from whatlies.embedding import Embedding
 from whatlies.embeddingset import EmbeddingSet
-from whatlies.language.common import SklearnTransformerMixin
+from whatlies.distance import (
+    distances_to_vector,
+    solve_analogies,
+    _smallest,
+)
+from whatlies.language.common import SklearnTransformerMixin, parse_bracket_query
 
 
 class SpacyLanguage(SklearnTransformerMixin):
@@ -18,8 +22,14 @@ class SpacyLanguage(SklearnTransformerMixin):
     [EmbeddingSet][whatlies.embeddingset.EmbeddingSet]s from a spaCy language
     backend. This object is meant for retreival, not plotting.
 
+    Lists of queries are sent through `nlp.pipe` in batches. Pipeline components that don't
+    influence the vectors, like the tagger, parser and entity recognizer, are disabled by default.
+
     Arguments:
         nlp: name of the model to load, be sure that it's downloaded beforehand
+        batch_size: number of texts that are sent through the spaCy pipeline at once
+        n_process: number of processes used by `nlp.pipe`, -1 means all cores
+        disable: names of the pipeline components that are skipped when texts are embedded
 
     **Usage**:
 
@@ -27,13 +37,30 @@ class SpacyLanguage(SklearnTransformerMixin):
     > lang = SpacyLanguage("en_core_web_md")
     > lang['python']
     > lang[['python', 'snake', 'dog']]
+    > lang = SpacyLanguage("en_core_web_md", batch_size=256, n_process=4)
+    > lang[['python is a language', 'a snake is an animal']]
     > lang = SpacyLanguage("en_trf_robertabase_lg")
     > lang['programming in [python]']
     ```
     """
 
-    def __init__(self, nlp: Union[str, Language]):
+    # components that never change the vectors of a document
+    VECTORLESS_COMPONENTS = ("tagger", "parser", "ner", "textcat")
+
+    # arguments that only change how the vectors are calculated, not the vectors themselves
+    _runtime_arguments = ("batch_size", "n_process")
+
+    def __init__(
+        self,
+        nlp: Union[str, Language],
+        batch_size: int = 1000,
+        n_process: int = 1,
+        disable: Optional[Tuple[str, ...]] = VECTORLESS_COMPONENTS,
+    ):
         self.nlp = nlp
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.disable = disable
         if isinstance(nlp, str):
             self.model = spacy.load(nlp)
         elif isinstance(nlp, Language):
@@ -49,6 +76,7 @@ class SpacyLanguage(SklearnTransformerMixin):
             and len(self.model.vocab.lookups_extra.get_table("lexeme_prob")) == 0
         ):
             self.model.vocab.lookups_extra.remove_table("lexeme_prob")
+        self._vectors_table = None
 
     @classmethod
     def from_fasttext(cls, language, output_dir, vectors_loc=None, force=False):
@@ -86,18 +114,6 @@ class SpacyLanguage(SklearnTransformerMixin):
                 )
         return SpacyLanguage(spacy.load(output_dir))
 
-    @staticmethod
-    def _check_query_format(query: str) -> bool:
-        opening = sum(1 for c in query if c == "[")
-        closing = sum(1 for c in query if c == "]")
-        if opening > 1:
-            raise ValueError("Only one opening bracket (`[`) is allowed")
-        if closing > 1:
-            raise ValueError("Only one closing bracket (`]`) is allowed")
-        if opening != closing:
-            raise ValueError("The brackets should be paired")
-        return opening > 0
-
     def __getitem__(
         self, query: Union[str, List[str]]
     ) -> Union[Embedding, EmbeddingSet]:
@@ -120,48 +136,36 @@ class SpacyLanguage(SklearnTransformerMixin):
         ```
         """
         if isinstance(query, str):
-            return self._get_embedding(query)
-        return EmbeddingSet(*[self._get_embedding(q) for q in query])
-
-    def _get_embedding(self, query: str) -> Embedding:
-        has_brackets = self._check_query_format(query)
-        if has_brackets:
-            start_idx, end_idx = self._get_context_pos(query)
-            clean_query = query.replace("[", "").replace("]", "")
-            vec = self.model(clean_query)[start_idx:end_idx].vector
-            return Embedding(query, vec)
-        return Embedding(query, self.model(query).vector)
-
-    def _get_context_pos(self, query: str) -> Tuple[int, int]:
-        tokens = list(t.text for t in self.model.tokenizer(query))
-        start_idx = tokens.index("[")
-        end_idx = tokens.index("]")
-        return start_idx, end_idx - 1
-
-    def _prepare_queries(self, prob_limit, lower):
-        self._load_vocab()
-        queries = [w for w in self.model.vocab]
-        if prob_limit is not None:
-            queries = [w for w in queries if w.prob >= prob_limit]
-        if lower:
-            queries = [w for w in queries if w.is_lower]
-        if len(queries) == 0:
-            raise ValueError(
-                f"No tokens left for this setting. Consider raising prob_limit={prob_limit}"
-            )
-        return queries
+            return self._get_embeddings([query])[0]
+        return EmbeddingSet(*self._get_embeddings(query))
+
+    def _pipe(self, texts: List[str]):
+        disable = [
+            name for name in self.model.pipe_names if name in (self.disable or [])
+        ]
+        return self.model.pipe(
+            texts,
+            batch_size=self.batch_size,
+            n_process=self.n_process if len(texts) > 1 else 1,
+            disable=disable,
+        )
 
-    def _load_vocab(self):
-        """This method must always be called before iterting over `model.vocab`."""
-        # Load all the vocab only if they have not been loaded yet.
-        if len(self.model.vocab) < len(self.model.vocab.vectors.keys()):
-            for orth in self.model.vocab.vectors:
-                self.model.vocab[orth]
+    def _get_embeddings(self, queries: List[str]) -> List[Embedding]:
+        parsed = [parse_bracket_query(q) for q in queries]
+        docs = self._pipe([clean_query for clean_query, _ in parsed])
+        return [
+            Embedding(query, context_span(doc, context).vector)
+            for query, (_, context), doc in zip(queries, parsed, docs)
+        ]
 
-    def _calculate_distances(self, emb, queries, metric):
-        vec = emb.vector
-        vector_matrix = np.array([w.vector for w in queries])
-        return pairwise_distances(vector_matrix, vec.reshape(1, -1), metric=metric)
+    def _get_vectors_table(self) -> "_VectorsTable":
+        """
+        The similarity methods search the vectors table of the model directly. The table is
+        read once, keep in mind that vectors added to the vocab afterwards are not searched.
+        """
+        if self._vectors_table is None:
+            self._vectors_table = _VectorsTable(self.model.vocab)
+        return self._vectors_table
 
     def embset_similar(
         self,
@@ -170,6 +174,7 @@ class SpacyLanguage(SklearnTransformerMixin):
         prob_limit=-15,
         lower=True,
         metric="cosine",
+        n_jobs=1,
     ):
         """
         Retreive an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] that are the most simmilar to the passed query.
@@ -180,11 +185,14 @@ class SpacyLanguage(SklearnTransformerMixin):
             prob_limit: likelihood limit that sets the subset of words to search
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] containing the similar embeddings.
         """
-        embs = [w[0] for w in self.score_similar(emb, n, prob_limit, lower, metric)]
+        embs = [
+            w[0] for w in self.score_similar(emb, n, prob_limit, lower, metric, n_jobs)
+        ]
         return EmbeddingSet({w.name: w for w in embs})
 
     def embset_proximity(
@@ -194,6 +202,7 @@ class SpacyLanguage(SklearnTransformerMixin):
         prob_limit=-15,
         lower=True,
         metric="cosine",
+        n_jobs=1,
     ):
         """
         Retreive an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] or embeddings that are within a proximity.
@@ -204,6 +213,7 @@ class SpacyLanguage(SklearnTransformerMixin):
             prob_limit: likelihood limit that sets the subset of words to search
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An [EmbeddingSet][whatlies.embeddingset.EmbeddingSet] containing the similar embeddings.
@@ -211,11 +221,12 @@ class SpacyLanguage(SklearnTransformerMixin):
         if isinstance(emb, str):
             emb = self[emb]
 
-        queries = self._prepare_queries(prob_limit, lower)
-        distances = self._calculate_distances(emb, queries, metric)
-        return EmbeddingSet(
-            {w: self[w] for w, d in zip(queries, distances) if d <= max_proximity}
-        )
+        table = self._get_vectors_table()
+        mask = table.mask(prob_limit, lower)
+        distances = table.distances(emb.vector, metric, n_jobs)
+        idx = np.flatnonzero(mask & (distances <= max_proximity))
+        embs = self._get_embeddings([table.words[i] for i in idx])
+        return EmbeddingSet({e.name: e for e in embs})
 
     def score_similar(
         self,
@@ -224,6 +235,7 @@ class SpacyLanguage(SklearnTransformerMixin):
         prob_limit=-15,
         lower=True,
         metric="cosine",
+        n_jobs=1,
     ):
         """
         Retreive a list of (Embedding, score) tuples that are the most simmilar to the passed query.
@@ -234,6 +246,7 @@ class SpacyLanguage(SklearnTransformerMixin):
             prob_limit: likelihood limit that sets the subset of words to search, to ignore set to `None`
             metric: metric to use to calculate distance, must be scipy or sklearn compatible
             lower: only fetch lower case tokens
+            n_jobs: number of threads used to calculate the distances, -1 means all cores
 
         Returns:
             An list of ([Embedding][whatlies.embedding.Embedding], score) tuples.
@@ -241,14 +254,140 @@ class SpacyLanguage(SklearnTransformerMixin):
         if isinstance(emb, str):
             emb = self[emb]
 
-        queries = self._prepare_queries(prob_limit, lower)
-        distances = self._calculate_distances(emb, queries, metric)
-        by_similarity = sorted(zip(queries, distances), key=lambda z: z[1])
+        table = self._get_vectors_table()
+        mask = table.mask(prob_limit, lower)
+        distances = table.distances(emb.vector, metric, n_jobs)
+        n_feasible = int(mask.sum())
+        idx = _smallest(np.where(mask, distances, np.inf), min(n, n_feasible))
 
-        if len(queries) < n:
+        if n_feasible < n:
             warnings.warn(
-                f"We could only find {len(queries)} feasible words. Consider changing `prob_limit` or `lower`",
+                f"We could only find {n_feasible} feasible words. Consider changing `prob_limit` or `lower`",
                 UserWarning,
             )
 
-        return [(self[q.text], float(d)) for q, d in by_similarity[:n]]
+        embs = self._get_embeddings([table.words[i] for i in idx])
+        return [(e, float(distances[i])) for e, i in zip(embs, idx)]
+
+    def analogy(self, a, b, c, n: int = 1, method="3cosadd", n_jobs=1):
+        """
+        Solves the analogy "`a` is to `b` as `c` is to ?" by searching all the words in the
+        vectors table of the model. The words that are part of the analogy are never returned
+        as an answer. You can also pass lists of words to solve many analogies in one go,
+        these are calculated as matrix products against a cached normalised vocabulary matrix.
+
+        Arguments:
+            a: a word or a list of words
+            b: a word or a list of words
+            c: a word or a list of words
+            n: the number of answers you'd like to see returned per analogy
+            method: either `"3cosadd"` or `"3cosmul"`
+            n_jobs: number of threads used to calculate the scores, -1 means all cores
+
+        Returns:
+            A list of ([Embedding][whatlies.embedding.Embedding], score) tuples or, when lists are passed,
+            a list of these lists. A higher score means a better answer.
+
+        **Usage**
+
+        ```python
+        > lang = SpacyLanguage("en_core_web_md")
+        > lang.analogy("man", "king", "woman")
+        > lang.analogy(["man", "paris"], ["king", "france"], ["woman", "berlin"], n=3)
+        ```
+        """
+        table = self._get_vectors_table()
+        return solve_analogies(
+            self,
+            words=table.words,
+            word_index=table.word_index,
+            normed=table.normed,
+            index=table.rows,
+            a=a,
+            b=b,
+            c=c,
+            n=n,
+            method=method,
+            n_jobs=n_jobs,
+        )
+
+
+def context_span(doc, context: Optional[Tuple[int, int]]):
+    """Returns the tokens of `doc` that overlap with the character offsets of the context."""
+    if context is None:
+        return doc
+    start, end = context
+    tokens = [t.i for t in doc if t.idx < end and t.idx + len(t) > start]
+    if not tokens:
+        return doc[0:0]
+    first, last = tokens[0], tokens[-1] + 1
+    return doc[first:last]
+
+
+class _VectorsTable:
+    """
+    Holds what the similarity methods need from the vectors table of a spaCy vocab. Every
+    key in the table is mapped to its row in `vectors.data` such that the distances are
+    calculated once per row, even when many keys share a row. The `prob_limit` and `lower`
+    filters are turned into boolean masks over the keys that are cached per setting.
+    """
+
+    def __init__(self, vocab):
+        vectors = vocab.vectors
+        self.vocab = vocab
+        self.data = vectors.data
+        self.keys = list(vectors.key2row.keys())
+        self.rows = np.array([vectors.key2row[k] for k in self.keys], dtype=int)
+        self.words = [vocab.strings[k] for k in self.keys]
+        self.norms = np.linalg.norm(self.data, axis=1)
+        self._word_index = None
+        self._normed = None
+        self._probs = None
+        self._lower = None
+        self._masks = {}
+
+    @property
+    def word_index(self):
+        if self._word_index is None:
+            self._word_index = {w: i for i, w in enumerate(self.words)}
+        return self._word_index
+
+    @property
+    def normed(self):
+        """The rows of `vectors.data` scaled to unit length, in the dtype of the table."""
+        if self._normed is None:
+            data = np.asarray(self.data)
+            data = data.astype(np.result_type(data.dtype, np.float32), copy=False)
+            norms = self.norms.astype(data.dtype, copy=False)[:, None]
+            self._normed = np.divide(
+                data, norms, out=np.zeros_like(data), where=norms > 0
+            )
+        return self._normed
+
+    def mask(self, prob_limit, lower):
+        if (prob_limit, lower) not in self._masks:
+            mask = np.ones(len(self.keys), dtype=bool)
+            if prob_limit is not None:
+                if self._probs is None:
+                    self._probs = np.array([self.vocab[k].prob for k in self.keys])
+                mask &= self._probs >= prob_limit
+            if lower:
+                if self._lower is None:
+                    self._lower = np.array(
+                        [w.islower() for w in self.words], dtype=bool
+                    )
+                mask &= self._lower
+            self._masks[(prob_limit, lower)] = mask
+        mask = self._masks[(prob_limit, lower)]
+        if not mask.any():
+            raise ValueError(
+                f"No tokens left for this setting. Consider raising prob_limit={prob_limit}"
+            )
+        return mask
+
+    def distances(self, vec, metric, n_jobs=1):
+        """Calculates the distance from `vec` to every key in the table."""
+        distances = distances_to_vector(
+            self.data, vec, metric, norms=self.norms, n_jobs=n_jobs
+        )
+        return distances[self.rows]
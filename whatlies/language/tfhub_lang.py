@@ -1,11 +1,13 @@
 from typing import Union, List, Optional
 
+import numpy as np
 import tensorflow_text
+import tensorflow as tf
 import tensorflow_hub as tfhub
 
 from whatlies.embedding import Embedding
 from whatlies.embeddingset import EmbeddingSet
-from whatlies.language.common import SklearnTransformerMixin
+from whatlies.language.common import SklearnTransformerMixin, batched
 
 
 class TFHubLanguage(SklearnTransformerMixin):
@@ -42,6 +44,10 @@ class TFHubLanguage(SklearnTransformerMixin):
         tags: A set of strings specifying the graph variant to use, if loading from a TF1 module.
             It is passed to `hub.load` function.
         signature: An optional signature of the model to use.
+        batch_size: The number of strings that are passed through the model at once.
+
+    Lists of strings are passed to the model as batches of `batch_size` strings. The call
+    is wrapped in a `tf.function` with a fixed input signature, so it is only traced once.
 
     **Usage**:
 
@@ -51,20 +57,32 @@ class TFHubLanguage(SklearnTransformerMixin):
     > lang['today is a gift']
     > lang = TFHubLanguage("https://tfhub.dev/google/nnlm-en-dim50/2")
     > lang[['withdraw some money', 'take out cash', 'cash out funds']]
+    > lang = TFHubLanguage("https://tfhub.dev/google/nnlm-en-dim50/2", batch_size=256)
     ```
     """
 
+    # arguments that only change how the vectors are calculated, not the vectors themselves
+    _runtime_arguments = ("batch_size",)
+
     def __init__(
         self,
         url: str,
         tags: Optional[List[str]] = None,
         signature: Optional[str] = None,
+        batch_size: int = 32,
     ) -> None:
         model = tfhub.load(url, tags=tags)
         if signature:
             model = model.signatures[signature]
+        self.url = url
+        self.tags = tags
         self.signature = signature
+        self.batch_size = batch_size
         self.model = model
+        self._encode = tf.function(
+            lambda texts: model(texts),
+            input_signature=[tf.TensorSpec(shape=[None], dtype=tf.string)],
+        )
 
     def __getitem__(
         self, query: Union[str, List[str]]
@@ -86,9 +104,16 @@ class TFHubLanguage(SklearnTransformerMixin):
         ```
         """
         if isinstance(query, str):
-            return self._get_embedding(query)
-        return EmbeddingSet(*[self._get_embedding(q) for q in query])
-
-    def _get_embedding(self, query: str) -> Embedding:
-        vec = self.model([query]).numpy()[0]
-        return Embedding(query, vec)
+            return self._get_embeddings([query])[0]
+        return EmbeddingSet(*self._get_embeddings(query))
+
+    def _get_embeddings(self, queries: List[str]) -> List[Embedding]:
+        if len(queries) == 0:
+            return []
+        vectors = np.concatenate(
+            [
+                self._encode(tf.constant(batch)).numpy()
+                for batch in batched(queries, self.batch_size)
+            ]
+        )
+        return [Embedding(q, v) for q, v in zip(queries, vectors)]
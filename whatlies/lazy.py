@@ -0,0 +1,219 @@
+from copy import copy
+
+import numpy as np
+
+
+def _project(a, b):
+    return (a @ b / (b @ b))[..., None] * b
+
+
+OPERATIONS = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    ">>": _project,
+    "|": lambda a, b: a - _project(a, b),
+}
+
+
+class _Leaf:
+    def __init__(self, value):
+        self.value = value
+        self.is_set = hasattr(value, "embeddings")
+        self.result = None
+        # identifies the value that `result` was taken from and counts the updates of `result`
+        self.source = None
+        self.generation = 0
+
+    def current_source(self):
+        """
+        Identifies the current value of the leaf. Vectors are read-only, so a vector only
+        changes by assigning a new array and a set gets a new version on every change or
+        rebuilds its matrix. The old arrays are kept alive by `result` so their ids cannot
+        be reused by the new ones.
+        """
+        if self.is_set:
+            self.value._matrix()
+            return self.value.embeddings.version, id(self.value._buffer)
+        return id(self.value.vector)
+
+
+class _Operation:
+    def __init__(self, symbol, left, right):
+        self.symbol = symbol
+        self.left = left
+        self.right = right
+        self.is_set = left.is_set
+        self.result = None
+        # the generations of the operands that `result` was calculated from
+        self.source = None
+        self.generation = 0
+
+
+def _to_node(thing):
+    if isinstance(thing, LazyEmbedding):
+        return thing.node
+    if hasattr(thing, "embeddings") or hasattr(thing, "vector"):
+        return _Leaf(thing)
+    raise ValueError(f"Cannot apply an operation to an object of type {type(thing)}.")
+
+
+def _evaluate(node):
+    """
+    Evaluates every node in the graph once. A subexpression that is used more than once
+    is only calculated a single time and set expressions are calculated as matrix operations.
+    Results are cached on the nodes and only recalculated when a leaf changed since.
+    """
+    if isinstance(node, _Leaf):
+        source = node.current_source()
+        if node.result is None or node.source != source:
+            value = node.value
+            node.result = value._matrix() if node.is_set else value.vector
+            node.source, node.generation = source, node.generation + 1
+    else:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        source = (node.left.generation, node.right.generation)
+        if node.result is None or node.source != source:
+            node.result = OPERATIONS[node.symbol](left, right)
+            node.source, node.generation = source, node.generation + 1
+    return node.result
+
+
+def _render(node):
+    """
+    Renders the name of the expression as a list of parts. The embeddingset in an expression
+    is marked with `None` such that its name can be filled in later for every embedding.
+    """
+    if isinstance(node, _Leaf):
+        return [None] if node.is_set else [node.value.name]
+    return ["(", *_render(node.left), f" {node.symbol} ", *_render(node.right), ")"]
+
+
+def _leftmost(node):
+    while not isinstance(node, _Leaf):
+        node = node.left
+    return node.value
+
+
+class LazyEmbedding:
+    """
+    This object represents arithmetic on [Embedding][whatlies.embedding.Embedding]s that
+    has not been calculated yet. Every operation adds a node to an expression graph that is only
+    evaluated, once, when the vector is requested. The name is only rendered from the graph when
+    it is displayed. You typically don't make this object yourself but use `Embedding.lazy()`.
+
+    Usage:
+
+    ```python
+    from whatlies.embedding import Embedding
+
+    foo = Embedding("foo", [0.1, 0.3])
+    bar = Embedding("bar", [0.7, 0.2])
+    buz = Embedding("buz", [0.1, 0.9])
+
+    expr = (foo.lazy() - bar + buz) | bar
+    expr.vector
+    expr.evaluate()
+    ```
+    """
+
+    def __init__(self, node):
+        self.node = node
+
+    def _combine(self, symbol, other):
+        other = _to_node(other)
+        if other.is_set:
+            raise ValueError(
+                "An EmbeddingSet can only be used on the left hand side of an operation."
+            )
+        node = _Operation(symbol, self.node, other)
+        return LazyEmbeddingSet(node) if node.is_set else LazyEmbedding(node)
+
+    def __add__(self, other):
+        return self._combine("+", other)
+
+    def __sub__(self, other):
+        return self._combine("-", other)
+
+    def __rshift__(self, other):
+        return self._combine(">>", other)
+
+    def __or__(self, other):
+        return self._combine("|", other)
+
+    def __gt__(self, other):
+        other = other.vector
+        return self.vector.dot(other) / other.dot(other)
+
+    @property
+    def name(self):
+        return "".join(_render(self.node))
+
+    @property
+    def vector(self):
+        return _evaluate(self.node)
+
+    def evaluate(self):
+        """
+        Evaluates the expression and turns it into an [Embedding][whatlies.embedding.Embedding].
+        """
+        result = copy(_leftmost(self.node))
+        result.name = self.name
+        result.vector = self.vector
+        return result
+
+    def __repr__(self):
+        return f"Lazy[{self.name}]"
+
+    def __str__(self):
+        return self.name
+
+
+class LazyEmbeddingSet(LazyEmbedding):
+    """
+    This object represents arithmetic on an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet]
+    that has not been calculated yet. When evaluated every operation is applied to the matrix
+    of the entire set at once instead of to every embedding separately. You typically don't
+    make this object yourself but use `EmbeddingSet.lazy()`.
+
+    Usage:
+
+    ```python
+    from whatlies.embedding import Embedding
+    from whatlies.embeddingset import EmbeddingSet
+
+    foo = Embedding("foo", [0.1, 0.3])
+    bar = Embedding("bar", [0.7, 0.2])
+    buz = Embedding("buz", [0.1, 0.9])
+    emb = EmbeddingSet(foo, bar)
+
+    expr = emb.lazy() | (buz - foo)
+    expr.to_X()
+    expr.evaluate()
+    ```
+    """
+
+    @property
+    def name(self):
+        embset_name = _leftmost(self.node).name
+        return "".join(embset_name if p is None else p for p in _render(self.node))
+
+    def to_X(self):
+        """
+        Evaluates the expression and returns the resulting matrix, without creating any
+        [Embedding][whatlies.embedding.Embedding] objects.
+        """
+        return np.array(self.vector)
+
+    def evaluate(self):
+        """
+        Evaluates the expression and turns it into an [EmbeddingSet][whatlies.embeddingset.EmbeddingSet].
+        """
+        embset = _leftmost(self.node)
+        parts = _render(self.node)
+        new_embeddings = {}
+        for (k, emb), vec in zip(embset.embeddings.items(), self.to_X()):
+            new_emb = copy(emb)
+            new_emb.name = "".join(emb.name if p is None else p for p in parts)
+            new_emb.vector = vec
+            new_embeddings[k] = new_emb
+        return embset.__class__(new_embeddings, name=self.name)